@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+"""Benchmark the Inky driver hot paths.
+
+Runs `show()`, `set_image()` (from a PIL image and from an array),
+`set_pixel()` and the bulk drawing methods for every supported
+resolution, with and without flips, against in-process stand-ins for
+`spidev.SpiDev`, `RPi.GPIO` and `smbus2.SMBus`. No hardware is needed,
+and `time.sleep()` is skipped, so results measure the host CPU work only.
+
+For each benchmark the wall time, memory allocated (via tracemalloc,
+Python 3 only) and bytes written over SPI are reported. Results can be
+saved as JSON and compared against an earlier run:
+
+    python benchmarks/bench_drivers.py --output before.json
+    python benchmarks/bench_drivers.py --compare before.json
+
+"""
+from __future__ import print_function
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import warnings
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import inky  # noqa: E402
+from inky import inky as inky_tricolour, inky_ssd1608, inky_uc8159  # noqa: E402
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# (name, driver class, resolution, colour)
+DISPLAYS = (
+    ('phat', inky_tricolour.Inky, (212, 104), 'red'),
+    ('phat_ssd1608', inky_ssd1608.Inky, (250, 122), 'red'),
+    ('what', inky_tricolour.Inky, (400, 300), 'red'),
+    ('impression_5_7', inky_uc8159.Inky, (600, 448), 'multi'),
+    ('impression_4', inky_uc8159.Inky, (640, 400), 'multi'),
+)
+
+# (h_flip, v_flip)
+FLIPS = ((False, False), (True, True))
+
+BENCHMARKS = ('show', 'set_image', 'set_image_array', 'set_pixel', 'set_pixels', 'fill_rect')
+
+# Extra set_image benchmarks for the 7-colour displays, by dither mode, exact uses only panel colours
+QUANTIZE_BENCHMARKS = ('set_image_none', 'set_image_bayer', 'set_image_exact')
+
+
+class FakeSpiDev:
+    """Stand-in for spidev.SpiDev that counts bytes written."""
+
+    def __init__(self):
+        """Initialise with no bytes written."""
+        self.max_speed_hz = 0
+        self.bytes_written = 0
+        self.transfers = 0
+
+    def open(self, bus, device):
+        """Open an SPI device, does nothing."""
+
+    def close(self):
+        """Close the SPI device, does nothing."""
+
+    def writebytes2(self, values):
+        """Count a write."""
+        self.bytes_written += len(values)
+        self.transfers += 1
+
+    def xfer3(self, values):
+        """Count a write."""
+        self.writebytes2(values)
+
+
+class FakeGPIO:
+    """Stand-in for the RPi.GPIO module with an idle busy pin."""
+
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    RISING = 31
+    FALLING = 32
+
+    def __init__(self, idle_level):
+        """Initialise GPIO.
+
+        :param idle_level: Level read from every input, chosen so the controller appears idle.
+        """
+        self.idle_level = idle_level
+
+    def setmode(self, mode):
+        """Set pin numbering mode."""
+
+    def setwarnings(self, enabled):
+        """Enable or disable warnings."""
+
+    def setup(self, pin, mode, initial=LOW, pull_up_down=PUD_OFF):
+        """Set up a pin."""
+
+    def output(self, pin, level):
+        """Drive an output pin."""
+
+    def input(self, pin):
+        """Read a pin."""
+        return self.idle_level
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        """Pretend edge detection is unavailable, so busy waits poll the idle level."""
+        raise RuntimeError('Edge detection not supported')
+
+
+class FakeSMBus:
+    """Stand-in for smbus2.SMBus with no EEPROM attached."""
+
+    def write_i2c_block_data(self, i2c_address, register, values):
+        """Fail to write, as if there's no EEPROM."""
+        raise IOError('No EEPROM')
+
+    def read_i2c_block_data(self, i2c_address, register, length):
+        """Fail to read, as if there's no EEPROM."""
+        raise IOError('No EEPROM')
+
+
+class NoSleep:
+    """Context manager that replaces time.sleep and totals the time requested."""
+
+    def __init__(self):
+        """Initialise with no time slept."""
+        self.seconds = 0.0
+        self._sleep = None
+
+    def _record(self, seconds):
+        self.seconds += seconds
+
+    def __enter__(self):
+        """Replace time.sleep."""
+        self._sleep = time.sleep
+        time.sleep = self._record
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Restore time.sleep."""
+        time.sleep = self._sleep
+
+
+def make_display(driver, resolution, colour, h_flip, v_flip):
+    """Return a display wired to fake SPI, GPIO and I2C, and its SPI bus."""
+    spi_bus = FakeSpiDev()
+    # The UC8159 holds busy low while busy, the other controllers hold it high
+    idle_level = FakeGPIO.HIGH if driver is inky_uc8159.Inky else FakeGPIO.LOW
+    display = driver(resolution=resolution, colour=colour, h_flip=h_flip, v_flip=v_flip,
+                     spi_bus=spi_bus, i2c_bus=FakeSMBus(), gpio=FakeGPIO(idle_level))
+    return display, spi_bus
+
+
+def make_image(display, seed=0, exact=False):
+    """Return a random test image for `display.set_image()`.
+
+    :param bool exact: For 7-colour displays, only use panel colours.
+    """
+    random = numpy.random.RandomState(seed)
+    width, height = display.resolution
+    if isinstance(display, inky_uc8159.Inky):
+        if exact:
+            palette = numpy.array(inky_uc8159.DESATURATED_PALETTE[:7], dtype=numpy.uint8)
+            pixels = palette[random.randint(0, 7, (height, width))]
+        else:
+            pixels = random.randint(0, 256, (height, width, 3)).astype(numpy.uint8)
+        if Image is None:
+            return None
+        return Image.fromarray(pixels, 'RGB')
+    pixels = random.randint(0, 3, (height, width)).astype(numpy.uint8)
+    if Image is None:
+        return pixels
+    image = Image.fromarray(pixels, 'L').convert('P')
+    return image
+
+
+def set_all_pixels(display):
+    """Set every pixel with `display.set_pixel()`."""
+    width, height = display.resolution
+    set_pixel = display.set_pixel
+    for y in range(height):
+        for x in range(width):
+            set_pixel(x, y, (x ^ y) & 1)
+
+
+def set_all_pixels_bulk(display):
+    """Set every pixel, in the same pattern as `set_all_pixels`, with one `display.set_pixels()` call."""
+    width, height = display.resolution
+    xs, ys = numpy.meshgrid(numpy.arange(width), numpy.arange(height))
+    display.set_pixels(xs, ys, (xs ^ ys) & 1)
+
+
+def fill_stripes(display):
+    """Draw one filled rectangle per 8 rows with `display.fill_rect()`."""
+    width, height = display.resolution
+    for y in range(0, height, 8):
+        display.fill_rect(0, y, width, 8, (y // 8) & 1)
+
+
+def prepare(display, name):
+    """Return a zero argument function that runs benchmark `name` once, or `None` if unsupported."""
+    if name == 'show':
+        return display.show
+    if name == 'set_image':
+        image = make_image(display)
+        if image is None:
+            return None
+        return lambda: display.set_image(image)
+    if name == 'set_image_array':
+        # Palette indexes as a numpy array, copied into the buffer in place
+        width, height = display.resolution
+        colours = 7 if isinstance(display, inky_uc8159.Inky) else 3
+        pixels = numpy.random.RandomState(0).randint(0, colours, (height, width)).astype(numpy.uint8)
+        return lambda: display.set_image(pixels)
+    if name == 'set_pixel':
+        return lambda: set_all_pixels(display)
+    if name == 'set_pixels':
+        return lambda: set_all_pixels_bulk(display)
+    if name == 'fill_rect':
+        return lambda: fill_stripes(display)
+    if name in QUANTIZE_BENCHMARKS:
+        if not isinstance(display, inky_uc8159.Inky):
+            return None
+        mode = name[len('set_image_'):]
+        image = make_image(display, exact=mode == 'exact')
+        if image is None:
+            return None
+        dither = 'floyd-steinberg' if mode == 'exact' else mode
+        return lambda: display.set_image(image, dither=dither)
+    raise ValueError('Unknown benchmark {}'.format(name))
+
+
+def measure(func, repeat, spi_bus, no_sleep):
+    """Run `func` repeatedly and return timing, allocation and SPI statistics."""
+    # Untimed first run, so one-off set up such as GPIO init and cache building is excluded
+    func()
+
+    seconds = []
+    bytes_start = spi_bus.bytes_written
+    transfers_start = spi_bus.transfers
+    slept = no_sleep.seconds
+    for _ in range(repeat):
+        t_start = time.time()
+        func()
+        seconds.append(time.time() - t_start)
+
+    result = {
+        'repeat': repeat,
+        'best': min(seconds),
+        'median': sorted(seconds)[len(seconds) // 2],
+        'mean': sum(seconds) / len(seconds),
+        'spi_bytes': (spi_bus.bytes_written - bytes_start) // repeat,
+        'spi_transfers': (spi_bus.transfers - transfers_start) // repeat,
+        # Fixed sleeps skipped, real hardware would also have waited this long
+        'sleep_skipped': (no_sleep.seconds - slept) / repeat,
+        'alloc_peak': None,
+        'alloc_retained': None,
+    }
+
+    if tracemalloc is not None:
+        tracemalloc.start()
+        start, _ = tracemalloc.get_traced_memory()
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['alloc_peak'] = peak - start
+        result['alloc_retained'] = current - start
+
+    return result
+
+
+def run(repeat=5, name_filter=None, verbose=False):
+    """Run every benchmark and return a list of result dicts.
+
+    :param int repeat: Number of timed runs of each benchmark.
+    :param str name_filter: Only run benchmarks whose name contains this string.
+    :param bool verbose: Print each result as it completes.
+    """
+    results = []
+    with NoSleep() as no_sleep, warnings.catch_warnings():
+        # The UC8159 warns that busy is held high when there's no panel attached
+        warnings.simplefilter('ignore')
+        for display_name, driver, resolution, colour in DISPLAYS:
+            for h_flip, v_flip in FLIPS:
+                for benchmark in BENCHMARKS + QUANTIZE_BENCHMARKS:
+                    name = '{} {}x{}{}{} {}'.format(
+                        display_name, resolution[0], resolution[1],
+                        ' h_flip' if h_flip else '', ' v_flip' if v_flip else '', benchmark)
+                    if name_filter and name_filter not in name:
+                        continue
+
+                    display, spi_bus = make_display(driver, resolution, colour, h_flip, v_flip)
+                    func = prepare(display, benchmark)
+                    if func is None:
+                        continue
+
+                    result = {
+                        'name': name,
+                        'display': display_name,
+                        'resolution': list(resolution),
+                        'h_flip': h_flip,
+                        'v_flip': v_flip,
+                        'benchmark': benchmark,
+                    }
+                    result.update(measure(func, repeat, spi_bus, no_sleep))
+                    results.append(result)
+
+                    if verbose:
+                        print(format_result(result))
+    return results
+
+
+def format_result(result):
+    """Return a one line summary of a result."""
+    alloc = '' if result['alloc_peak'] is None else ' {:>10d} B peak alloc'.format(result['alloc_peak'])
+    return '{:<56s} {:>10.3f} ms {:>8d} B SPI{}'.format(
+        result['name'], result['median'] * 1000, result['spi_bytes'], alloc)
+
+
+def git_revision():
+    """Return the current git commit, or `None` outside a git checkout."""
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         stderr=open(os.devnull, 'w'))
+        return output.decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Return details of the machine and software versions under test."""
+    model = None
+    try:
+        with open('/proc/device-tree/model', 'rb') as f:
+            model = f.read().decode('ascii', 'replace').strip('\x00\n')
+    except (IOError, OSError):
+        pass
+
+    return {
+        'timestamp': datetime.datetime.utcnow().isoformat() + 'Z',
+        'inky': inky.__version__,
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'model': model,
+    }
+
+
+def compare(results, baseline):
+    """Print the change in median time of each result against a baseline run."""
+    previous = dict((result['name'], result) for result in baseline['results'])
+    for result in results:
+        before = previous.get(result['name'])
+        if before is None or not before['median']:
+            continue
+        ratio = result['median'] / before['median']
+        print('{:<48s} {:>10.3f} ms -> {:>10.3f} ms  {:>6.2f}x  {:>+8d} B SPI'.format(
+            result['name'], before['median'] * 1000, result['median'] * 1000, ratio,
+            result['spi_bytes'] - before['spi_bytes']))
+
+
+def main(args=None):
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description='Benchmark the Inky driver hot paths.')
+    parser.add_argument('--repeat', '-r', type=int, default=5, help='timed runs of each benchmark')
+    parser.add_argument('--filter', '-k', default=None, help='only run benchmarks whose name contains this string')
+    parser.add_argument('--output', '-o', default=None, help='save results as JSON to this file')
+    parser.add_argument('--compare', '-c', default=None, help='compare against results saved with --output')
+    args = parser.parse_args(args)
+
+    results = run(repeat=args.repeat, name_filter=args.filter, verbose=args.compare is None)
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as f:
+            compare(results, json.load(f))
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2, sort_keys=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
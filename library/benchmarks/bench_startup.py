@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+"""Benchmark Inky start up: imports, and `from inky.auto import auto; auto()`.
+
+Import times come from `python -X importtime` (Python 3.7+), parsed
+into the modules each statement imports and the time spent in each.
+Statements must not import the heavy modules listed in `IMPORTS`, the
+benchmark exits with an error if they do.
+
+Each run starts a fresh Python process, so module imports are measured
+cold. `smbus2` is replaced by a stand-in that reports a red wHAT
+EEPROM and counts reads, so no hardware is needed.
+
+For `auto()`, runs are made with the detection cache turned off, with an empty cache
+(the first start after boot) and with a cache filled by an earlier
+start:
+
+    python benchmarks/bench_startup.py --repeat 10
+
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+LIBRARY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Run in the child process, prints a JSON result
+CHILD = r"""
+import json, struct, sys, time, types
+
+t_start = time.time()
+
+class SMBus:
+    reads = 0
+
+    def __init__(self, bus):
+        pass
+
+    def write_i2c_block_data(self, address, register, values):
+        pass
+
+    def read_i2c_block_data(self, address, register, length):
+        SMBus.reads += 1
+        data = struct.pack('<HHBBB22p', 400, 300, 2, 12, 6, b'2020-01-01 00:00:00.0')
+        return list(bytearray(data))[register:register + length]
+
+smbus2 = types.ModuleType('smbus2')
+smbus2.SMBus = SMBus
+sys.modules['smbus2'] = smbus2
+sys.path.insert(0, {library!r})
+
+from inky.auto import auto
+t_import = time.time()
+display = auto(cache={cache!r})
+t_auto = time.time()
+
+print(json.dumps({{
+    'import': t_import - t_start,
+    'auto': t_auto - t_import,
+    'total': t_auto - t_start,
+    'eeprom_reads': SMBus.reads,
+    'driver': type(display).__name__,
+}}))
+"""
+
+# (statement, modules it must not import)
+IMPORTS = (
+    ('import inky', ('numpy', 'PIL', 'pkg_resources', 'smbus2')),
+    ('from inky import auto', ('numpy', 'PIL', 'pkg_resources', 'smbus2')),
+    ('from inky import InkyPHAT', ('PIL', 'pkg_resources')),
+    ('from inky import InkyWHAT', ('PIL', 'pkg_resources')),
+    ('from inky import Inky7Colour', ('PIL', 'pkg_resources')),
+)
+
+# (name, cache setting, whether the cache is emptied before each run)
+MODES = (
+    ('no cache', False, False),
+    ('cold cache', True, True),
+    ('warm cache', True, False),
+)
+
+
+def import_times(statement):
+    """Return {module: (self, cumulative) seconds} for every module imported by `statement` in a new process."""
+    def importtime(code):
+        process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', code], cwd=os.path.abspath(LIBRARY),
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError('{} failed:\n{}'.format(code, stderr.decode('utf-8', 'replace')))
+        times = {}
+        for line in stderr.decode('utf-8', 'replace').splitlines():
+            # import time: self [us] | cumulative | imported package
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            own, cumulative, name = line[len('import time:'):].split('|')
+            if not own.strip().isdigit():
+                continue
+            times[name.strip()] = (int(own) / 1e6, int(cumulative) / 1e6)
+        return times
+
+    # Leave out modules the interpreter imports before running any code
+    startup = importtime('pass')
+    return dict((name, value) for name, value in importtime(statement).items() if name not in startup)
+
+
+def run_imports(verbose=False):
+    """Time each statement in `IMPORTS` and return a list of result dicts.
+
+    Each result lists its modules with the slowest first, and any
+    forbidden modules it imported.
+
+    :param bool verbose: Print each result as it completes.
+    """
+    results = []
+    for statement, forbidden in IMPORTS:
+        times = import_times(statement)
+        packages = set(name.split('.')[0] for name in times)
+        result = {
+            'name': statement,
+            'total': sum(own for own, _ in times.values()),
+            'modules': sorted(((name, own) for name, (own, _) in times.items()), key=lambda item: -item[1]),
+            'forbidden': sorted(package for package in forbidden if package in packages),
+        }
+        results.append(result)
+        if verbose:
+            print(format_import(result))
+    return results
+
+
+def format_import(result, top=3):
+    """Return a one line summary of an import result, with its `top` slowest modules."""
+    slowest = ', '.join('{} {:0.1f}'.format(name, own * 1000) for name, own in result['modules'][:top])
+    forbidden = '  IMPORTS {}'.format(', '.join(result['forbidden'])) if result['forbidden'] else ''
+    return '{:<30s} {:>8.1f} ms  {:>4d} modules  ({}){}'.format(
+        result['name'], result['total'] * 1000, len(result['modules']), slowest, forbidden)
+
+
+def start_once(cache, cache_home):
+    """Start Inky in a new process and return its timings."""
+    env = dict(os.environ, XDG_CACHE_HOME=cache_home)
+    code = CHILD.format(library=os.path.abspath(LIBRARY), cache=cache)
+    output = subprocess.check_output([sys.executable, '-c', code], env=env)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def run(repeat=5, verbose=False):
+    """Run every start up mode and return a list of result dicts.
+
+    :param int repeat: Number of starts of each mode.
+    :param bool verbose: Print each result as it completes.
+    """
+    results = []
+    cache_home = tempfile.mkdtemp(prefix='inky-bench-')
+    try:
+        for name, cache, empty in MODES:
+            # Untimed first start fills the cache and warms the OS file cache
+            start_once(cache, cache_home)
+            runs = []
+            for _ in range(repeat):
+                if empty:
+                    shutil.rmtree(os.path.join(cache_home, 'inky'), ignore_errors=True)
+                runs.append(start_once(cache, cache_home))
+
+            result = {'name': name, 'repeat': repeat, 'driver': runs[0]['driver']}
+            for key in ('import', 'auto', 'total'):
+                result[key] = sorted(run[key] for run in runs)[len(runs) // 2]
+            result['eeprom_reads'] = max(run['eeprom_reads'] for run in runs)
+            results.append(result)
+
+            if verbose:
+                print(format_result(result))
+    finally:
+        shutil.rmtree(cache_home, ignore_errors=True)
+    return results
+
+
+def format_result(result):
+    """Return a one line summary of a result."""
+    return '{:<12s} import {:>8.1f} ms  auto() {:>8.2f} ms  total {:>8.1f} ms  {:d} EEPROM reads'.format(
+        result['name'], result['import'] * 1000, result['auto'] * 1000, result['total'] * 1000, result['eeprom_reads'])
+
+
+def main(args=None):
+    """Run the start up benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description='Benchmark Inky start up.')
+    parser.add_argument('--repeat', '-r', type=int, default=5, help='starts of each mode')
+    parser.add_argument('--output', '-o', default=None, help='save results as JSON to this file')
+    args = parser.parse_args(args)
+
+    imports = run_imports(verbose=True)
+    results = run(repeat=args.repeat, verbose=True)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({'imports': imports, 'results': results}, f, indent=2, sort_keys=True)
+
+    # Fail if a statement has started importing a heavy module again
+    return 1 if any(result['forbidden'] for result in imports) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,64 @@
-"""Inky e-Ink Display Drivers."""
-
-from . import inky                            # noqa: F401
-from .inky import BLACK, WHITE, RED, YELLOW   # noqa: F401
-from .phat import InkyPHAT, InkyPHAT_SSD1608  # noqa: F401
-from .what import InkyWHAT                    # noqa: F401
-from .mock import InkyMockPHAT, InkyMockWHAT  # noqa: F401
-from .inky_uc8159 import Inky as Inky7Colour  # noqa: F401
+"""Inky e-Ink Display Drivers.
+
+Drivers are imported when first used, so `import inky` doesn't load
+numpy or PIL until a display is created.
+"""
+import importlib
+import sys
+from pkgutil import extend_path
+
 from .auto import auto                        # noqa: F401
 
 __version__ = '1.3.2'
 
-try:
-    from pkg_resources import declare_namespace
-    declare_namespace(__name__)
-except ImportError:
-    from pkgutil import extend_path
-    __path__ = extend_path(__path__, __name__)
+# Public names, and the module and attribute each is imported from on first use
+_LAZY = {
+    # Driver modules, attributes of the package when it imported them up front
+    'inky': ('.inky', None),
+    'inky_ssd1608': ('.inky_ssd1608', None),
+    'inky_uc8159': ('.inky_uc8159', None),
+    'phat': ('.phat', None),
+    'what': ('.what', None),
+    'mock': ('.mock', None),
+    'BLACK': ('.inky', 'BLACK'),
+    'WHITE': ('.inky', 'WHITE'),
+    'RED': ('.inky', 'RED'),
+    'YELLOW': ('.inky', 'YELLOW'),
+    'InkyPHAT': ('.phat', 'InkyPHAT'),
+    'InkyPHAT_SSD1608': ('.phat', 'InkyPHAT_SSD1608'),
+    'InkyWHAT': ('.what', 'InkyWHAT'),
+    'InkyMockPHAT': ('.mock', 'InkyMockPHAT'),
+    'InkyMockWHAT': ('.mock', 'InkyMockWHAT'),
+    'Inky7Colour': ('.inky_uc8159', 'Inky'),
+    'DisplayGroup': ('.group', 'DisplayGroup'),
+}
+
+# Star imports look these up through __getattr__
+__all__ = ['auto'] + sorted(_LAZY)
+
+
+def __getattr__(name):
+    """Import a public name on first use."""
+    try:
+        module, attr = _LAZY[name]
+    except KeyError:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = importlib.import_module(module, __name__)
+    if attr is not None:
+        value = getattr(value, attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """List the public names, including those not imported yet."""
+    return sorted(set(globals()) | set(_LAZY))
+
+
+if sys.version_info < (3, 7):
+    # No module __getattr__, import everything up front
+    for _name in _LAZY:
+        __getattr__(_name)
+
+# A pkgutil style namespace package, pkg_resources takes longer to import than the drivers
+__path__ = extend_path(__path__, __name__)
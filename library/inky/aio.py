@@ -0,0 +1,45 @@
+"""asyncio support for Inky displays.
+
+Requires Python 3.5 or later, the drivers import this module only when
+:meth:`show_async` is called.
+"""
+import asyncio
+import functools
+
+
+def _get_lock(display, loop):
+    """Return the asyncio.Lock serialising updates to `display` on `loop`."""
+    lock_loop, lock = getattr(display, '_async_lock', (None, None))
+    if lock is None or lock_loop is not loop:
+        lock = asyncio.Lock()
+        display._async_lock = (loop, lock)
+    return lock
+
+
+async def show(display, busy_wait=True, force=False, inline=False, executor=None):
+    """Show the display buffer without blocking the event loop.
+
+    The buffer, or pre-packed planes, are copied before the update starts, then packed, transferred
+    and refreshed in `executor`. Waiting for the busy signal happens in the
+    worker thread, leaving the event loop free until the refresh finishes.
+    Concurrent callers for the same display are run one at a time.
+
+    :param display: Inky driver or simulator instance.
+    :param bool busy_wait: If True, complete once the refresh has finished.
+    :param bool force: If True, refresh even if the display's frame cache says this frame is already shown.
+    :param bool inline: If True, run the update in the event loop thread. Used by simulators whose GUI is not thread safe.
+    :param executor: concurrent.futures.Executor to use, default: the event loop's default executor.
+    """
+    loop = asyncio.get_event_loop()
+
+    async with _get_lock(display, loop):
+        packed = getattr(display, '_packed', None)
+        if packed is None:
+            frame = display.buf.copy()
+        else:
+            frame = tuple(plane.copy() for plane in packed)
+        update = functools.partial(display._show, frame, busy_wait=busy_wait, force=force)
+        if inline:
+            update()
+        else:
+            await loop.run_in_executor(executor, update)
@@ -1,66 +1,141 @@
 """Automatic Inky setup from i2c EEPROM."""
-from .phat import InkyPHAT, InkyPHAT_SSD1608  # noqa: F401
-from .what import InkyWHAT                    # noqa: F401
-from .inky_uc8159 import Inky as InkyUC8159   # noqa: F401
+import importlib
+
 from . import eeprom
-import argparse
 
+# Module and class of each driver, only the one that's chosen is imported
+_DRIVER_CLASSES = {
+    'InkyPHAT': ('.phat', 'InkyPHAT'),
+    'InkyPHAT_SSD1608': ('.phat', 'InkyPHAT_SSD1608'),
+    'InkyWHAT': ('.what', 'InkyWHAT'),
+    'InkyUC8159': ('.inky_uc8159', 'Inky'),
+}
+
+
+def _driver(name):
+    """Import and return a driver class by name, see `_DRIVER_CLASSES`."""
+    module, cls = _DRIVER_CLASSES[name]
+    return getattr(importlib.import_module(module, __package__), cls)
+
+
+# Driver for each EEPROM display variant, see eeprom.DISPLAY_VARIANT
+_VARIANT_DRIVERS = {
+    1: 'InkyPHAT', 4: 'InkyPHAT', 5: 'InkyPHAT',
+    10: 'InkyPHAT_SSD1608', 11: 'InkyPHAT_SSD1608', 12: 'InkyPHAT_SSD1608',
+    2: 'InkyWHAT', 3: 'InkyWHAT', 6: 'InkyWHAT', 7: 'InkyWHAT', 8: 'InkyWHAT',
+    14: 'InkyUC8159', 15: 'InkyUC8159_4', 16: 'InkyUC8159_4',
+}
+
+# Build a driver from EEPROM contents, passed on so the driver doesn't read it again
+_DRIVERS = {
+    'InkyPHAT': lambda epd: _driver('InkyPHAT')(epd.get_color(), epd_type=epd),
+    'InkyPHAT_SSD1608': lambda epd: _driver('InkyPHAT_SSD1608')(epd.get_color(), epd_type=epd),
+    'InkyWHAT': lambda epd: _driver('InkyWHAT')(epd.get_color(), epd_type=epd),
+    'InkyUC8159': lambda epd: _driver('InkyUC8159')(resolution=(600, 448), epd_type=epd),
+    'InkyUC8159_4': lambda epd: _driver('InkyUC8159')(resolution=(640, 400), epd_type=epd),
+}
+
+
+def _detect(i2c_bus, cache):
+    """Return the EEPROM contents and driver name, from `cache` if it holds a result for this boot."""
+    if cache is True:
+        # A bus passed in may not be the HAT's, only cache the default
+        cache = eeprom.DetectionCache() if i2c_bus is None else None
+    elif cache is False:
+        cache = None
+    elif not isinstance(cache, eeprom.DetectionCache):
+        cache = eeprom.DetectionCache(cache)
+
+    if cache is not None:
+        cached = cache.load()
+        # "No EEPROM" is always read again, it may have been saved by an older version
+        if cached is not None and cached[0] is not None:
+            return cached
 
-def auto(i2c_bus=None, ask_user=False, verbose=False):
-    """Auto-detect Inky board from EEPROM and return an Inky class instance."""
     _eeprom = eeprom.read_eeprom(i2c_bus=i2c_bus)
+    driver = None if _eeprom is None else _VARIANT_DRIVERS.get(_eeprom.display_variant)
+    # A failed read may be I2C not being enabled yet, or a busy bus, rather than a missing EEPROM
+    if cache is not None and _eeprom is not None:
+        cache.store(_eeprom, driver)
+    return _eeprom, driver
+
+
+def _simulate_requested():
+    """Return whether --simulate was passed on the command line."""
+    import argparse
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--simulate', '-s', nargs='?', const='window', default=None)
+    args, _ = parser.parse_known_args()
+    return args.simulate is not None
+
+
+def auto(i2c_bus=None, ask_user=False, verbose=False, cache=False):
+    """Auto-detect Inky board from EEPROM and return an Inky class instance.
+
+    With `cache`, the EEPROM contents, and the driver chosen for them, are
+    saved on disk until the next boot, so later starts skip the I2C read.
+    Failed reads are not saved, the EEPROM is read again on the next start.
+
+    :param i2c_bus: SMB object to read the EEPROM with, default: `smbus2.SMBus(1)`. Results from a bus passed in aren't cached.
+    :param bool ask_user: If no EEPROM is found, or --simulate is passed, choose the display from --type/--colour arguments.
+    :param bool verbose: Print the detected display.
+    :param cache: True for the default cache file, a file path or :class:`inky.eeprom.DetectionCache`, default: False to always read the EEPROM.
+    """
+    # Simulators need no hardware, so render farms and CI can run without an EEPROM or smbus2
+    simulate = ask_user and _simulate_requested()
+    if simulate:
+        _eeprom, driver = None, None
+    else:
+        _eeprom, driver = _detect(i2c_bus, cache)
 
     if _eeprom is not None:
         if verbose:
             print("Detected {}".format(_eeprom.get_variant()))
 
-        if _eeprom.display_variant in (1, 4, 5):
-            return InkyPHAT(_eeprom.get_color())
-        if _eeprom.display_variant in (10, 11, 12):
-            return InkyPHAT_SSD1608(_eeprom.get_color())
-        if _eeprom.display_variant in (2, 3, 6, 7, 8):
-            return InkyWHAT(_eeprom.get_color())
-        if _eeprom.display_variant == 14:
-            return InkyUC8159(resolution=(600, 448))
-        if _eeprom.display_variant in (15, 16):
-            return InkyUC8159(resolution=(640, 400))
+        if driver in _DRIVERS:
+            return _DRIVERS[driver](_eeprom)
 
     if ask_user:
-        if verbose:
+        if verbose and not simulate:
             print("Failed to detect an Inky board. Trying --type/--colour arguments instead...\n")
+        import argparse
         parser = argparse.ArgumentParser()
-        parser.add_argument('--simulate', '-s', action='store_true', default=False, help="Simulate Inky display")
+        parser.add_argument('--simulate', '-s', nargs='?', const='window', default=None, choices=["window", "headless"],
+                            help="Simulate Inky display, in a window or headless without one")
+        parser.add_argument('--output', type=str, default=None, help="Save simulated frames as PNG files, {frame} is replaced by the frame number")
         parser.add_argument('--type', '-t', type=str, required=True, choices=["what", "phat", "phatssd1608", "impressions", "7colour"], help="Type of display")
         parser.add_argument('--colour', '-c', type=str, required=False, choices=["red", "black", "yellow"], help="Display colour")
         args, _ = parser.parse_known_args()
         if args.simulate:
             cls = None
+            headless = args.simulate == "headless"
             if args.type == "phat":
                 from .mock import InkyMockPHAT
-                cls = InkyMockPHAT(args.colour)
+                cls = InkyMockPHAT(args.colour, headless=headless, output=args.output)
             if args.type == "phatssd1608":
                 from .mock import InkyMockPHATSSD1608
-                cls = InkyMockPHATSSD1608(args.colour)
+                cls = InkyMockPHATSSD1608(args.colour, headless=headless, output=args.output)
             if args.type == "what":
                 from .mock import InkyMockWHAT
-                cls = InkyMockWHAT(args.colour)
+                cls = InkyMockWHAT(args.colour, headless=headless, output=args.output)
             if args.type in ("impressions", "7colour"):
                 from .mock import InkyMockImpression
-                cls = InkyMockImpression()
+                cls = InkyMockImpression(headless=headless, output=args.output)
             if cls is not None:
-                import atexit
-                atexit.register(cls.wait_for_window_close)
+                if not headless:
+                    import atexit
+                    atexit.register(cls.wait_for_window_close)
                 return cls
             raise RuntimeError("Unable to simulate {}".format(args.type))
         else:
             if args.type == "phat":
-                return InkyPHAT(args.colour)
+                return _driver('InkyPHAT')(args.colour)
             if args.type == "phatssd1608":
-                return InkyPHAT_SSD1608(args.colour)
+                return _driver('InkyPHAT_SSD1608')(args.colour)
             if args.type == "what":
-                return InkyWHAT(args.colour)
+                return _driver('InkyWHAT')(args.colour)
             if args.type in ("impressions", "7colour"):
-                return InkyUC8159()
+                return _driver('InkyUC8159')()
 
     if _eeprom is None:
         raise RuntimeError("No EEPROM detected! You must manually initialise your Inky board.")
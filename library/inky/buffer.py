@@ -0,0 +1,93 @@
+"""Copy images and packed planes into display buffers."""
+try:
+    import numpy
+except ImportError:
+    raise ImportError('This library requires the numpy module\nInstall with: sudo apt install python-numpy')
+
+# PIL image modes whose pixel values are palette indexes, or 1-bit black and white
+INDEXED_MODES = ('P', 'L', '1')
+
+
+def is_image(image):
+    """Return True if `image` is a PIL image, without importing PIL."""
+    return not isinstance(image, numpy.ndarray) and hasattr(image, 'mode') and hasattr(image, 'getpixel')
+
+
+def as_pixels(image, shape):
+    """Return the pixels of `image` as an array of `shape`, without copying where the layout allows.
+
+    Arrays and bytes-like objects of the right size are returned as views.
+    PIL images are checked against the display size before their pixels
+    are read. "1" mode images give a bool array, True for white.
+
+    :param image: numpy array, bytes-like object (eg: memoryview), PIL image or nested list of pixels.
+    :param shape: Shape of the display buffer as (rows, columns).
+    """
+    rows, cols = shape
+
+    if is_image(image):
+        if image.size != (cols, rows):
+            raise ValueError('Image must be ({}x{}) pixels!'.format(cols, rows))
+        if image.mode not in INDEXED_MODES:
+            raise ValueError('Image mode {} is not supported, convert to "P" or "1" first'.format(image.mode))
+        pixels = numpy.asarray(image)
+        if image.mode == '1' and pixels.dtype != numpy.bool_:
+            # Older Pillow reads "1" images as 0 and 255
+            pixels = pixels != 0
+        return pixels
+
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        pixels = numpy.frombuffer(image, dtype=numpy.uint8)
+    else:
+        pixels = numpy.asarray(image)
+
+    if pixels.shape != shape:
+        if pixels.size != rows * cols:
+            raise ValueError('Expected {} pixels ({}x{}), got {}'.format(rows * cols, cols, rows, pixels.size))
+        pixels = pixels.reshape(shape)
+
+    return pixels
+
+
+def copy_into(buf, image, colours, one_bit=(1, 0)):
+    """Copy the palette indexes of `image` into `buf` in place.
+
+    Raises a ValueError if the image is the wrong size or uses an index
+    outside of the display palette.
+
+    :param buf: Display buffer to write to, a 2d uint8 numpy array.
+    :param image: Image to copy, see :func:`as_pixels`.
+    :param int colours: Number of palette indexes the display supports.
+    :param one_bit: Buffer values for (black, white) pixels of "1" images and bool arrays.
+    """
+    pixels = as_pixels(image, buf.shape)
+
+    if pixels.dtype == numpy.bool_:
+        black, white = one_bit
+        buf.fill(black)
+        numpy.copyto(buf, white, where=pixels)
+        return buf
+
+    if pixels.size:
+        if pixels.dtype.kind not in 'ui' or pixels.max() >= colours or (pixels.dtype.kind == 'i' and pixels.min() < 0):
+            raise ValueError('Image must only use palette indexes 0 to {}'.format(colours - 1))
+
+    if pixels is not buf:
+        numpy.copyto(buf, pixels, casting='unsafe')
+    return buf
+
+
+def as_plane(data, size, name='plane'):
+    """Return pre-packed plane bytes as a uint8 array, without copying where possible.
+
+    :param data: bytes-like object or numpy array of packed pixels, in controller scan order.
+    :param int size: Expected length in bytes.
+    :param str name: Name of the plane for error messages.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        plane = numpy.frombuffer(data, dtype=numpy.uint8)
+    else:
+        plane = numpy.asarray(data, dtype=numpy.uint8).reshape(-1)
+    if plane.size != size:
+        raise ValueError('Expected {} bytes for the {}, got {}'.format(size, name, plane.size))
+    return plane
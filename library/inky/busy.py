@@ -0,0 +1,78 @@
+"""Busy signal handling for Inky display controllers."""
+import threading
+import time
+
+# Polling interval when the GPIO library has no edge detection
+_POLL_INTERVAL = 0.01
+
+# Longest wait between level checks when relying on edge events,
+# guards against a missed edge without waking the thread every 10ms
+_EDGE_RECHECK = 1.0
+
+
+class BusyPin:
+    """Wait for a controller's busy signal to be released.
+
+    Uses GPIO edge detection (`add_event_detect`) so a waiting thread sleeps
+    until the release edge arrives, rather than polling the pin. Falls back
+    to polling if the GPIO library can't detect edges on this pin.
+    """
+
+    def __init__(self, gpio, pin, active_low=False):
+        """Initialise busy signal handling.
+
+        :param gpio: GPIO module, eg: `RPi.GPIO`. The pin must already be set up as an input.
+        :param int pin: Busy pin by BCM number.
+        :param bool active_low: True if the controller pulls the pin low while busy.
+        """
+        self._gpio = gpio
+        self.pin = pin
+        self.active_low = active_low
+        self._released = threading.Event()
+        self.edge_events = False
+
+        edge = gpio.RISING if active_low else gpio.FALLING
+        try:
+            gpio.add_event_detect(pin, edge, callback=self._on_edge)
+            self.edge_events = True
+        except (AttributeError, RuntimeError, ValueError):
+            # No edge support, or edge detection already claimed for this pin
+            self.edge_events = False
+
+    def _on_edge(self, channel):
+        self._released.set()
+
+    def is_busy(self):
+        """Return True if the controller is signalling busy."""
+        return (self._gpio.input(self.pin) == self._gpio.LOW) == self.active_low
+
+    def wait(self, timeout):
+        """Wait for the busy signal to clear.
+
+        Returns True if the controller is idle, False if `timeout` expired first.
+
+        :param float timeout: Maximum time to wait in seconds.
+        """
+        # Clear before checking the level so an edge between the two isn't lost
+        self._released.clear()
+
+        t_end = time.time() + timeout
+        while self.is_busy():
+            remaining = t_end - time.time()
+            if remaining <= 0:
+                return False
+            if self.edge_events:
+                self._released.wait(min(remaining, _EDGE_RECHECK))
+                self._released.clear()
+            else:
+                time.sleep(min(remaining, _POLL_INTERVAL))
+        return True
+
+    def close(self):
+        """Stop edge detection on the busy pin."""
+        if self.edge_events:
+            try:
+                self._gpio.remove_event_detect(self.pin)
+            except (AttributeError, RuntimeError, ValueError):
+                pass
+            self.edge_events = False
@@ -0,0 +1,89 @@
+"""Skip refreshing Inky displays with frames they are already showing."""
+import hashlib
+import json
+import os
+import tempfile
+
+from . import spi
+
+
+def frame_key(planes, *settings):
+    """Return a hex digest identifying a frame.
+
+    :param planes: Sequence of packed display buffers, bytes or numpy arrays.
+    :param settings: Anything else that changes what the panel shows, eg: border colour and LUT.
+    """
+    digest = hashlib.sha1()
+    for plane in planes:
+        digest.update(spi.as_buffer(plane))
+    digest.update(repr(settings).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class FrameCache:
+    """Remember the last frame shown on a display.
+
+    If `path` is given the key and skip count are saved to a small JSON
+    state file, so an unchanged frame is skipped across process restarts.
+    """
+
+    def __init__(self, path=None):
+        """Initialise a frame cache.
+
+        :param str path: State file location, or `None` to keep state in memory only.
+        """
+        self.path = path
+        self.key = None
+        self.skipped = 0
+        self._load()
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+            self.key = state.get('key')
+            self.skipped = int(state.get('skipped', 0))
+        except (IOError, OSError, ValueError, AttributeError):
+            # Missing or corrupt state means the next frame is always shown
+            self.key = None
+
+    def _save(self):
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.inky-', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'key': self.key, 'skipped': self.skipped}, f)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError):
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def check(self, key):
+        """Return True, and count a skipped refresh, if `key` is the frame last shown.
+
+        :param str key: Frame key from :func:`frame_key`.
+        """
+        if key is None or key != self.key:
+            return False
+        self.skipped += 1
+        self._save()
+        return True
+
+    def store(self, key):
+        """Record `key` as the frame now on the display.
+
+        :param str key: Frame key from :func:`frame_key`.
+        """
+        self.key = key
+        self._save()
+
+    def clear(self):
+        """Forget the last frame, so the next one is always shown."""
+        self.store(None)
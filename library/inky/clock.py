@@ -0,0 +1,104 @@
+"""Refresh time model and clocks for simulated displays.
+
+Simulators update instantly unless they're given a :class:`RefreshModel`,
+then each update takes as long as it would on the panel: the controller
+reset, the frame written over SPI at the driver's clock speed, and the
+refresh itself, from the phase lengths of the waveform (LUT) it runs.
+
+Time is kept by a clock, :class:`RealClock` blocks for the modelled time
+while :class:`VirtualClock` only advances a counter, so update cadence
+and multi-display schedules can be planned without waiting::
+
+    >>> from inky.mock import InkyMockWHAT
+    >>> display = InkyMockWHAT('red', headless=True, simulate_time='virtual')
+    >>> display.show()
+    >>> round(display.clock.time(), 1)
+    16.7
+
+"""
+import collections
+import time
+
+
+class RealClock:
+    """Wall clock time, sleeping blocks the caller."""
+
+    def time(self):
+        """Return the current time in seconds."""
+        return time.time()
+
+    def sleep(self, seconds):
+        """Block for `seconds`, returns at once if not positive."""
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class VirtualClock:
+    """Simulated time, advanced by sleeping rather than waiting."""
+
+    def __init__(self, start=0.0):
+        """Initialise a virtual clock.
+
+        :param float start: Time to start from in seconds, default: 0.
+        """
+        self.now = float(start)
+
+    def time(self):
+        """Return the simulated time in seconds."""
+        return self.now
+
+    def sleep(self, seconds):
+        """Advance the simulated time by `seconds`, if positive."""
+        if seconds > 0:
+            self.now += seconds
+
+
+class RefreshModel:
+    """Time taken by each phase of an update on a panel.
+
+    Phases are named as in :mod:`inky.timing`: 'setup' resets the
+    controller, 'spi' writes the setup commands and frame, and 'refresh'
+    waits for the panel to finish running its waveform.
+    """
+
+    def __init__(self, reset, spi_hz, frame_bytes, refresh, setup_bytes=0):
+        """Initialise a refresh model.
+
+        :param float reset: Seconds from the start of an update until the controller accepts commands.
+        :param int spi_hz: SPI clock speed in Hz.
+        :param int frame_bytes: Bytes of pixel data written for each update.
+        :param refresh: Refresh time in seconds, or a dict of refresh times by LUT name, see :func:`inky.waveform.lut_seconds`.
+        :param int setup_bytes: Bytes of commands and register values written for each update.
+        """
+        self.reset = reset
+        self.spi_hz = spi_hz
+        self.frame_bytes = frame_bytes
+        self.refresh = refresh
+        self.setup_bytes = setup_bytes
+
+    def refresh_seconds(self, lut=None):
+        """Return the refresh time for waveform `lut`.
+
+        :param str lut: LUT name, required if refresh times are given by LUT.
+        """
+        if not isinstance(self.refresh, dict):
+            return float(self.refresh)
+        if lut not in self.refresh:
+            raise ValueError('No refresh time for LUT {}, use one of: {}'.format(lut, ', '.join(sorted(self.refresh))))
+        return self.refresh[lut]
+
+    def phases(self, lut=None):
+        """Return an ordered dict of seconds spent in each phase of an update.
+
+        :param str lut: LUT name, required if refresh times are given by LUT.
+        """
+        spi = (self.setup_bytes + self.frame_bytes) * 8.0 / self.spi_hz
+        return collections.OrderedDict((
+            ('setup', self.reset),
+            ('spi', spi),
+            ('refresh', self.refresh_seconds(lut)),
+        ))
+
+    def seconds(self, lut=None):
+        """Return the total time of an update, in seconds."""
+        return sum(self.phases(lut).values())
@@ -0,0 +1,115 @@
+"""Bulk drawing on the display buffer."""
+try:
+    import numpy
+except ImportError:
+    raise ImportError('This library requires the numpy module\nInstall with: sudo apt install python-numpy')
+
+
+def _span(start, length, limit):
+    """Return `start` and `start + length` clipped to 0 to `limit`, or `None` if nothing is left."""
+    start, stop = max(int(start), 0), min(int(start) + int(length), limit)
+    if stop <= start:
+        return None
+    return start, stop
+
+
+class Canvas:
+    """Vectorised drawing primitives, mixed in to the display drivers.
+
+    Each call validates its colour once and writes straight into `buf`
+    with a single numpy operation. Shapes are clipped to the buffer, and
+    coordinates are buffer (x, y) positions as for `set_pixel`.
+
+    Drivers set `_colours` to the buffer values they can display. Drawing
+    replaces any pre-packed planes given to `set_packed`.
+    """
+
+    _colours = (0, 1, 2)
+
+    def _check_colour(self, colour):
+        """Raise a ValueError unless `colour`, a value or array of values, can be displayed."""
+        if numpy.ndim(colour) == 0:
+            valid = colour in self._colours
+        else:
+            # Bounds, then a lookup table of displayable values, is faster than numpy.isin
+            colour = numpy.asarray(colour)
+            table = numpy.zeros(max(self._colours) + 1, dtype=numpy.bool_)
+            table[list(self._colours)] = True
+            valid = colour.size == 0 or (colour.min() >= 0 and colour.max() < len(table) and table[colour].all())
+        if not valid:
+            raise ValueError('Colour {} is not supported, use one of: {}'.format(colour, self._colours))
+
+    def set_pixels(self, xs, ys, v):
+        """Set many pixels at once.
+
+        Points outside the display are skipped.
+
+        :param xs: x positions, a sequence or numpy array.
+        :param ys: y positions, the same length as `xs`, or a single row.
+        :param v: Colour to set, or a sequence of colours the same length as `xs`.
+        """
+        self._check_colour(v)
+        self._packed = None
+        xs, ys = numpy.broadcast_arrays(numpy.asarray(xs, dtype=numpy.intp), numpy.asarray(ys, dtype=numpy.intp))
+        rows, cols = self.buf.shape
+        inside = (xs >= 0) & (xs < cols) & (ys >= 0) & (ys < rows)
+        if not inside.all():
+            xs, ys = xs[inside], ys[inside]
+            if numpy.ndim(v):
+                v = numpy.broadcast_to(v, inside.shape)[inside]
+        self.buf[ys, xs] = v
+
+    def fill_rect(self, x, y, width, height, v):
+        """Fill a rectangle.
+
+        :param int x: x position of the left edge.
+        :param int y: y position of the top edge.
+        :param int width: Width in pixels.
+        :param int height: Height in pixels.
+        :param int v: Colour to fill with.
+        """
+        self._check_colour(v)
+        self._packed = None
+        rows, cols = self.buf.shape
+        xs, ys = _span(x, width, cols), _span(y, height, rows)
+        if xs is not None and ys is not None:
+            self.buf[ys[0]:ys[1], xs[0]:xs[1]] = v
+
+    def hline(self, x, y, length, v):
+        """Draw a horizontal line, from (x, y) to the right.
+
+        :param int x: x position of the left end.
+        :param int y: y position.
+        :param int length: Length in pixels.
+        :param int v: Colour to draw with.
+        """
+        self.fill_rect(x, y, length, 1, v)
+
+    def vline(self, x, y, length, v):
+        """Draw a vertical line, from (x, y) downwards.
+
+        :param int x: x position.
+        :param int y: y position of the top end.
+        :param int length: Length in pixels.
+        :param int v: Colour to draw with.
+        """
+        self.fill_rect(x, y, 1, length, v)
+
+    def blit(self, mask, v, x=0, y=0):
+        """Set the pixels under a mask to a colour.
+
+        :param mask: 2d array, pixels that are True (non-zero) are set.
+        :type mask: :class:`numpy.ndarray`
+        :param int v: Colour to draw with.
+        :param int x: x position of the mask's left edge, default: 0.
+        :param int y: y position of the mask's top edge, default: 0.
+        """
+        self._check_colour(v)
+        self._packed = None
+        mask = numpy.asarray(mask)
+        rows, cols = self.buf.shape
+        xs, ys = _span(x, mask.shape[1], cols), _span(y, mask.shape[0], rows)
+        if xs is None or ys is None:
+            return
+        mask = mask[ys[0] - y:ys[1] - y, xs[0] - x:xs[1] - x]
+        numpy.copyto(self.buf[ys[0]:ys[1], xs[0]:xs[1]], v, casting='unsafe', where=mask.astype(numpy.bool_, copy=False))
@@ -3,6 +3,8 @@
 """Inky display-type EEPROM tools."""
 
 import datetime
+import json
+import os
 import struct
 
 
@@ -135,6 +137,104 @@ def read_eeprom(i2c_bus=None):
         return None
 
 
+def _boot_id():
+    """Return an identifier for the current boot, or `None` if the platform doesn't provide one."""
+    try:
+        with open('/proc/sys/kernel/random/boot_id', 'r') as f:
+            return f.read().strip() or None
+    except (IOError, OSError):
+        return None
+
+
+def default_cache_path():
+    """Return the default detection cache location, under `$XDG_CACHE_HOME` or `~/.cache`."""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'inky', 'eeprom.json')
+
+
+class DetectionCache:
+    """Remember the EEPROM contents, and the driver chosen for them, until the next boot.
+
+    A HAT can only be changed with the power off, so a detection result
+    is valid for as long as the current boot. Results are saved to a small
+    JSON state file with the boot id and library version they were made
+    with; anything else is treated as a miss and detection runs again.
+    """
+
+    def __init__(self, path=None, boot_id=None):
+        """Initialise a detection cache.
+
+        :param str path: State file location, default: from :func:`default_cache_path`.
+        :param str boot_id: Identifier of the current boot, default: read from `/proc`. If unavailable nothing is cached.
+        """
+        from . import __version__
+        self.path = default_cache_path() if path is None else path
+        self.validity = {
+            'boot_id': _boot_id() if boot_id is None else boot_id,
+            'version': __version__,
+        }
+
+    def load(self):
+        """Return a cached (:class:`EPDType` or `None`, driver name or `None`) pair, or `None` on a miss."""
+        if self.validity['boot_id'] is None:
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+            if state.get('validity') != self.validity:
+                return None
+            fields = state['eeprom']
+            epd = None if fields is None else EPDType(
+                fields['width'], fields['height'], fields['color'],
+                fields['pcb_variant'], fields['display_variant'], write_time=fields['write_time'])
+            return epd, state['driver']
+        except (IOError, OSError, ValueError, KeyError, TypeError, AttributeError):
+            # Missing or corrupt state means detecting again
+            return None
+
+    def store(self, epd, driver):
+        """Save a detection result, silently giving up if the state file can't be written.
+
+        :param epd: :class:`EPDType` read from the EEPROM, or `None` if there's no EEPROM.
+        :param str driver: Name of the driver chosen for the display, or `None`.
+        """
+        if self.validity['boot_id'] is None:
+            return
+        write_time = None if epd is None else epd.eeprom_write_time
+        if isinstance(write_time, bytes):
+            # Read from the EEPROM as bytes
+            write_time = write_time.decode('ascii', 'replace')
+        fields = None if epd is None else {
+            'width': epd.width,
+            'height': epd.height,
+            'color': epd.color,
+            'pcb_variant': epd.pcb_variant,
+            'display_variant': epd.display_variant,
+            'write_time': write_time,
+        }
+        import tempfile
+        tmp_path = None
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            fd, tmp_path = tempfile.mkstemp(prefix='.inky-', dir=directory)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'validity': self.validity, 'eeprom': fields, 'driver': driver}, f)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError):
+            # A read-only or unwritable cache only costs the next start its EEPROM read
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def clear(self):
+        """Forget the cached result, so the next start reads the EEPROM."""
+        try:
+            os.unlink(self.path)
+        except (IOError, OSError):
+            pass
+
+
 def main(args):
     """EEPROM Test Function."""
     print(read_eeprom())
@@ -0,0 +1,678 @@
+"""Software emulators for the Inky display controllers.
+
+Each emulator stands in for the hardware behind a driver. It provides an
+`spi` bus and `gpio` module to pass to the driver as `spi_bus` and
+`gpio`, plus an `i2c` bus with an optional EEPROM. The command stream
+the driver writes is decoded into controller RAM, and the panel image is
+latched from RAM whenever a refresh is triggered::
+
+    >>> from inky import emulator, inky_uc8159
+    >>> panel = emulator.UC8159Emulator(600, 448, time_scale=0)
+    >>> display = inky_uc8159.Inky(spi_bus=panel.spi, gpio=panel.gpio, i2c_bus=panel.i2c)
+    >>> display.show()
+    >>> panel.image()
+
+Unlike the mock displays, which render `buf` directly, this runs the
+real driver code, so bugs in packing, RAM windowing and command
+sequencing show up in the emulated image or in :attr:`errors`.
+
+The busy signal is held for a configurable time after each operation,
+scaled by `time_scale`. Pass `time_scale=0` for instant operation.
+"""
+import collections
+import time
+
+try:
+    import numpy
+except ImportError:
+    raise ImportError('This library requires the numpy module\nInstall with: sudo apt install python-numpy')
+
+from . import inky_ssd1608, ssd1608, waveform
+
+RESET_PIN = 27
+BUSY_PIN = 17
+DC_PIN = 22
+
+_SPI_COMMAND = 0
+_SPI_DATA = 1
+
+# Number of recent commands kept in Emulator.commands
+_COMMAND_LOG = 1024
+
+
+class EmulatedSPI:
+    """Stand-in for :class:`spidev.SpiDev` that feeds writes to an emulated controller."""
+
+    def __init__(self, controller):
+        """Initialise an emulated SPI bus.
+
+        :param controller: Emulator receiving the bytes written.
+        """
+        self._controller = controller
+        self.max_speed_hz = 0
+        self.mode = 0
+        self.no_cs = False
+        self.threewire = False
+        self.bytes_written = 0
+        self.transfers = 0
+
+    def open(self, bus, device):
+        """Open the SPI device."""
+
+    def close(self):
+        """Close the SPI device."""
+
+    def writebytes2(self, values):
+        """Write a buffer of bytes."""
+        values = bytearray(values)
+        self.bytes_written += len(values)
+        self.transfers += 1
+        self._controller._write(values)
+
+    def writebytes(self, values):
+        """Write a list of bytes."""
+        self.writebytes2(values)
+
+    def readbytes(self, count):
+        """Read bytes, only returned in 3-wire mode, as the panel has no separate data out line."""
+        if not self.threewire:
+            return [0] * count
+        return self._controller._read(count)
+
+    def xfer3(self, values):
+        """Write a list of bytes, returning the (all zero) bytes read."""
+        self.writebytes2(values)
+        return [0] * len(values)
+
+    xfer = xfer3
+    xfer2 = xfer3
+
+
+class EmulatedGPIO:
+    """Stand-in for the RPi.GPIO module wired to an emulated controller.
+
+    Tracks the data/command and reset pins and drives the busy pin.
+    Edge detection is not emulated, so busy waits fall back to polling.
+    """
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_UP = 22
+    PUD_DOWN = 21
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self, controller):
+        """Initialise emulated GPIO.
+
+        :param controller: Emulator whose pins this drives.
+        """
+        self._controller = controller
+        self.levels = {}
+
+    def setmode(self, mode):
+        """Set the pin numbering mode."""
+
+    def setwarnings(self, enabled):
+        """Enable or disable warnings."""
+
+    def setup(self, pin, mode, initial=LOW, pull_up_down=PUD_OFF):
+        """Set up a pin."""
+        if mode == self.OUT:
+            self.output(pin, initial)
+
+    def output(self, pin, level):
+        """Drive an output pin."""
+        previous = self.levels.get(pin)
+        self.levels[pin] = level
+        controller = self._controller
+        if pin == controller.dc_pin:
+            controller._dc = level
+        elif pin == controller.reset_pin:
+            if level == self.LOW:
+                controller._in_reset = True
+            elif previous == self.LOW:
+                controller._hardware_reset()
+
+    def input(self, pin):
+        """Read a pin."""
+        controller = self._controller
+        if pin == controller.busy_pin:
+            busy = controller.busy()
+            return self.LOW if busy == controller.BUSY_ACTIVE_LOW else self.HIGH
+        return self.levels.get(pin, self.LOW)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        """Edge detection is not emulated."""
+        raise RuntimeError('Edge detection is not emulated')
+
+    def remove_event_detect(self, pin):
+        """Remove edge detection from a pin."""
+
+    def cleanup(self, pin=None):
+        """Release pins."""
+
+
+class EmulatedI2C:
+    """Stand-in for :class:`smbus2.SMBus` with an optional Inky EEPROM."""
+
+    def __init__(self, eeprom=None):
+        """Initialise an emulated I2C bus.
+
+        :param eeprom: :class:`inky.eeprom.EPDType` to report, or `None` for no EEPROM.
+        """
+        self.eeprom = eeprom
+        self.reads = 0
+
+    def write_i2c_block_data(self, i2c_address, register, values):
+        """Write to the EEPROM, only setting the read address is supported."""
+        if self.eeprom is None:
+            raise IOError('No EEPROM')
+
+    def read_i2c_block_data(self, i2c_address, register, length):
+        """Read from the EEPROM."""
+        self.reads += 1
+        if self.eeprom is None:
+            raise IOError('No EEPROM')
+        return list(bytearray(self.eeprom.encode()))[register:register + length]
+
+
+class Emulator:
+    """Base class for emulated display controllers.
+
+    Subclasses handle commands in :meth:`_on_command` and their data, as it
+    arrives, in :meth:`_on_data`.
+    """
+
+    # Busy pin level while busy is LOW if True, HIGH if False
+    BUSY_ACTIVE_LOW = False
+
+    # Default time in seconds the controller is busy after each operation
+    BUSY_TIMES = {}
+
+    def __init__(self, cols, rows, time_scale=1.0, busy_times=None, strict=False, eeprom=None,
+                 dc_pin=DC_PIN, reset_pin=RESET_PIN, busy_pin=BUSY_PIN):
+        """Initialise an emulated controller.
+
+        :param int cols: Panel source outputs, in pixels, matches the driver's `cols`.
+        :param int rows: Panel gate outputs, in pixels, matches the driver's `rows`.
+        :param float time_scale: Multiplier for busy times, 0 for instant operation, default: 1.0.
+        :param dict busy_times: Override the default busy time of any operation in `BUSY_TIMES`.
+        :param bool strict: Raise RuntimeError on a sequencing error, rather than recording it in :attr:`errors`.
+        :param eeprom: :class:`inky.eeprom.EPDType` reported over I2C, or `None` for no EEPROM.
+        :param int dc_pin: Data/command pin by BCM number.
+        :param int reset_pin: Reset pin by BCM number.
+        :param int busy_pin: Busy pin by BCM number.
+        """
+        self.cols = cols
+        self.rows = rows
+        self.time_scale = time_scale
+        self.busy_times = dict(self.BUSY_TIMES)
+        if busy_times is not None:
+            self.busy_times.update(busy_times)
+        self.strict = strict
+
+        self.dc_pin = dc_pin
+        self.reset_pin = reset_pin
+        self.busy_pin = busy_pin
+
+        self.spi = EmulatedSPI(self)
+        self.gpio = EmulatedGPIO(self)
+        self.i2c = EmulatedI2C(eeprom)
+
+        # Sequencing problems, eg: a command sent during deep sleep
+        self.errors = []
+        # Recent (command, data) pairs, oldest first
+        self.commands = collections.deque(maxlen=_COMMAND_LOG)
+        # Panel image latched by the last refresh, see image()
+        self.frame = None
+        self.refreshes = 0
+        self.resets = 0
+        self.asleep = False
+        self.registers = {}
+
+        self._dc = _SPI_COMMAND
+        self._in_reset = False
+        self._busy_until = 0.0
+        self._command = None
+        self._params = bytearray()
+        self._read_data = bytearray()
+
+    def busy(self):
+        """Return True while the controller is busy."""
+        return time.time() < self._busy_until
+
+    def _start_busy(self, operation):
+        """Hold the busy signal for the duration of `operation`."""
+        seconds = self.busy_times.get(operation, 0.0) * self.time_scale
+        self._busy_until = max(self._busy_until, time.time() + seconds)
+
+    def _error(self, message):
+        if self.strict:
+            raise RuntimeError(message)
+        self.errors.append(message)
+
+    def _hardware_reset(self):
+        """Handle a pulse of the reset pin."""
+        self._in_reset = False
+        self._finish_command()
+        self.asleep = False
+        self.resets += 1
+        self._reset_registers()
+        self._start_busy('reset')
+
+    def _reset_registers(self):
+        """Return registers to their power on defaults, controller RAM is retained."""
+        self.registers = {}
+
+    def _write(self, values):
+        """Handle bytes written over SPI."""
+        if self._in_reset:
+            self._error('SPI write while reset is held low')
+            return
+
+        if self._dc == _SPI_COMMAND:
+            for command in values:
+                self._begin_command(command)
+        elif self._command is not None:
+            self._on_data(self._command, values)
+
+    def _read(self, count):
+        """Return `count` bytes read back for the last command, zeros once there's nothing left to read."""
+        data, self._read_data = self._read_data[:count], self._read_data[count:]
+        return list(data) + [0] * (count - len(data))
+
+    def _begin_command(self, command):
+        """Start handling a command byte."""
+        self._finish_command()
+        self._read_data = bytearray()
+
+        if self.asleep:
+            self._error('Command 0x{:02x} sent during deep sleep'.format(command))
+            return
+        if self.busy():
+            self._error('Command 0x{:02x} sent while busy'.format(command))
+
+        self._command = command
+        self._params = bytearray()
+        self._on_command(command)
+
+    def _finish_command(self):
+        """Log the command in progress."""
+        if self._command is not None:
+            self.commands.append((self._command, bytes(self._params)))
+        self._command = None
+
+    def _on_command(self, command):
+        """Handle a command byte, before any data.
+
+        Does nothing here, controllers with commands that act before their
+        data, eg: a refresh, override it in :class:`_SSD16xxEmulator` and
+        :class:`UC8159Emulator`.
+        """
+
+    def _on_data(self, command, values):
+        """Handle data bytes for `command` as they arrive."""
+        self._params.extend(values)
+        self.registers[command] = bytes(self._params)
+
+    def image(self, rotation=0, h_flip=False, v_flip=False):
+        """Return the image on the panel, oriented like the driver's `buf`.
+
+        Reverses the rotation and flips a driver applies before writing,
+        so with the driver's settings the result can be compared to `buf`.
+        Returns `None` until the first refresh.
+
+        :param int rotation: Driver rotation in degrees, eg: `display.rotation`.
+        :param bool h_flip: Driver `h_flip`.
+        :param bool v_flip: Driver `v_flip`.
+        """
+        if self.frame is None:
+            return None
+        region = self.frame
+        if rotation:
+            region = numpy.rot90(region, -(rotation // 90))
+        if h_flip:
+            region = numpy.flipud(region)
+        if v_flip:
+            region = numpy.fliplr(region)
+        return region
+
+
+class _SSD16xxEmulator(Emulator):
+    """Shared emulation of the SSD16xx family RAM and command set.
+
+    Controller RAM holds a black/white plane and a red/yellow plane, one bit
+    per pixel, written through an address window with auto-incrementing
+    pointers as set by the data entry mode.
+    """
+
+    DRIVER_CONTROL = 0x01
+    DEEP_SLEEP = 0x10
+    DATA_MODE = 0x11
+    SW_RESET = 0x12
+    TEMP_READ = 0x1B
+    MASTER_ACTIVATE = 0x20
+    DISP_CTRL2 = 0x22
+    WRITE_RAM = 0x24
+    WRITE_ALTRAM = 0x26
+    WRITE_LUT = 0x32
+    WRITE_BORDER = 0x3C
+    SET_RAMXPOS = 0x44
+    SET_RAMYPOS = 0x45
+    SET_RAMXCOUNT = 0x4E
+    SET_RAMYCOUNT = 0x4F
+
+    # Panel colour of each border waveform register value written by the driver
+    BORDER_COLOURS = {}
+
+    def __init__(self, cols, rows, **kwargs):
+        """Initialise an emulated SSD16xx controller, see :class:`Emulator`."""
+        Emulator.__init__(self, cols, rows, **kwargs)
+        self.row_bytes = (cols + 7) // 8
+        self.ram_bw = numpy.zeros((rows, self.row_bytes), dtype=numpy.uint8)
+        self.ram_colour = numpy.zeros((rows, self.row_bytes), dtype=numpy.uint8)
+        self.bytes_to_ram = 0
+        self._ram = None
+        # Panel temperature in degrees C measured by the sensor, or `None` for no reading
+        self.temperature = 20.0
+        self.temperature_register = 0
+        self._reset_registers()
+
+    def _hardware_reset(self):
+        Emulator._hardware_reset(self)
+        self.temperature_register = 0
+
+    def _reset_registers(self):
+        Emulator._reset_registers(self)
+        self.update_control = None
+        self.data_mode = 0x03
+        self.x_window = (0, self.row_bytes - 1)
+        self.y_window = (0, self.rows - 1)
+        self.x = 0
+        self.y = 0
+        self.gates = self.rows
+        self.border = None
+        self.lut = None
+
+    @property
+    def border_colour(self):
+        """Return the panel colour of the border, if known."""
+        return self.BORDER_COLOURS.get(self.border)
+
+    def _on_command(self, command):
+        if command == self.SW_RESET:
+            self._reset_registers()
+            self._start_busy('soft_reset')
+        elif command == self.MASTER_ACTIVATE:
+            # Without an update sequence the controller's default loads the temperature then refreshes
+            control = 0xFF if self.update_control is None else self.update_control
+            if control & 0x20:
+                self._load_temperature()
+            if control & 0x04:
+                self._refresh()
+        elif command == self.TEMP_READ:
+            value = self.temperature_register
+            self._read_data = bytearray([value >> 4, (value & 0x0F) << 4])
+        elif command in (self.WRITE_RAM, self.WRITE_ALTRAM):
+            self._ram = self.ram_bw if command == self.WRITE_RAM else self.ram_colour
+
+    def _on_data(self, command, values):
+        if command in (self.WRITE_RAM, self.WRITE_ALTRAM):
+            self._write_ram(values)
+            return
+
+        Emulator._on_data(self, command, values)
+        params = self._params
+
+        if command == self.DRIVER_CONTROL and len(params) >= 2:
+            self.gates = (params[0] | (params[1] << 8)) + 1
+        elif command == self.DATA_MODE:
+            self.data_mode = params[0]
+        elif command == self.SET_RAMXPOS and len(params) >= 2:
+            self.x_window = (params[0], params[1])
+        elif command == self.SET_RAMYPOS and len(params) >= 4:
+            self.y_window = (params[0] | (params[1] << 8), params[2] | (params[3] << 8))
+        elif command == self.SET_RAMXCOUNT:
+            self.x = params[0]
+        elif command == self.SET_RAMYCOUNT and len(params) >= 2:
+            self.y = params[0] | (params[1] << 8)
+        elif command == self.WRITE_BORDER:
+            self.border = params[0]
+        elif command == self.WRITE_LUT:
+            self.lut = bytes(params)
+        elif command == self.DISP_CTRL2:
+            self.update_control = params[0]
+        elif command == self.DEEP_SLEEP and params[0] & 0x03:
+            self.asleep = True
+
+    def _axis(self, window, position, increment):
+        """Return the bounds and length of a RAM window axis, and how far `position` is along it."""
+        low, high = min(window), max(window)
+        length = high - low + 1
+        step = position - low if increment else high - position
+        return low, high, length, step
+
+    def _write_ram(self, values):
+        """Write bytes at the address counters, advancing them through the RAM window."""
+        count = len(values)
+        if count == 0:
+            return
+        self.bytes_to_ram += count
+
+        x_inc = bool(self.data_mode & 0x01)
+        y_inc = bool(self.data_mode & 0x02)
+        y_first = bool(self.data_mode & 0x04)
+
+        x_low, x_high, x_len, x_step = self._axis(self.x_window, self.x, x_inc)
+        y_low, y_high, y_len, y_step = self._axis(self.y_window, self.y, y_inc)
+
+        steps = numpy.arange(count)
+        if y_first:
+            index = x_step * y_len + y_step + steps
+            ys = index % y_len
+            xs = (index // y_len) % x_len
+        else:
+            index = y_step * x_len + x_step + steps
+            xs = index % x_len
+            ys = (index // x_len) % y_len
+
+        xs = x_low + xs if x_inc else x_high - xs
+        ys = y_low + ys if y_inc else y_high - ys
+
+        inside = (xs < self.row_bytes) & (ys < self.rows)
+        if not inside.all():
+            self._error('RAM write outside of {}x{} bytes'.format(self.row_bytes, self.rows))
+        data = numpy.frombuffer(bytes(values), dtype=numpy.uint8)
+        self._ram[ys[inside], xs[inside]] = data[inside]
+
+        # Counters point at the address after the last byte written
+        next_index = index[-1] + 1
+        if y_first:
+            next_y, next_x = next_index % y_len, (next_index // y_len) % x_len
+        else:
+            next_x, next_y = next_index % x_len, (next_index // x_len) % y_len
+        self.x = x_low + next_x if x_inc else x_high - next_x
+        self.y = y_low + next_y if y_inc else y_high - next_y
+
+    def _load_temperature(self):
+        """Load the sensor reading into the temperature register, as 12-bit 1/16ths of a degree."""
+        if self.temperature is not None:
+            self.temperature_register = int(round(self.temperature * 16)) & 0xFFF
+        self._start_busy('temperature')
+
+    def _refresh(self):
+        """Latch the panel image from RAM: 0 = white, 1 = black, 2 = red/yellow."""
+        gates = min(self.gates, self.rows)
+        bw = numpy.unpackbits(self.ram_bw[:gates], axis=1)[:, :self.cols]
+        colour = numpy.unpackbits(self.ram_colour[:gates], axis=1)[:, :self.cols]
+        frame = numpy.where(bw, 0, 1).astype(numpy.uint8)
+        frame[colour.astype(numpy.bool_)] = 2
+        self.frame = frame
+        self.refreshes += 1
+        self._start_busy('refresh')
+
+
+class InkyEmulator(_SSD16xxEmulator):
+    """Emulate the wHAT and original pHAT controller, see :class:`inky.inky.Inky`.
+
+    Pass the driver's `cols` and `rows`, eg: 400, 300 for wHAT or 104, 212 for pHAT.
+    """
+
+    # Approximate times for a tri-colour panel
+    BUSY_TIMES = {
+        'reset': 0.001,
+        'soft_reset': 0.002,
+        'temperature': 0.002,
+        'refresh': 15.0,
+    }
+
+    BORDER_COLOURS = {
+        0b00000000: 'black',
+        0b01110011: 'red',
+        0b00110011: 'yellow',
+        0b00110001: 'white',
+    }
+
+
+class SSD1608Emulator(_SSD16xxEmulator):
+    """Emulate the SSD1608 controller, see :class:`inky.inky_ssd1608.Inky`.
+
+    Pass the driver's `cols` and `rows`, eg: 136, 250 for the 250x122 pHAT.
+    """
+
+    DRIVER_CONTROL = ssd1608.DRIVER_CONTROL
+    DEEP_SLEEP = ssd1608.DEEP_SLEEP
+    DATA_MODE = ssd1608.DATA_MODE
+    SW_RESET = ssd1608.SW_RESET
+    TEMP_READ = ssd1608.TEMP_READ
+    MASTER_ACTIVATE = ssd1608.MASTER_ACTIVATE
+    DISP_CTRL2 = ssd1608.DISP_CTRL2
+    WRITE_RAM = ssd1608.WRITE_RAM
+    WRITE_ALTRAM = ssd1608.WRITE_ALTRAM
+    WRITE_LUT = ssd1608.WRITE_LUT
+    WRITE_BORDER = ssd1608.WRITE_BORDER
+    SET_RAMXPOS = ssd1608.SET_RAMXPOS
+    SET_RAMYPOS = ssd1608.SET_RAMYPOS
+    SET_RAMXCOUNT = ssd1608.SET_RAMXCOUNT
+    SET_RAMYCOUNT = ssd1608.SET_RAMYCOUNT
+
+    # Approximate times, the refresh runs the driver's tri-colour LUT at the SSD1608 frame rate
+    BUSY_TIMES = {
+        'reset': 0.001,
+        'soft_reset': 0.002,
+        'temperature': 0.002,
+        'refresh': waveform.lut_seconds(inky_ssd1608._LUTS['red'], 'ssd1608'),
+    }
+
+    BORDER_COLOURS = {
+        0b00000000: 'black',
+        0b00000110: 'red',
+        0b00001111: 'yellow',
+        0b00000001: 'white',
+    }
+
+
+class UC8159Emulator(Emulator):
+    """Emulate the UC8159 7-colour controller, see :class:`inky.inky_uc8159.Inky`.
+
+    Pass the panel resolution, eg: 600, 448 or 640, 400.
+    """
+
+    PSR = 0x00
+    POF = 0x02
+    PON = 0x04
+    DSLP = 0x07
+    DTM1 = 0x10
+    DRF = 0x12
+    CDI = 0x50
+    TRES = 0x61
+
+    BUSY_ACTIVE_LOW = True
+
+    # Approximate times for the 7-colour panels
+    BUSY_TIMES = {
+        'reset': 0.001,
+        'power_on': 0.1,
+        'refresh': 25.0,
+        'power_off': 0.1,
+    }
+
+    def __init__(self, cols, rows, **kwargs):
+        """Initialise an emulated UC8159 controller, see :class:`Emulator`."""
+        Emulator.__init__(self, cols, rows, **kwargs)
+        self.ram = numpy.zeros(cols * rows, dtype=numpy.uint8)
+        self.bytes_to_ram = 0
+        self.powered = False
+        self._pointer = 0
+        self._reset_registers()
+
+    def _reset_registers(self):
+        Emulator._reset_registers(self)
+        self.resolution = (self.cols, self.rows)
+        self.border = None
+
+    @property
+    def border_colour(self):
+        """Return the palette index of the border colour, if known."""
+        return self.border
+
+    def _on_command(self, command):
+        if command == self.DTM1:
+            self._pointer = 0
+        elif command == self.PON:
+            self.powered = True
+            self._start_busy('power_on')
+        elif command == self.POF:
+            self.powered = False
+            self._start_busy('power_off')
+        elif command == self.DRF:
+            self._refresh()
+
+    def _on_data(self, command, values):
+        if command == self.DTM1:
+            self._write_ram(values)
+            return
+
+        Emulator._on_data(self, command, values)
+        params = self._params
+
+        if command == self.TRES and len(params) >= 4:
+            self.resolution = ((params[0] << 8) | params[1], (params[2] << 8) | params[3])
+            if self.resolution != (self.cols, self.rows):
+                self._error('Resolution set to {}x{}, panel is {}x{}'.format(
+                    self.resolution[0], self.resolution[1], self.cols, self.rows))
+        elif command == self.CDI:
+            self.border = params[0] >> 5
+        elif command == self.DSLP and params[0] == 0xA5:
+            self.asleep = True
+
+    def _write_ram(self, values):
+        """Write two 4-bit pixels per byte, high nibble first, at the data pointer."""
+        data = numpy.frombuffer(bytes(values), dtype=numpy.uint8)
+        self.bytes_to_ram += len(data)
+
+        start = self._pointer
+        end = start + len(data) * 2
+        if end > len(self.ram):
+            self._error('DTM1 data beyond the end of RAM')
+            data = data[:(len(self.ram) - start) // 2]
+            end = start + len(data) * 2
+
+        self.ram[start:end:2] = data >> 4
+        self.ram[start + 1:end:2] = data & 0x0F
+        self._pointer = end
+
+    def _refresh(self):
+        """Latch the panel image from RAM as palette indexes."""
+        if not self.powered:
+            self._error('Refresh with the panel power off')
+        self.frame = self.ram.reshape((self.rows, self.cols)).copy()
+        self.refreshes += 1
+        self._start_busy('refresh')
@@ -0,0 +1,132 @@
+"""Drive several Inky displays sharing one SPI bus."""
+import threading
+
+
+class LockedGPIO:
+    """Proxy for a GPIO module that serialises calls from several displays.
+
+    Attributes, such as pin numbering constants, are passed through. Calls
+    are made while holding `lock`.
+    """
+
+    def __init__(self, gpio, lock):
+        """Initialise a locked GPIO proxy.
+
+        :param gpio: GPIO module, eg: `RPi.GPIO`.
+        :param lock: Lock shared by every display on the bus, must be re-entrant.
+        """
+        self._gpio = gpio
+        self._lock = lock
+
+    def __getattr__(self, name):
+        """Return a GPIO attribute, wrapping functions so they run under the lock."""
+        attr = getattr(self._gpio, name)
+        if not callable(attr):
+            return attr
+
+        lock = self._lock
+
+        def locked(*args, **kwargs):
+            with lock:
+                return attr(*args, **kwargs)
+
+        # Cache the wrapper, later lookups don't reach __getattr__
+        setattr(self, name, locked)
+        return locked
+
+
+class DisplayGroup:
+    """Update several displays on separate chip-selects concurrently.
+
+    Each display's SPI transfers, along with the data/command and
+    chip-select lines, are made while holding a bus lock shared by the
+    group, so transfers from different displays interleave without
+    corrupting each other. GPIO set up calls use the same lock.
+
+    :meth:`show` runs every display's update in its own thread. While one
+    display waits for its refresh to finish the bus is free for the
+    others, so N displays refresh in about the time of the slowest one
+    plus the time to transfer every frame.
+
+    Each display needs its own chip-select, reset and busy pins. The
+    data/command pin may be shared.
+    """
+
+    def __init__(self, displays, gpio=None):
+        """Initialise a group of displays.
+
+        :param displays: Inky drivers, eg: :class:`inky.InkyWHAT` or :class:`inky.inky_uc8159.Inky`.
+        :param gpio: GPIO module shared by the displays, default: each display's own, or `RPi.GPIO`.
+        """
+        self.displays = list(displays)
+        if not self.displays:
+            raise ValueError('A display group needs at least one display')
+
+        for attr in ('busy_pin', 'reset_pin'):
+            pins = [getattr(display, attr) for display in self.displays]
+            if len(set(pins)) != len(pins):
+                raise ValueError('Each display in a group needs its own {}, got: {}'.format(attr, pins))
+
+        selects = [(getattr(display, 'cs_pin', None), getattr(display, 'cs_channel', None)) for display in self.displays]
+        if len(set(selects)) != len(selects):
+            raise ValueError('Each display in a group needs its own chip-select')
+
+        self.lock = threading.RLock()
+
+        for display in self.displays:
+            display_gpio = display._gpio or gpio
+            if display_gpio is None:
+                try:
+                    import RPi.GPIO as display_gpio
+                except ImportError:
+                    raise ImportError('This library requires the RPi.GPIO module\nInstall with: sudo apt install python-rpi.gpio')
+            if not isinstance(display_gpio, LockedGPIO):
+                display_gpio = LockedGPIO(display_gpio, self.lock)
+            display._gpio = display_gpio
+            display._bus_lock = self.lock
+
+    def __iter__(self):
+        """Iterate over the displays in the group."""
+        return iter(self.displays)
+
+    def __len__(self):
+        """Return the number of displays in the group."""
+        return len(self.displays)
+
+    def __getitem__(self, index):
+        """Return a display by position."""
+        return self.displays[index]
+
+    def show(self, busy_wait=True, force=False):
+        """Show every display's buffer, updating the displays concurrently.
+
+        Returns once every update has finished. If any update raises, the
+        others still complete and the first exception is raised afterwards.
+
+        :param bool busy_wait: If True, wait for every refresh to finish before returning, default: `True`.
+        :param bool force: If True, refresh even if a display's `frame_cache` says its frame is already shown, default: `False`.
+        """
+        errors = [None] * len(self.displays)
+
+        def update(index, display):
+            try:
+                display.show(busy_wait=busy_wait, force=force)
+            except Exception as e:
+                errors[index] = e
+
+        threads = [threading.Thread(target=update, args=(index, display), name='inky-group-{}'.format(index))
+                   for index, display in enumerate(self.displays)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def sleep(self):
+        """Put every display into deep sleep, see each driver's `sleep`."""
+        for display in self.displays:
+            display.sleep()
@@ -1,8 +1,9 @@
 """Inky e-Ink Display Driver."""
+import threading
 import time
 import struct
 
-from . import eeprom
+from . import buffer, busy, cache, draw, eeprom, packing, program, spi, timing, waveform
 
 try:
     import numpy
@@ -28,10 +29,18 @@ DC_PIN = 22
 # SPI channel for device 0
 CS0 = 0
 
-_SPI_CHUNK_SIZE = 4096
+# Shortest reset pulse used in warm_wake mode, the controller then signals ready on the busy line
+_RESET_PULSE = 0.01
+
+# SPI clock speed in Hz
+_SPI_SPEED_HZ = 488000
+
 _SPI_COMMAND = 0
 _SPI_DATA = 1
 
+# Setup commands that only write register values, and can be skipped if unchanged
+_REGISTERS = (0x01, 0x03, 0x04, 0x11, 0x18, 0x2c, 0x32, 0x3a, 0x3b, 0x3c, 0x74, 0x7e)
+
 _RESOLUTION = {
     (600, 448): (600, 448, 0),
     (400, 300): (400, 300, 0),
@@ -40,7 +49,132 @@ _RESOLUTION = {
 }
 
 
-class Inky:
+"""Inky Lookup Tables.
+
+These lookup tables comprise of two sets of values.
+
+The first set of values, formatted as binary, describe the voltages applied during the six update phases:
+
+  Phase 0     Phase 1     Phase 2     Phase 3     Phase 4     Phase 5     Phase 6
+  A B C D
+0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,  LUT0 - Black
+0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,  LUT1 - White
+0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,  NOT USED BY HARDWARE
+0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,  LUT3 - Yellow or Red
+0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,  LUT4 - VCOM
+
+There are seven possible phases, arranged horizontally, and only the phases with duration/repeat information
+(see below) are used during the update cycle.
+
+Each phase has four steps: A, B, C and D. Each step is represented by two binary bits and these bits can
+have one of four possible values representing the voltages to be applied. The default values follow:
+
+0b00: VSS or Ground
+0b01: VSH1 or 15V
+0b10: VSL or -15V
+0b11: VSH2 or 5.4V
+
+During each phase the Black, White and Yellow (or Red) stages are applied in turn, creating a voltage
+differential across each display pixel. This is what moves the physical ink particles in their suspension.
+
+The second set of values, formatted as hex, describe the duration of each step in a phase, and the number
+of times that phase should be repeated:
+
+  Duration                Repeat
+  A     B     C     D
+0x10, 0x04, 0x04, 0x04, 0x04,  <-- Timings for Phase 0
+0x10, 0x04, 0x04, 0x04, 0x04,  <-- Timings for Phase 1
+0x04, 0x08, 0x08, 0x10, 0x10,      etc
+0x00, 0x00, 0x00, 0x00, 0x00,
+0x00, 0x00, 0x00, 0x00, 0x00,
+0x00, 0x00, 0x00, 0x00, 0x00,
+0x00, 0x00, 0x00, 0x00, 0x00,
+
+The duration and repeat parameters allow you to take a single sequence of A, B, C and D voltage values and
+transform them into a waveform that - effectively - wiggles the ink particles into the desired position.
+
+In all of our LUT definitions we use the first and second phases to flash/pulse and clear the display to
+mitigate image retention. The flashing effect is actually the ink particles being moved from the bottom to
+the top of the display repeatedly in an attempt to reset them back into a sensible resting position.
+
+"""
+_LUTS = {
+    'black': [
+        0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,
+        0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0x10, 0x04, 0x04, 0x04, 0x04,
+        0x10, 0x04, 0x04, 0x04, 0x04,
+        0x04, 0x08, 0x08, 0x10, 0x10,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+    ],
+    'red': [
+        0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,
+        0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0x40, 0x0C, 0x20, 0x0C, 0x06,
+        0x10, 0x08, 0x04, 0x04, 0x06,
+        0x04, 0x08, 0x08, 0x10, 0x10,
+        0x02, 0x02, 0x02, 0x40, 0x20,
+        0x02, 0x02, 0x02, 0x02, 0x02,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00
+    ],
+    'red_ht': [
+        0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00010000, 0b00010000,
+        0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b10000000, 0b10000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b01001000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0x43, 0x0A, 0x1F, 0x0A, 0x04,
+        0x10, 0x08, 0x04, 0x04, 0x06,
+        0x04, 0x08, 0x08, 0x10, 0x0B,
+        0x02, 0x04, 0x04, 0x40, 0x10,
+        0x06, 0x06, 0x06, 0x02, 0x02,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00
+    ],
+    'yellow': [
+        0b11111010, 0b10010100, 0b10001100, 0b11000000, 0b11010000, 0b00000000, 0b00000000,
+        0b11111010, 0b10010100, 0b00101100, 0b10000000, 0b11100000, 0b00000000, 0b00000000,
+        0b11111010, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b11111010, 0b10010100, 0b11111000, 0b10000000, 0b01010000, 0b00000000, 0b11001100,
+        0b10111111, 0b01011000, 0b11111100, 0b10000000, 0b11010000, 0b00000000, 0b00010001,
+        0x40, 0x10, 0x40, 0x10, 0x08,
+        0x08, 0x10, 0x04, 0x04, 0x10,
+        0x08, 0x08, 0x03, 0x08, 0x20,
+        0x08, 0x04, 0x00, 0x00, 0x10,
+        0x10, 0x08, 0x08, 0x00, 0x20,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+    ],
+    # Black/white only: the 'black' voltages without the flashing phases 0 and 1, red/yellow isn't driven
+    # Hand-made from the 'black' LUT and untested on a panel, unlike the vendor supplied tables above
+    'black_fast': [
+        0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,
+        0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x04, 0x08, 0x08, 0x10, 0x10,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00,
+    ]
+}
+
+
+class Inky(draw.Canvas):
     """Inky e-Ink Display Driver.
 
     Generally it is more convenient to use either the :class:`inky.InkyPHAT` or :class:`inky.InkyWHAT` classes.
@@ -51,8 +185,12 @@ class Inky:
     RED = 2
     YELLOW = 2
 
+    # Controller name, see waveform.lut_phases and record.Archive
+    _CONTROLLER = 'ssd1675'
+
     def __init__(self, resolution=(400, 300), colour='black', cs_channel=CS0, dc_pin=DC_PIN, reset_pin=RESET_PIN, busy_pin=BUSY_PIN, h_flip=False, v_flip=False,
-                 spi_bus=None, i2c_bus=None, gpio=None):
+                 spi_bus=None, i2c_bus=None, gpio=None, partial_update=False, frame_cache=None, warm_wake=False, timings=None,
+                 epd_type=None, refresh_mode=waveform.REFRESH_FULL, temperature=None):
         """Initialise an Inky Display.
 
         :param resolution: Display resolution (width, height) in pixels, default: (400, 300).
@@ -70,6 +208,14 @@ class Inky:
         :type i2c_bus: :class:`smbus2.SMBus`
         :param gpio: GPIO module. If `None` then `RPi.GPIO` is imported. Default: `None`.
         :type gpio: :class:`RPi.GPIO`
+        :param bool partial_update: Only write the changed region of controller RAM on each update, default: `False`.
+        :param frame_cache: State file path or :class:`inky.cache.FrameCache`. If set, unchanged frames are not refreshed. Default: `None`.
+        :param bool warm_wake: Keep the controller awake between updates and only reset it after deep sleep or an error, default: `False`.
+        :param timings: :class:`inky.timing.Timings`, or a callback taking (phase, seconds, nbytes), to time each phase of an update. Default: `None`.
+        :param epd_type: EEPROM contents already read, eg: by :func:`inky.auto`. If `None` the EEPROM is read over `i2c_bus`. Default: `None`.
+        :type epd_type: :class:`inky.eeprom.EPDType`
+        :param str refresh_mode: 'full' to always use the full waveform, or 'auto' to use the quickest safe waveform for the temperature and frame, see :mod:`inky.waveform`. Default: 'full'.
+        :param temperature: Panel temperature in degrees C, or a function returning it, eg: from an external sensor. If `None` the controller's sensor is read. Default: `None`.
         """
         self._spi_bus = spi_bus
         self._i2c_bus = i2c_bus
@@ -85,7 +231,7 @@ class Inky:
             raise ValueError('Colour {} is not supported!'.format(colour))
 
         self.colour = colour
-        self.eeprom = eeprom.read_eeprom(i2c_bus=i2c_bus)
+        self.eeprom = eeprom.read_eeprom(i2c_bus=i2c_bus) if epd_type is None else epd_type
         self.lut = colour
 
         if self.eeprom is not None:
@@ -107,116 +253,65 @@ class Inky:
         self._gpio = gpio
         self._gpio_setup = False
 
-        """Inky Lookup Tables.
+        # Held for each SPI transfer, shared by displays on the same bus, see group.DisplayGroup
+        self._bus_lock = threading.RLock()
 
-        These lookup tables comprise of two sets of values.
+        # Only write the changed region of controller RAM, see packing.FrameDiff
+        self.partial_update = partial_update
 
-        The first set of values, formatted as binary, describe the voltages applied during the six update phases:
+        # Preallocated bit-plane packer for this orientation, rebuilt if the flips are changed
+        self._packer = None
+        self._frame_diff = None
+        self._get_packer(self.buf)
 
-          Phase 0     Phase 1     Phase 2     Phase 3     Phase 4     Phase 5     Phase 6
-          A B C D
-        0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,  LUT0 - Black
-        0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,  LUT1 - White
-        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,  NOT USED BY HARDWARE
-        0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,  LUT3 - Yellow or Red
-        0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,  LUT4 - VCOM
+        # Pre-packed planes shown instead of buf, see set_packed
+        self._packed = None
 
-        There are seven possible phases, arranged horizontally, and only the phases with duration/repeat information
-        (see below) are used during the update cycle.
+        # Bytes written over SPI and time taken, see spi_stats.bytes_per_second
+        self.spi_stats = spi.SPIStats()
 
-        Each phase has four steps: A, B, C and D. Each step is represented by two binary bits and these bits can
-        have one of four possible values representing the voltages to be applied. The default values follow:
+        # Time spent in each phase of an update, see timing.Timings
+        self.timings = timing.get_timings(timings)
 
-        0b00: VSS or Ground
-        0b01: VSH1 or 15V
-        0b10: VSL or -15V
-        0b11: VSH2 or 5.4V
+        # Controller power state: 'unknown', 'awake', 'busy' (refreshing) or 'sleep' (deep sleep)
+        self.warm_wake = warm_wake
+        self.power_state = 'unknown'
 
-        During each phase the Black, White and Yellow (or Red) stages are applied in turn, creating a voltage
-        differential across each display pixel. This is what moves the physical ink particles in their suspension.
+        # Compiled setup programs by configuration, and register values held by the controller since its last reset
+        self._programs = {}
+        self._registers = {}
 
-        The second set of values, formatted as hex, describe the duration of each step in a phase, and the number
-        of times that phase should be repeated:
+        # Skip refreshing frames already on the display, see cache.FrameCache
+        if frame_cache is not None and not isinstance(frame_cache, cache.FrameCache):
+            frame_cache = cache.FrameCache(frame_cache)
+        self.frame_cache = frame_cache
 
-          Duration                Repeat
-          A     B     C     D
-        0x10, 0x04, 0x04, 0x04, 0x04,  <-- Timings for Phase 0
-        0x10, 0x04, 0x04, 0x04, 0x04,  <-- Timings for Phase 1
-        0x04, 0x08, 0x08, 0x10, 0x10,      etc
-        0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00,
+        # Archive every frame shown, see record.Recorder
+        self.recorder = None
 
-        The duration and repeat parameters allow you to take a single sequence of A, B, C and D voltage values and
-        transform them into a waveform that - effectively - wiggles the ink particles into the desired position.
+        # Waveform choice by temperature and frame content, see waveform.WaveformTable
+        if refresh_mode not in waveform.REFRESH_MODES:
+            raise ValueError('Refresh mode {} is not supported, use one of: {}'.format(refresh_mode, ', '.join(waveform.REFRESH_MODES)))
+        self.refresh_mode = refresh_mode
+        self.temperature = temperature
+        self._sensor_temperature = None
+        self._fast_count = 0
 
-        In all of our LUT definitions we use the first and second phases to flash/pulse and clear the display to
-        mitigate image retention. The flashing effect is actually the ink particles being moved from the bottom to
-        the top of the display repeatedly in an attempt to reset them back into a sensible resting position.
+        # Whether the panel may be showing red/yellow pixels, and whether controller colour RAM is known to hold none
+        self._colour_shown = colour != 'black'
+        self._colour_ram_clear = False
 
-        """
-        self._luts = {
-            'black': [
-                0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,
-                0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0x10, 0x04, 0x04, 0x04, 0x04,
-                0x10, 0x04, 0x04, 0x04, 0x04,
-                0x04, 0x08, 0x08, 0x10, 0x10,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-            ],
-            'red': [
-                0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00000000, 0b00000000,
-                0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b00000000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b00000000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0x40, 0x0C, 0x20, 0x0C, 0x06,
-                0x10, 0x08, 0x04, 0x04, 0x06,
-                0x04, 0x08, 0x08, 0x10, 0x10,
-                0x02, 0x02, 0x02, 0x40, 0x20,
-                0x02, 0x02, 0x02, 0x02, 0x02,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00
-            ],
-            'red_ht': [
-                0b01001000, 0b10100000, 0b00010000, 0b00010000, 0b00010011, 0b00010000, 0b00010000,
-                0b01001000, 0b10100000, 0b10000000, 0b00000000, 0b00000011, 0b10000000, 0b10000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0b01001000, 0b10100101, 0b00000000, 0b10111011, 0b00000000, 0b01001000, 0b00000000,
-                0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0x43, 0x0A, 0x1F, 0x0A, 0x04,
-                0x10, 0x08, 0x04, 0x04, 0x06,
-                0x04, 0x08, 0x08, 0x10, 0x0B,
-                0x02, 0x04, 0x04, 0x40, 0x10,
-                0x06, 0x06, 0x06, 0x02, 0x02,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00
-            ],
-            'yellow': [
-                0b11111010, 0b10010100, 0b10001100, 0b11000000, 0b11010000, 0b00000000, 0b00000000,
-                0b11111010, 0b10010100, 0b00101100, 0b10000000, 0b11100000, 0b00000000, 0b00000000,
-                0b11111010, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000, 0b00000000,
-                0b11111010, 0b10010100, 0b11111000, 0b10000000, 0b01010000, 0b00000000, 0b11001100,
-                0b10111111, 0b01011000, 0b11111100, 0b10000000, 0b11010000, 0b00000000, 0b00010001,
-                0x40, 0x10, 0x40, 0x10, 0x08,
-                0x08, 0x10, 0x04, 0x04, 0x10,
-                0x08, 0x08, 0x03, 0x08, 0x20,
-                0x08, 0x04, 0x00, 0x00, 0x10,
-                0x10, 0x08, 0x08, 0x00, 0x20,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x00, 0x00, 0x00, 0x00,
-            ]
-        }
+        # LUT, refresh mode, temperature and measured refresh time of the last update
+        self.last_refresh = None
+
+        # Copied, so a display's LUTs can be tuned without changing others
+        self._luts = dict((name, list(lut)) for name, lut in _LUTS.items())
 
     def setup(self):
-        """Set up Inky GPIO and reset display."""
+        """Set up Inky GPIO and reset display.
+
+        With `warm_wake` enabled the reset is skipped if the controller is already awake.
+        """
         if not self._gpio_setup:
             if self._gpio is None:
                 try:
@@ -229,91 +324,259 @@ class Inky:
             self._gpio.setup(self.dc_pin, self._gpio.OUT, initial=self._gpio.LOW, pull_up_down=self._gpio.PUD_OFF)
             self._gpio.setup(self.reset_pin, self._gpio.OUT, initial=self._gpio.HIGH, pull_up_down=self._gpio.PUD_OFF)
             self._gpio.setup(self.busy_pin, self._gpio.IN, pull_up_down=self._gpio.PUD_OFF)
+            self._busy = busy.BusyPin(self._gpio, self.busy_pin)
 
             if self._spi_bus is None:
                 import spidev
                 self._spi_bus = spidev.SpiDev()
 
             self._spi_bus.open(0, self.cs_channel)
-            self._spi_bus.max_speed_hz = 488000
+            self._spi_bus.max_speed_hz = _SPI_SPEED_HZ
 
             self._gpio_setup = True
 
-        self._gpio.output(self.reset_pin, self._gpio.LOW)
-        time.sleep(0.1)
-        self._gpio.output(self.reset_pin, self._gpio.HIGH)
-        time.sleep(0.1)
+        # A refresh left running by show(busy_wait=False) must finish before a new frame or a reset
+        if self.power_state == 'busy':
+            self._wait_refresh()
+        if self.warm_wake and self.power_state == 'awake':
+            return
+
+        self.power_state = 'unknown'
+        self._registers.clear()
+
+        if self.warm_wake:
+            self._gpio.output(self.reset_pin, self._gpio.LOW)
+            time.sleep(_RESET_PULSE)
+            self._gpio.output(self.reset_pin, self._gpio.HIGH)
+            self._busy_wait()
+        else:
+            self._gpio.output(self.reset_pin, self._gpio.LOW)
+            time.sleep(0.1)
+            self._gpio.output(self.reset_pin, self._gpio.HIGH)
+            time.sleep(0.1)
 
         self._send_command(0x12)  # Soft Reset
         self._busy_wait()
+        self.power_state = 'awake'
+
+    def sleep(self):
+        """Put the controller into deep sleep, the next update will reset it."""
+        if not self._gpio_setup or self.power_state == 'sleep':
+            return
+        if self.power_state == 'busy':
+            self._wait_refresh()
+        with self.timings.phase('power_off'):
+            self._send_command(0x10, 0x01)  # Enter Deep Sleep
+        self._registers.clear()
+        self.power_state = 'sleep'
 
-    def _busy_wait(self):
+    def _busy_wait(self, timeout=40.0):
         """Wait for busy/wait pin."""
-        while(self._gpio.input(self.busy_pin) != self._gpio.LOW):
-            time.sleep(0.01)
+        if not self._busy.wait(timeout):
+            # The controller is in an unknown state, reset it before the next update
+            self.power_state = 'unknown'
+            raise RuntimeError("Timeout waiting for busy signal to clear.")
 
-    def _update(self, buf_a, buf_b, busy_wait=True):
-        """Update display.
-
-        :param buf_a: Black/White pixels
-        :param buf_b: Yellow/Red pixels
+    def _wait_refresh(self):
+        """Wait for a refresh left running by `show(busy_wait=False)`.
 
+        Its length is recorded in `last_refresh` if it was still running. A
+        refresh that had already finished took an unknown time, so 'seconds'
+        is left as `None`.
         """
-        self.setup()
+        running = self._busy.is_busy()
+        with self.timings.phase('refresh'):
+            self._busy_wait()
+        if running:
+            self.last_refresh['seconds'] = time.time() - self._refresh_started
+        self.power_state = 'awake'
+
+    def _init_commands(self, lut=None):
+        """Return the (command, data) controller setup sequence sent before each update.
 
+        :param str lut: Name of the LUT to load, default: `lut`.
+        """
+        lut = self.lut if lut is None else lut
         packed_height = list(struct.pack('<H', self.rows))
 
         if isinstance(packed_height[0], str):
             packed_height = map(ord, packed_height)
 
-        self._send_command(0x74, 0x54)  # Set Analog Block Control
-        self._send_command(0x7e, 0x3b)  # Set Digital Block Control
+        commands = []
+        commands.append((0x74, 0x54))  # Set Analog Block Control
+        commands.append((0x7e, 0x3b))  # Set Digital Block Control
 
-        self._send_command(0x01, packed_height + [0x00])  # Gate setting
+        commands.append((0x01, packed_height + [0x00]))  # Gate setting
 
-        self._send_command(0x03, 0x17)  # Gate Driving Voltage
-        self._send_command(0x04, [0x41, 0xAC, 0x32])  # Source Driving Voltage
+        commands.append((0x03, 0x17))  # Gate Driving Voltage
+        commands.append((0x04, [0x41, 0xAC, 0x32]))  # Source Driving Voltage
 
-        self._send_command(0x3a, 0x07)  # Dummy line period
-        self._send_command(0x3b, 0x04)  # Gate line width
-        self._send_command(0x11, 0x03)  # Data entry mode setting 0x03 = X/Y increment
+        commands.append((0x3a, 0x07))  # Dummy line period
+        commands.append((0x3b, 0x04))  # Gate line width
+        commands.append((0x11, 0x03))  # Data entry mode setting 0x03 = X/Y increment
 
-        self._send_command(0x2c, 0x3c)  # VCOM Register, 0x3c = -1.5v?
+        commands.append((0x2c, 0x3c))  # VCOM Register, 0x3c = -1.5v?
 
-        self._send_command(0x3c, 0b00000000)
+        commands.append((0x3c, 0b00000000))
         if self.border_colour == self.BLACK:
-            self._send_command(0x3c, 0b00000000)  # GS Transition Define A + VSS + LUT0
+            commands.append((0x3c, 0b00000000))  # GS Transition Define A + VSS + LUT0
         elif self.border_colour == self.RED and self.colour == 'red':
-            self._send_command(0x3c, 0b01110011)  # Fix Level Define A + VSH2 + LUT3
+            commands.append((0x3c, 0b01110011))  # Fix Level Define A + VSH2 + LUT3
         elif self.border_colour == self.YELLOW and self.colour == 'yellow':
-            self._send_command(0x3c, 0b00110011)  # GS Transition Define A + VSH2 + LUT3
+            commands.append((0x3c, 0b00110011))  # GS Transition Define A + VSH2 + LUT3
         elif self.border_colour == self.WHITE:
-            self._send_command(0x3c, 0b00110001)  # GS Transition Define A + VSH2 + LUT1
+            commands.append((0x3c, 0b00110001))  # GS Transition Define A + VSH2 + LUT1
 
         if self.colour == 'yellow':
-            self._send_command(0x04, [0x07, 0xAC, 0x32])  # Set voltage of VSH and VSL
+            commands.append((0x04, [0x07, 0xAC, 0x32]))  # Set voltage of VSH and VSL
         if self.colour == 'red' and self.resolution == (400, 300):
-            self._send_command(0x04, [0x30, 0xAC, 0x22])
+            commands.append((0x04, [0x30, 0xAC, 0x22]))
+
+        commands.append((0x32, self._luts[lut]))  # Set LUTs
+
+        return commands
+
+    def _get_init_program(self, lut=None):
+        """Return the compiled setup program for the current configuration and LUT, default: `lut`."""
+        lut = self.lut if lut is None else lut
+        key = (self.rows, self.resolution, self.colour, self.border_colour, lut, tuple(self._luts[lut]))
+        compiled = self._programs.get(key)
+        if compiled is None:
+            compiled = program.CommandProgram(self._init_commands(lut), registers=_REGISTERS)
+            self._programs[key] = compiled
+        return compiled
+
+    def _run_program(self, compiled):
+        """Send a compiled program, skipping registers the controller already holds."""
+        compiled.run(self._spi_write, self._registers)
+
+    def _waveforms(self):
+        """Return the waveform table for this panel, see :class:`inky.waveform.WaveformTable`."""
+        entries = {}
+        if self.lut in ('black', 'red'):
+            # Untested on the yellow and high temperature panels, which drive their pixels differently
+            entries[('normal', 'fast')] = 'black_fast'
+        # The red waveform's extra phases only move red particles, black/white frames can use the black one
+        mono = 'black' if self.lut == 'red' else None
+        return waveform.WaveformTable(self.lut, entries, mono=mono)
+
+    def read_temperature(self):
+        """Return the panel temperature in degrees C, or `None` if it can't be read.
+
+        Uses `temperature` if set, otherwise the controller's sensor. Sensor readings
+        are reused for `waveform.TEMPERATURE_INTERVAL` seconds.
+        """
+        if self.temperature is None:
+            self.setup()
+        return self._temperature()
+
+    def _temperature(self):
+        """Return the panel temperature, reading the sensor of a controller that's already set up if needed."""
+        if self.temperature is not None:
+            return float(self.temperature() if callable(self.temperature) else self.temperature)
+
+        if self._sensor_temperature is not None:
+            temperature, t_read = self._sensor_temperature
+            if time.time() - t_read < waveform.TEMPERATURE_INTERVAL:
+                return temperature
+
+        with self.timings.phase('temperature'):
+            self._send_command(0x18, 0x80)  # Temperature Sensor: internal
+            self._send_command(0x22, 0xA1)  # Update Sequence: clock on, load temperature, clock off
+            self._send_command(0x20)
+            self._busy_wait()
+            temperature = waveform.decode_temperature(self._spi_read(0x1b, 2))  # Read Temperature Register
+        self._sensor_temperature = (temperature, time.time())
+        return temperature
+
+    def _select_waveform(self, colour):
+        """Return the (LUT name, mode, band, temperature) for an update.
+
+        :param bool colour: Whether the frame, or its border, has any red/yellow pixels.
+        """
+        temperature = None
+        if self.refresh_mode != waveform.REFRESH_FULL or self.temperature is not None:
+            temperature = self._temperature()
+        # Black/white waveforms can't clear red/yellow pixels left by the previous frame
+        colour_pixels = colour or self._colour_shown
+        lut, mode, band = self._waveforms().select(temperature, self.refresh_mode, colour_pixels, self._fast_count)
+        self._fast_count = self._fast_count + 1 if mode == 'fast' else 0
+        return lut, mode, band, temperature
+
+    def _update(self, buf_a, buf_b, busy_wait=True):
+        """Update display.
+
+        :param buf_a: Black/White pixels
+        :param buf_b: Yellow/Red pixels
+
+        """
+        with self.timings.phase('setup'):
+            self.setup()
 
-        self._send_command(0x32, self._luts[self.lut])  # Set LUTs
+        # Until this update completes the controller state is unknown, so an error forces a reset
+        self.power_state = 'unknown'
 
-        self._send_command(0x44, [0x00, (self.cols // 8) - 1])  # Set RAM X Start/End
-        self._send_command(0x45, [0x00, 0x00] + packed_height)  # Set RAM Y Start/End
+        # Frames without red/yellow pixels need no colour plane written, and can use a black/white waveform
+        colour_plane = bool(numpy.any(buf_b))
+        colour = colour_plane or self.border_colour not in (BLACK, WHITE)
 
-        # 0x24 == RAM B/W, 0x26 == RAM Red/Yellow/etc
-        for data in ((0x24, buf_a), (0x26, buf_b)):
-            cmd, buf = data
-            self._send_command(0x4e, 0x00)  # Set RAM X Pointer Start
-            self._send_command(0x4f, [0x00, 0x00])  # Set RAM Y Pointer Start
-            self._send_command(cmd, buf)
+        lut, mode, band, temperature = self._select_waveform(colour)
+        self._run_program(self._get_init_program(lut))
+
+        packed_height = list(struct.pack('<H', self.rows))
+
+        if isinstance(packed_height[0], str):
+            packed_height = map(ord, packed_height)
+
+        window, diff = self._ram_window(buf_a, buf_b)
+
+        # 0x24 == RAM B/W, 0x26 == RAM Red/Yellow/etc, colour RAM already cleared by a previous frame is left alone
+        # Only when the driver owns controller RAM, in cold mode another process may have written it between updates
+        planes = [(0x24, buf_a)]
+        if colour_plane or not (self._colour_ram_clear and (self.warm_wake or self.partial_update)):
+            planes.append((0x26, buf_b))
+        self._colour_ram_clear = False
+
+        if window is None:
+            pass  # Controller RAM already holds this frame
+        elif diff is None or window == diff.full:
+            self._send_command(0x44, [0x00, (self.cols // 8) - 1])  # Set RAM X Start/End
+            self._send_command(0x45, [0x00, 0x00] + packed_height)  # Set RAM Y Start/End
+
+            for cmd, buf in planes:
+                self._send_command(0x4e, 0x00)  # Set RAM X Pointer Start
+                self._send_command(0x4f, [0x00, 0x00])  # Set RAM Y Pointer Start
+                self._send_command(cmd, buf)
+        else:
+            x_start, x_end, y_start, y_end = window
+            self._send_command(0x44, [x_start, x_end])  # Set RAM X Start/End
+            self._send_command(0x45, [y_start & 0xff, y_start >> 8, y_end & 0xff, y_end >> 8])  # Set RAM Y Start/End
+
+            for cmd, buf in planes:
+                self._send_command(0x4e, x_start)  # Set RAM X Pointer Start
+                self._send_command(0x4f, [y_start & 0xff, y_start >> 8])  # Set RAM Y Pointer Start
+                self._send_command(cmd, diff.crop(buf, window))
+
+        if diff is not None:
+            diff.commit(buf_a, buf_b)
+        self._colour_ram_clear = not colour_plane
 
         self._send_command(0x22, 0xC7)  # Display Update Sequence
         self._send_command(0x20)  # Trigger Display Update
+        t_refresh = self._refresh_started = time.time()
+        self._colour_shown = colour
         time.sleep(0.05)
 
+        self.power_state = 'busy'
+        self.last_refresh = {'lut': lut, 'mode': mode, 'band': band, 'temperature': temperature, 'seconds': None}
+
         if busy_wait:
-            self._busy_wait()
-            self._send_command(0x10, 0x01)  # Enter Deep Sleep
+            with self.timings.phase('refresh'):
+                self._busy_wait()
+            self.last_refresh['seconds'] = time.time() - t_refresh
+            self.power_state = 'awake'
+            if not self.warm_wake:
+                self.sleep()
 
     def set_pixel(self, x, y, v):
         """Set a single pixel on the buffer.
@@ -324,28 +587,89 @@ class Inky:
         """
         if v in (WHITE, BLACK, RED):
             self.buf[y][x] = v
+            self._packed = None
 
-    def show(self, busy_wait=True):
+    def show(self, busy_wait=True, force=False):
         """Show buffer on display.
 
         :param bool busy_wait: If True, wait for display update to finish before returning, default: `True`.
+        :param bool force: If True, refresh even if `frame_cache` says this frame is already displayed, default: `False`.
         """
-        region = self.buf
+        self._show(self.buf if self._packed is None else self._packed, busy_wait=busy_wait, force=force)
+
+    def show_async(self, busy_wait=True, force=False):
+        """Show buffer on display without blocking the asyncio event loop.
+
+        Returns an awaitable. The buffer is copied when the update starts, so
+        drawing can continue during the refresh. Concurrent calls are serialised.
 
-        if self.v_flip:
-            region = numpy.fliplr(region)
+        :param bool busy_wait: If True, wait for display update to finish before completing, default: `True`.
+        :param bool force: If True, refresh even if `frame_cache` says this frame is already displayed, default: `False`.
+        """
+        from . import aio
+        return aio.show(self, busy_wait=busy_wait, force=force)
 
-        if self.h_flip:
-            region = numpy.flipud(region)
+    def _show(self, buf, busy_wait=True, force=False):
+        """Pack `buf` and show it on display, see :meth:`show`.
 
-        if self.rotation:
-            region = numpy.rot90(region, self.rotation // 90)
+        `buf` may also be a tuple of pre-packed planes, see :meth:`set_packed`.
+        """
+        if isinstance(buf, tuple):
+            buf_a, buf_b = buf
+        else:
+            packer = self._get_packer(buf)
+            with self.timings.phase('transform'):
+                packer.transform(buf)
+            with self.timings.phase('pack'):
+                buf_a, buf_b = packer.pack_bits()
 
-        buf_a = numpy.packbits(numpy.where(region == BLACK, 0, 1)).tolist()
-        buf_b = numpy.packbits(numpy.where(region == RED, 1, 0)).tolist()
+        key = self._frame_key(buf_a, buf_b)
+        if key is not None and not force and self.frame_cache.check(key):
+            return
 
         self._update(buf_a, buf_b, busy_wait=busy_wait)
 
+        if self.recorder is not None:
+            self.recorder.record(self, (buf_a, buf_b))
+
+        if key is not None:
+            self.frame_cache.store(key)
+
+    def _frame_key(self, *planes):
+        """Return the frame cache key for packed planes, or `None` if caching is disabled."""
+        if self.frame_cache is None:
+            return None
+        return cache.frame_key(planes, self.resolution, self.colour, self.border_colour, self._luts[self.lut])
+
+    def _get_packer(self, buf):
+        """Return a plane packer for the shape of `buf` and the current orientation."""
+        key = (buf.shape, self.rotation, self.h_flip, self.v_flip)
+        if self._packer is None or self._packer.key != key:
+            self._packer = packing.PlanePacker(buf.shape, self.rotation, self.h_flip, self.v_flip, black=BLACK, colour=RED)
+            self._frame_diff = packing.FrameDiff(self._packer.scan_shape)
+        return self._packer
+
+    def _ram_window(self, buf_a, buf_b):
+        """Return the controller RAM window to write and the frame tracker to crop it with.
+
+        The window is `None` if controller RAM already holds this frame.
+        The tracker is `None` if partial updates are disabled.
+
+        :param buf_a: Black/White pixels
+        :param buf_b: Yellow/Red pixels
+
+        """
+        diff = self._frame_diff
+        if diff is None or not self.partial_update:
+            if diff is not None:
+                diff.invalidate()
+            return (0, self.cols // 8 - 1, 0, self.rows - 1), None
+
+        window = diff.window(buf_a, buf_b)
+        # Until this frame has been written RAM contents are unknown
+        diff.invalidate()
+        return window, diff
+
     def set_border(self, colour):
         """Set the border colour.
 
@@ -358,28 +682,59 @@ class Inky:
         """Copy an image to the buffer.
 
         The dimensions of `image` should match the dimensions of the display being used.
+        Pixels are written into the existing buffer, arrays and buffers of the right size are not copied first.
 
-        :param image: Image to copy.
-        :type image: :class:`PIL.Image.Image` or :class:`numpy.ndarray` or list
+        :param image: Image to copy, of palette indexes, or black and white for "1" images and bool arrays.
+        :type image: :class:`PIL.Image.Image` or :class:`numpy.ndarray` or memoryview or list
         """
-        if self.rotation % 180 == 0:
-            self.buf = numpy.array(image, dtype=numpy.uint8).reshape((self.width, self.height))
+        buffer.copy_into(self.buf, image, 3, one_bit=(BLACK, WHITE))
+        self._packed = None
+
+    def set_packed(self, black_white, colour=None):
+        """Show pre-packed planes on the next update, skipping the buffer.
+
+        Planes are 1 bit per pixel, most significant bit first, in controller scan order, as sent to the display.
+        They are not copied, and are shown instead of the buffer until the next `set_image` or `set_pixel`.
+
+        :param black_white: Black/White plane, bits set for white.
+        :type black_white: bytes or memoryview or :class:`numpy.ndarray`
+        :param colour: Red/Yellow plane, bits set for red/yellow, default: `None` for no colour.
+        """
+        size = self._get_packer(self.buf).plane_size
+        black_white = buffer.as_plane(black_white, size, 'black/white plane')
+        if colour is None:
+            colour = numpy.zeros(size, dtype=numpy.uint8)
         else:
-            self.buf = numpy.array(image, dtype=numpy.uint8).reshape((self.height, self.width))
+            colour = buffer.as_plane(colour, size, 'colour plane')
+        self._packed = (black_white, colour)
 
     def _spi_write(self, dc, values):
         """Write values over SPI.
 
         :param dc: whether to write as data or command
-        :param values: list of values to write
+        :param values: bytes, bytearray, numpy.ndarray or list of values to write
         """
-        self._gpio.output(self.dc_pin, dc)
-        try:
-            self._spi_bus.xfer3(values)
-        except AttributeError:
-            for x in range(((len(values) - 1) // _SPI_CHUNK_SIZE) + 1):
-                offset = x * _SPI_CHUNK_SIZE
-                self._spi_bus.xfer(values[offset:offset + _SPI_CHUNK_SIZE])
+        with self._bus_lock:
+            self._gpio.output(self.dc_pin, dc)
+            spi.timed_write(self._spi_bus, values, self.spi_stats, timings=self.timings)
+
+    def _spi_read(self, command, count):
+        """Send a command and read `count` bytes back over the data line, or return `None` if the bus can't.
+
+        The panel's data line is bidirectional, so reads need spidev's 3-wire mode.
+        """
+        with self._bus_lock:
+            self._send_command(command)
+            self._gpio.output(self.dc_pin, _SPI_DATA)
+            try:
+                threewire = self._spi_bus.threewire
+                self._spi_bus.threewire = True
+                try:
+                    return list(self._spi_bus.readbytes(count))
+                finally:
+                    self._spi_bus.threewire = threewire
+            except (AttributeError, IOError, OSError):
+                return None
 
     def _send_command(self, command, data=None):
         """Send command over SPI.
@@ -1,8 +1,8 @@
 """Inky e-Ink Display Driver."""
+import threading
 import time
 
-from PIL import Image
-from . import eeprom, ssd1608
+from . import buffer, busy, cache, draw, eeprom, packing, program, spi, ssd1608, timing, waveform
 
 try:
     import numpy
@@ -21,16 +21,62 @@ MOSI_PIN = 10
 SCLK_PIN = 11
 CS0_PIN = 0
 
-_SPI_CHUNK_SIZE = 4096
+# Shortest reset pulse used in warm_wake mode, the controller then signals ready on the busy line
+_RESET_PULSE = 0.01
+
+# Longest full refresh, used to wait for the refresh to finish in warm_wake mode
+_REFRESH_TIMEOUT = 30.0
+
+# SPI clock speed in Hz
+_SPI_SPEED_HZ = 488000
+
 _SPI_COMMAND = 0
 _SPI_DATA = 1
 
+# Setup commands that only write register values, and can be skipped if unchanged
+_REGISTERS = (
+    ssd1608.DRIVER_CONTROL,
+    ssd1608.WRITE_DUMMY,
+    ssd1608.WRITE_GATELINE,
+    ssd1608.DATA_MODE,
+    ssd1608.WRITE_VCOM,
+    ssd1608.WRITE_LUT,
+    ssd1608.WRITE_BORDER
+)
+
 _RESOLUTION = {
     (250, 122): (136, 250, -90, 0, 6)
 }
 
 
-class Inky:
+# Waveform lookup tables, 20 bytes of voltages for each phase then 10 bytes of phase lengths
+_LUTS = {
+    'black': [
+        0x02, 0x02, 0x01, 0x11, 0x12, 0x12, 0x22, 0x22, 0x66, 0x69,
+        0x69, 0x59, 0x58, 0x99, 0x99, 0x88, 0x00, 0x00, 0x00, 0x00,
+        0xF8, 0xB4, 0x13, 0x51, 0x35, 0x51, 0x51, 0x19, 0x01, 0x00
+    ],
+    'red': [
+        0x02, 0x02, 0x01, 0x11, 0x12, 0x12, 0x22, 0x22, 0x66, 0x69,
+        0x69, 0x59, 0x58, 0x99, 0x99, 0x88, 0x00, 0x00, 0x00, 0x00,
+        0xF8, 0xB4, 0x13, 0x51, 0x35, 0x51, 0x51, 0x19, 0x01, 0x00
+    ],
+    'yellow': [
+        0x02, 0x02, 0x01, 0x11, 0x12, 0x12, 0x22, 0x22, 0x66, 0x69,
+        0x69, 0x59, 0x58, 0x99, 0x99, 0x88, 0x00, 0x00, 0x00, 0x00,
+        0xF8, 0xB4, 0x13, 0x51, 0x35, 0x51, 0x51, 0x19, 0x01, 0x00
+    ],
+    # Black/white only, the common SSD1608 partial update waveform, three short phases and no flashing
+    # Hand-made rather than vendor supplied, and untested on a panel
+    'black_fast': [
+        0x10, 0x18, 0x18, 0x08, 0x18, 0x18, 0x08, 0x00, 0x00, 0x00,
+        0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+        0x13, 0x14, 0x44, 0x12, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00
+    ]
+}
+
+
+class Inky(draw.Canvas):
     """Inky e-Ink Display Driver."""
 
     WHITE = 0
@@ -38,7 +84,10 @@ class Inky:
     RED = 2
     YELLOW = 2
 
-    def __init__(self, resolution=(250, 122), colour='black', cs_pin=CS0_PIN, dc_pin=DC_PIN, reset_pin=RESET_PIN, busy_pin=BUSY_PIN, h_flip=False, v_flip=False, spi_bus=None, i2c_bus=None, gpio=None):  # noqa: E501
+    # Controller name, see waveform.lut_phases and record.Archive
+    _CONTROLLER = 'ssd1608'
+
+    def __init__(self, resolution=(250, 122), colour='black', cs_pin=CS0_PIN, dc_pin=DC_PIN, reset_pin=RESET_PIN, busy_pin=BUSY_PIN, h_flip=False, v_flip=False, spi_bus=None, i2c_bus=None, gpio=None, partial_update=False, frame_cache=None, warm_wake=False, timings=None, epd_type=None, refresh_mode=waveform.REFRESH_FULL, temperature=None):  # noqa: E501
         """Initialise an Inky Display.
 
         :param resolution: (width, height) in pixels, default: (400, 300)
@@ -49,6 +98,13 @@ class Inky:
         :param busy_pin: device busy/wait pin
         :param h_flip: enable horizontal display flip, default: False
         :param v_flip: enable vertical display flip, default: False
+        :param partial_update: only write the changed region of controller RAM, default: False
+        :param frame_cache: state file path or cache.FrameCache, skip refreshing unchanged frames
+        :param warm_wake: keep the controller awake between updates, only reset after deep sleep or an error, default: False
+        :param timings: timing.Timings, or a callback taking (phase, seconds, nbytes), to time each phase of an update
+        :param epd_type: eeprom.EPDType already read, eg: by auto(), skips reading the EEPROM again
+        :param refresh_mode: 'full' to always use the full waveform, or 'auto' for the quickest safe waveform, see waveform, default: 'full'
+        :param temperature: panel temperature in degrees C, or a function returning it, default: None to read the controller's sensor
 
         """
         self._spi_bus = spi_bus
@@ -65,7 +121,7 @@ class Inky:
             raise ValueError('Colour {} is not supported!'.format(colour))
 
         self.colour = colour
-        self.eeprom = eeprom.read_eeprom(i2c_bus=i2c_bus)
+        self.eeprom = eeprom.read_eeprom(i2c_bus=i2c_bus) if epd_type is None else epd_type
         self.lut = colour
 
         # The EEPROM is used to disambiguate the variants of wHAT and pHAT
@@ -103,26 +159,66 @@ class Inky:
         self._gpio = gpio
         self._gpio_setup = False
 
-        self._luts = {
-            'black': [
-                0x02, 0x02, 0x01, 0x11, 0x12, 0x12, 0x22, 0x22, 0x66, 0x69,
-                0x69, 0x59, 0x58, 0x99, 0x99, 0x88, 0x00, 0x00, 0x00, 0x00,
-                0xF8, 0xB4, 0x13, 0x51, 0x35, 0x51, 0x51, 0x19, 0x01, 0x00
-            ],
-            'red': [
-                0x02, 0x02, 0x01, 0x11, 0x12, 0x12, 0x22, 0x22, 0x66, 0x69,
-                0x69, 0x59, 0x58, 0x99, 0x99, 0x88, 0x00, 0x00, 0x00, 0x00,
-                0xF8, 0xB4, 0x13, 0x51, 0x35, 0x51, 0x51, 0x19, 0x01, 0x00
-            ],
-            'yellow': [
-                0x02, 0x02, 0x01, 0x11, 0x12, 0x12, 0x22, 0x22, 0x66, 0x69,
-                0x69, 0x59, 0x58, 0x99, 0x99, 0x88, 0x00, 0x00, 0x00, 0x00,
-                0xF8, 0xB4, 0x13, 0x51, 0x35, 0x51, 0x51, 0x19, 0x01, 0x00
-            ]
-        }
+        # Held for each SPI transfer, shared by displays on the same bus, see group.DisplayGroup
+        self._bus_lock = threading.RLock()
+
+        # Only write the changed region of controller RAM, see packing.FrameDiff
+        self.partial_update = partial_update
+
+        # Preallocated bit-plane packer for this orientation, rebuilt if the flips are changed
+        self._packer = None
+        self._frame_diff = None
+        self._get_packer(self.buf)
+
+        # Pre-packed planes shown instead of buf, see set_packed
+        self._packed = None
+
+        # Bytes written over SPI and time taken, see spi_stats.bytes_per_second
+        self.spi_stats = spi.SPIStats()
+
+        # Time spent in each phase of an update, see timing.Timings
+        self.timings = timing.get_timings(timings)
+
+        # Controller power state: 'unknown', 'awake', 'busy' (refreshing) or 'sleep' (deep sleep)
+        self.warm_wake = warm_wake
+        self.power_state = 'unknown'
+
+        # Compiled setup programs by configuration, and register values held by the controller since its last reset
+        self._programs = {}
+        self._registers = {}
+
+        # Skip refreshing frames already on the display, see cache.FrameCache
+        if frame_cache is not None and not isinstance(frame_cache, cache.FrameCache):
+            frame_cache = cache.FrameCache(frame_cache)
+        self.frame_cache = frame_cache
+
+        # Archive every frame shown, see record.Recorder
+        self.recorder = None
+
+        # Waveform choice by temperature and frame content, see waveform.WaveformTable
+        if refresh_mode not in waveform.REFRESH_MODES:
+            raise ValueError('Refresh mode {} is not supported, use one of: {}'.format(refresh_mode, ', '.join(waveform.REFRESH_MODES)))
+        self.refresh_mode = refresh_mode
+        self.temperature = temperature
+        self._sensor_temperature = None
+        self._fast_count = 0
+
+        # Whether the panel may be showing red/yellow pixels, and whether controller colour RAM is known to hold none
+        self._colour_shown = colour != 'black'
+        self._colour_ram_clear = False
+
+        # LUT, refresh mode, temperature and measured refresh time of the last update
+        self.last_refresh = None
+
+        # Copied, so a display's LUTs can be tuned without changing others
+        self._luts = dict((name, list(lut)) for name, lut in _LUTS.items())
 
     def setup(self):
-        """Set up Inky GPIO and reset display."""
+        """Set up Inky GPIO and reset display.
+
+        With warm_wake enabled the reset is skipped if the controller is already awake.
+
+        """
         if not self._gpio_setup:
             if self._gpio is None:
                 try:
@@ -135,85 +231,242 @@ class Inky:
             self._gpio.setup(self.dc_pin, self._gpio.OUT, initial=self._gpio.LOW, pull_up_down=self._gpio.PUD_OFF)
             self._gpio.setup(self.reset_pin, self._gpio.OUT, initial=self._gpio.HIGH, pull_up_down=self._gpio.PUD_OFF)
             self._gpio.setup(self.busy_pin, self._gpio.IN, pull_up_down=self._gpio.PUD_OFF)
+            self._busy = busy.BusyPin(self._gpio, self.busy_pin)
 
             if self._spi_bus is None:
                 import spidev
                 self._spi_bus = spidev.SpiDev()
 
             self._spi_bus.open(0, self.cs_pin)
-            self._spi_bus.max_speed_hz = 488000
+            self._spi_bus.max_speed_hz = _SPI_SPEED_HZ
 
             self._gpio_setup = True
 
-        self._gpio.output(self.reset_pin, self._gpio.LOW)
-        time.sleep(0.5)
-        self._gpio.output(self.reset_pin, self._gpio.HIGH)
-        time.sleep(0.5)
-
-        self._send_command(0x12)  # Soft Reset
-        time.sleep(1.0)
-        self._busy_wait()
+        # A refresh left running by show(busy_wait=False) must finish before a new frame or a reset
+        if self.power_state == 'busy':
+            self._wait_refresh()
+        if self.warm_wake and self.power_state == 'awake':
+            return
+
+        self.power_state = 'unknown'
+        self._registers.clear()
+
+        if self.warm_wake:
+            self._gpio.output(self.reset_pin, self._gpio.LOW)
+            time.sleep(_RESET_PULSE)
+            self._gpio.output(self.reset_pin, self._gpio.HIGH)
+            self._busy_wait()
+
+            self._send_command(0x12)  # Soft Reset
+            self._busy_wait()
+        else:
+            self._gpio.output(self.reset_pin, self._gpio.LOW)
+            time.sleep(0.5)
+            self._gpio.output(self.reset_pin, self._gpio.HIGH)
+            time.sleep(0.5)
+
+            self._send_command(0x12)  # Soft Reset
+            time.sleep(1.0)
+            self._busy_wait()
+
+        self.power_state = 'awake'
+
+    def sleep(self):
+        """Put the controller into deep sleep, the next update will reset it."""
+        if not self._gpio_setup or self.power_state == 'sleep':
+            return
+        if self.power_state == 'busy':
+            self._wait_refresh()
+        with self.timings.phase('power_off'):
+            self._send_command(ssd1608.DEEP_SLEEP, [0x01])
+        self._registers.clear()
+        self.power_state = 'sleep'
 
     def _busy_wait(self, timeout=5.0):
         """Wait for busy/wait pin."""
-        t_start = time.time()
-        while self._gpio.input(self.busy_pin):
-            time.sleep(0.01)
-            if time.time() - t_start >= timeout:
-                raise RuntimeError("Timeout waiting for busy signal to clear.")
+        if not self._busy.wait(timeout):
+            # The controller is in an unknown state, reset it before the next update
+            self.power_state = 'unknown'
+            raise RuntimeError("Timeout waiting for busy signal to clear.")
 
-    def _update(self, buf_a, buf_b, busy_wait=True):
-        """Update display.
+    def _wait_refresh(self):
+        """Wait for a refresh left running by show(busy_wait=False).
 
-        Dispatches display update to correct driver.
-
-        :param buf_a: Black/White pixels
-        :param buf_b: Yellow/Red pixels
+        Its length is recorded in last_refresh if it was still running. A
+        refresh that had already finished took an unknown time, so 'seconds'
+        is left as None.
 
         """
-        self.setup()
+        running = self._busy.is_busy()
+        with self.timings.phase('refresh'):
+            self._busy_wait(_REFRESH_TIMEOUT)
+        if running:
+            self.last_refresh['seconds'] = time.time() - self._refresh_started
+        self.power_state = 'awake'
+
+    def _init_commands(self, lut=None):
+        """Return the (command, data) controller setup sequence sent before each update.
 
-        self._send_command(ssd1608.DRIVER_CONTROL, [self.rows - 1, (self.rows - 1) >> 8, 0x00])
+        :param lut: name of the LUT to load, default: lut
+
+        """
+        lut = self.lut if lut is None else lut
+        commands = []
+        commands.append((ssd1608.DRIVER_CONTROL, [self.rows - 1, (self.rows - 1) >> 8, 0x00]))
         # Set dummy line period
-        self._send_command(ssd1608.WRITE_DUMMY, [0x1B])
+        commands.append((ssd1608.WRITE_DUMMY, [0x1B]))
         # Set Line Width
-        self._send_command(ssd1608.WRITE_GATELINE, [0x0B])
+        commands.append((ssd1608.WRITE_GATELINE, [0x0B]))
         # Data entry squence (scan direction leftward and downward)
-        self._send_command(ssd1608.DATA_MODE, [0x03])
-        # Set ram X start and end position
-        xposBuf = [0x00, self.cols // 8 - 1]
-        self._send_command(ssd1608.SET_RAMXPOS, xposBuf)
-        # Set ram Y start and end position
-        yposBuf = [0x00, 0x00, (self.rows - 1) & 0xFF, (self.rows - 1) >> 8]
-        self._send_command(ssd1608.SET_RAMYPOS, yposBuf)
+        commands.append((ssd1608.DATA_MODE, [0x03]))
         # VCOM Voltage
-        self._send_command(ssd1608.WRITE_VCOM, [0x70])
+        commands.append((ssd1608.WRITE_VCOM, [0x70]))
         # Write LUT DATA
-        self._send_command(ssd1608.WRITE_LUT, self._luts[self.lut])
+        commands.append((ssd1608.WRITE_LUT, self._luts[lut]))
 
         if self.border_colour == self.BLACK:
-            self._send_command(ssd1608.WRITE_BORDER, 0b00000000)
+            commands.append((ssd1608.WRITE_BORDER, 0b00000000))
             # GS Transition + Waveform 00 + GSA 0 + GSB 0
         elif self.border_colour == self.RED and self.colour == 'red':
-            self._send_command(ssd1608.WRITE_BORDER, 0b00000110)
+            commands.append((ssd1608.WRITE_BORDER, 0b00000110))
             # GS Transition + Waveform 01 + GSA 1 + GSB 0
         elif self.border_colour == self.YELLOW and self.colour == 'yellow':
-            self._send_command(ssd1608.WRITE_BORDER, 0b00001111)
+            commands.append((ssd1608.WRITE_BORDER, 0b00001111))
             # GS Transition + Waveform 11 + GSA 1 + GSB 1
         elif self.border_colour == self.WHITE:
-            self._send_command(ssd1608.WRITE_BORDER, 0b00000001)
+            commands.append((ssd1608.WRITE_BORDER, 0b00000001))
             # GS Transition + Waveform 00 + GSA 0 + GSB 1
 
-        # Set RAM address to 0, 0
-        self._send_command(ssd1608.SET_RAMXCOUNT, [0x00])
-        self._send_command(ssd1608.SET_RAMYCOUNT, [0x00, 0x00])
+        return commands
+
+    def _get_init_program(self, lut=None):
+        """Return the compiled setup program for the current configuration and LUT, default: lut."""
+        lut = self.lut if lut is None else lut
+        key = (self.rows, self.colour, self.border_colour, lut, tuple(self._luts[lut]))
+        compiled = self._programs.get(key)
+        if compiled is None:
+            compiled = program.CommandProgram(self._init_commands(lut), registers=_REGISTERS)
+            self._programs[key] = compiled
+        return compiled
+
+    def _run_program(self, compiled):
+        """Send a compiled program, skipping registers the controller already holds."""
+        compiled.run(self._spi_write, self._registers)
+
+    def _waveforms(self):
+        """Return the waveform table for this panel, see waveform.WaveformTable."""
+        return waveform.WaveformTable(self.lut, {('normal', 'fast'): 'black_fast'})
+
+    def read_temperature(self):
+        """Return the panel temperature in degrees C, or None if it can't be read.
+
+        Uses temperature if set, otherwise the controller's temperature register,
+        which the controller loads from its sensor during each refresh. After a
+        reset there's no reading until the next refresh, so use warm_wake to keep it.
+
+        """
+        if self.temperature is None:
+            self.setup()
+        return self._temperature()
+
+    def _temperature(self):
+        """Return the panel temperature, reading the register of a controller that's already set up if needed."""
+        if self.temperature is not None:
+            return float(self.temperature() if callable(self.temperature) else self.temperature)
+
+        if self._sensor_temperature is not None:
+            temperature, t_read = self._sensor_temperature
+            if temperature is not None and time.time() - t_read < waveform.TEMPERATURE_INTERVAL:
+                return temperature
+
+        with self.timings.phase('temperature'):
+            temperature = waveform.decode_temperature(self._spi_read(ssd1608.TEMP_READ, 2))
+        self._sensor_temperature = (temperature, time.time())
+        return temperature
+
+    def _select_waveform(self, colour):
+        """Return the (LUT name, mode, band, temperature) for an update.
+
+        :param colour: whether the frame, or its border, has any red/yellow pixels
 
-        for data in ((ssd1608.WRITE_RAM, buf_a), (ssd1608.WRITE_ALTRAM, buf_b)):
-            cmd, buf = data
-            self._send_command(cmd, buf)
+        """
+        temperature = None
+        if self.refresh_mode != waveform.REFRESH_FULL or self.temperature is not None:
+            temperature = self._temperature()
+        # Black/white waveforms can't clear red/yellow pixels left by the previous frame
+        colour_pixels = colour or self._colour_shown
+        lut, mode, band = self._waveforms().select(temperature, self.refresh_mode, colour_pixels, self._fast_count)
+        self._fast_count = self._fast_count + 1 if mode == 'fast' else 0
+        return lut, mode, band, temperature
+
+    def _update(self, buf_a, buf_b, busy_wait=True):
+        """Update display.
+
+        Dispatches display update to correct driver.
+
+        :param buf_a: Black/White pixels
+        :param buf_b: Yellow/Red pixels
+
+        """
+        with self.timings.phase('setup'):
+            self.setup()
+
+        # Until this update completes the controller state is unknown, so an error forces a reset
+        self.power_state = 'unknown'
+
+        # Frames without red/yellow pixels need no colour plane written
+        colour_plane = bool(numpy.any(buf_b))
+        colour = colour_plane or self.border_colour not in (BLACK, WHITE)
+
+        lut, mode, band, temperature = self._select_waveform(colour)
+        self._run_program(self._get_init_program(lut))
+
+        window, diff = self._ram_window(buf_a, buf_b)
+        if window is None or diff is None:
+            x_start, x_end, y_start, y_end = 0, self.cols // 8 - 1, 0, self.rows - 1
+        else:
+            x_start, x_end, y_start, y_end = window
+        # Set ram X start and end position
+        xposBuf = [x_start, x_end]
+        self._send_command(ssd1608.SET_RAMXPOS, xposBuf)
+        # Set ram Y start and end position
+        yposBuf = [y_start & 0xFF, y_start >> 8, y_end & 0xFF, y_end >> 8]
+        self._send_command(ssd1608.SET_RAMYPOS, yposBuf)
+
+        # Set RAM address to the window start, 0, 0 for a full frame
+        self._send_command(ssd1608.SET_RAMXCOUNT, [x_start])
+        self._send_command(ssd1608.SET_RAMYCOUNT, [y_start & 0xFF, y_start >> 8])
+
+        # Colour RAM already cleared by a previous frame is left alone
+        # Only when the driver owns controller RAM, in cold mode another process may have written it between updates
+        planes = [(ssd1608.WRITE_RAM, buf_a)]
+        if colour_plane or not (self._colour_ram_clear and (self.warm_wake or self.partial_update)):
+            planes.append((ssd1608.WRITE_ALTRAM, buf_b))
+        self._colour_ram_clear = False
+
+        # Skip RAM writes entirely if the controller already holds this frame
+        if window is not None:
+            for cmd, buf in planes:
+                if diff is not None:
+                    buf = diff.crop(buf, window)
+                self._send_command(cmd, buf)
+
+        if diff is not None:
+            diff.commit(buf_a, buf_b)
+        self._colour_ram_clear = not colour_plane
 
         self._busy_wait()
         self._send_command(ssd1608.MASTER_ACTIVATE)
+        t_refresh = self._refresh_started = time.time()
+        self._colour_shown = colour
+        self.power_state = 'busy'
+        self.last_refresh = {'lut': lut, 'mode': mode, 'band': band, 'temperature': temperature, 'seconds': None}
+
+        if busy_wait:
+            with self.timings.phase('refresh'):
+                self._busy_wait(_REFRESH_TIMEOUT)
+            self.last_refresh['seconds'] = time.time() - t_refresh
+            self.power_state = 'awake'
 
     def set_pixel(self, x, y, v):
         """Set a single pixel.
@@ -225,54 +478,166 @@ class Inky:
         """
         if v in (WHITE, BLACK, RED):
             self.buf[y][x] = v
+            self._packed = None
 
-    def show(self, busy_wait=True):
+    def show(self, busy_wait=True, force=False):
         """Show buffer on display.
 
         :param busy_wait: If True, wait for display update to finish before returning.
+        :param force: If True, refresh even if frame_cache says this frame is already displayed.
 
         """
-        region = self.buf
+        self._show(self.buf if self._packed is None else self._packed, busy_wait=busy_wait, force=force)
+
+    def show_async(self, busy_wait=True, force=False):
+        """Show buffer on display without blocking the asyncio event loop.
 
-        if self.v_flip:
-            region = numpy.fliplr(region)
+        Returns an awaitable. The buffer is copied when the update starts, so
+        drawing can continue during the refresh. Concurrent calls are serialised.
 
-        if self.h_flip:
-            region = numpy.flipud(region)
+        :param busy_wait: If True, wait for display update to finish before completing.
+        :param force: If True, refresh even if frame_cache says this frame is already displayed.
+        """
+        from . import aio
+        return aio.show(self, busy_wait=busy_wait, force=force)
 
-        if self.rotation:
-            region = numpy.rot90(region, self.rotation // 90)
+    def _show(self, buf, busy_wait=True, force=False):
+        """Pack `buf` and show it on display, see :meth:`show`.
 
-        buf_a = numpy.packbits(numpy.where(region == BLACK, 0, 1)).tolist()
-        buf_b = numpy.packbits(numpy.where(region == RED, 1, 0)).tolist()
+        `buf` may also be a tuple of pre-packed planes, see :meth:`set_packed`.
+
+        """
+        if isinstance(buf, tuple):
+            buf_a, buf_b = buf
+        else:
+            packer = self._get_packer(buf)
+            with self.timings.phase('transform'):
+                packer.transform(buf)
+            with self.timings.phase('pack'):
+                buf_a, buf_b = packer.pack_bits()
+
+        key = self._frame_key(buf_a, buf_b)
+        if key is not None and not force and self.frame_cache.check(key):
+            return
 
         self._update(buf_a, buf_b, busy_wait=busy_wait)
 
+        if self.recorder is not None:
+            self.recorder.record(self, (buf_a, buf_b))
+
+        if key is not None:
+            self.frame_cache.store(key)
+
+    def _frame_key(self, *planes):
+        """Return the frame cache key for packed planes, or `None` if caching is disabled."""
+        if self.frame_cache is None:
+            return None
+        return cache.frame_key(planes, self.resolution, self.colour, self.border_colour, self._luts[self.lut])
+
+    def _get_packer(self, buf):
+        """Return a plane packer for the shape of `buf` and the current orientation."""
+        key = (buf.shape, self.rotation, self.h_flip, self.v_flip)
+        if self._packer is None or self._packer.key != key:
+            self._packer = packing.PlanePacker(buf.shape, self.rotation, self.h_flip, self.v_flip, black=BLACK, colour=RED)
+            self._frame_diff = packing.FrameDiff(self._packer.scan_shape)
+        return self._packer
+
+    def _ram_window(self, buf_a, buf_b):
+        """Return the controller RAM window to write and the frame tracker to crop it with.
+
+        The window is `None` if controller RAM already holds this frame.
+        The tracker is `None` if partial updates are disabled.
+
+        :param buf_a: Black/White pixels
+        :param buf_b: Yellow/Red pixels
+
+        """
+        diff = self._frame_diff
+        if diff is None or not self.partial_update:
+            if diff is not None:
+                diff.invalidate()
+            return (0, self.cols // 8 - 1, 0, self.rows - 1), None
+
+        window = diff.window(buf_a, buf_b)
+        # Until this frame has been written RAM contents are unknown
+        diff.invalidate()
+        return window, diff
+
     def set_border(self, colour):
         """Set the border colour."""
         if colour in (WHITE, BLACK, RED):
             self.border_colour = colour
 
     def set_image(self, image):
-        """Copy an image to the display."""
-        canvas = Image.new("P", (self.rows, self.cols))
-        canvas.paste(image, (self.offset_x, self.offset_y))
-        self.buf = numpy.array(canvas, dtype=numpy.uint8).reshape((self.cols, self.rows))
+        """Copy an image to the display.
+
+        Images of the display size are written into the existing buffer, arrays and buffers are not copied first.
+
+        :param image: PIL "P" or "1" image, numpy array or memoryview of palette indexes, 250x122
+
+        """
+        if buffer.is_image(image) and image.size != (self.width, self.height):
+            # Crop or pad other sizes the way PIL pastes them
+            from PIL import Image
+            canvas = Image.new("P", (self.rows, self.cols))
+            canvas.paste(image, (self.offset_x, self.offset_y))
+            buffer.copy_into(self.buf, canvas, 3, one_bit=(BLACK, WHITE))
+        else:
+            x, y = self.offset_x, self.offset_y
+            buffer.copy_into(self.buf[y:y + self.height, x:x + self.width], image, 3, one_bit=(BLACK, WHITE))
+            self.buf[:y] = WHITE
+            self.buf[y + self.height:] = WHITE
+            self.buf[:, :x] = WHITE
+            self.buf[:, x + self.width:] = WHITE
+        self._packed = None
+
+    def set_packed(self, black_white, colour=None):
+        """Show pre-packed planes on the next update, skipping the buffer.
+
+        Planes are 1 bit per pixel, most significant bit first, in controller scan order, as sent to the display.
+        They are not copied, and are shown instead of the buffer until the next set_image or set_pixel.
+
+        :param black_white: black/white plane as bytes, memoryview or numpy array, bits set for white
+        :param colour: red/yellow plane, bits set for red/yellow, default: None for no colour
+
+        """
+        size = self._get_packer(self.buf).plane_size
+        black_white = buffer.as_plane(black_white, size, 'black/white plane')
+        if colour is None:
+            colour = numpy.zeros(size, dtype=numpy.uint8)
+        else:
+            colour = buffer.as_plane(colour, size, 'colour plane')
+        self._packed = (black_white, colour)
 
     def _spi_write(self, dc, values):
         """Write values over SPI.
 
         :param dc: whether to write as data or command
-        :param values: list of values to write
+        :param values: bytes, bytearray, numpy.ndarray or list of values to write
+
+        """
+        with self._bus_lock:
+            self._gpio.output(self.dc_pin, dc)
+            spi.timed_write(self._spi_bus, values, self.spi_stats, timings=self.timings)
+
+    def _spi_read(self, command, count):
+        """Send a command and read count bytes back over the data line, or return None if the bus can't.
+
+        The panel's data line is bidirectional, so reads need spidev's 3-wire mode.
 
         """
-        self._gpio.output(self.dc_pin, dc)
-        try:
-            self._spi_bus.xfer3(values)
-        except AttributeError:
-            for x in range(((len(values) - 1) // _SPI_CHUNK_SIZE) + 1):
-                offset = x * _SPI_CHUNK_SIZE
-                self._spi_bus.xfer(values[offset:offset + _SPI_CHUNK_SIZE])
+        with self._bus_lock:
+            self._send_command(command)
+            self._gpio.output(self.dc_pin, _SPI_DATA)
+            try:
+                threewire = self._spi_bus.threewire
+                self._spi_bus.threewire = True
+                try:
+                    return list(self._spi_bus.readbytes(count))
+                finally:
+                    self._spi_bus.threewire = threewire
+            except (AttributeError, IOError, OSError):
+                return None
 
     def _send_command(self, command, data=None):
         """Send command over SPI.
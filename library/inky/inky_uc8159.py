@@ -1,14 +1,10 @@
 """Inky e-Ink Display Driver."""
+import threading
 import time
 import struct
 import warnings
 
-try:
-    from PIL import Image
-except ImportError:
-    Image = None
-
-from . import eeprom
+from . import buffer, busy, cache, draw, eeprom, packing, program, quantize, spi, timing
 
 try:
     import numpy
@@ -46,6 +42,9 @@ SATURATED_PALETTE = [
     [255, 255, 255]
 ]
 
+# Shared by all displays so cached palettes are reused, see quantize.Quantizer
+_QUANTIZER = quantize.Quantizer(SATURATED_PALETTE, DESATURATED_PALETTE)
+
 RESET_PIN = 27
 BUSY_PIN = 17
 DC_PIN = 22
@@ -83,10 +82,26 @@ UC8159_VDCS = 0x82
 UC8159_PWS = 0xE3
 UC8159_TSSET = 0xE5
 
-_SPI_CHUNK_SIZE = 4096
+# SPI clock speed in Hz
+_SPI_SPEED_HZ = 3000000
+
 _SPI_COMMAND = 0
 _SPI_DATA = 1
 
+# Setup commands that only write register values, and can be skipped if unchanged
+_REGISTERS = (
+    UC8159_TRES,
+    UC8159_PSR,
+    UC8159_PWR,
+    UC8159_PLL,
+    UC8159_TSE,
+    UC8159_CDI,
+    UC8159_TCON,
+    UC8159_DAM,
+    UC8159_PWS,
+    UC8159_PFS
+)
+
 _RESOLUTION_5_7_INCH = (600, 448)  # Inky Impression 5.7"
 _RESOLUTION_4_INCH = (640, 400)    # Inky Impression 4"
 
@@ -96,7 +111,7 @@ _RESOLUTION = {
 }
 
 
-class Inky:
+class Inky(draw.Canvas):
     """Inky e-Ink Display Driver."""
 
     BLACK = 0
@@ -108,10 +123,15 @@ class Inky:
     ORANGE = 6
     CLEAN = 7
 
+    _colours = (BLACK, WHITE, GREEN, BLUE, RED, YELLOW, ORANGE, CLEAN)
+
     WIDTH = 600
     HEIGHT = 448
 
-    def __init__(self, resolution=None, colour='multi', cs_pin=CS0_PIN, dc_pin=DC_PIN, reset_pin=RESET_PIN, busy_pin=BUSY_PIN, h_flip=False, v_flip=False, spi_bus=None, i2c_bus=None, gpio=None):  # noqa: E501
+    # Controller name, see waveform.lut_phases and record.Archive
+    _CONTROLLER = 'uc8159'
+
+    def __init__(self, resolution=None, colour='multi', cs_pin=CS0_PIN, dc_pin=DC_PIN, reset_pin=RESET_PIN, busy_pin=BUSY_PIN, h_flip=False, v_flip=False, spi_bus=None, i2c_bus=None, gpio=None, frame_cache=None, warm_wake=False, timings=None, epd_type=None):  # noqa: E501
         """Initialise an Inky Display.
 
         :param resolution: (width, height) in pixels, default: (600, 448)
@@ -122,11 +142,15 @@ class Inky:
         :param busy_pin: device busy/wait pin
         :param h_flip: enable horizontal display flip, default: False
         :param v_flip: enable vertical display flip, default: False
+        :param frame_cache: state file path or cache.FrameCache, skip refreshing unchanged frames
+        :param warm_wake: keep the controller initialised between updates, only reset after deep sleep or an error, default: False
+        :param timings: timing.Timings, or a callback taking (phase, seconds, nbytes), to time each phase of an update
+        :param epd_type: eeprom.EPDType already read, eg: by auto(), skips reading the EEPROM again
 
         """
         self._spi_bus = spi_bus
         self._i2c_bus = i2c_bus
-        self.eeprom = eeprom.read_eeprom(i2c_bus=i2c_bus)
+        self.eeprom = eeprom.read_eeprom(i2c_bus=i2c_bus) if epd_type is None else epd_type
 
         # Check for supported display variant and select the correct resolution
         # Eg: 600x480 and 640x400
@@ -166,26 +190,53 @@ class Inky:
         self._gpio = gpio
         self._gpio_setup = False
 
+        # Held for each SPI transfer, shared by displays on the same bus, see group.DisplayGroup
+        self._bus_lock = threading.RLock()
+
+        # Preallocated pixel packer for this orientation, rebuilt if the flips are changed
+        self._packer = None
+        self._get_packer(self.buf)
+
+        # Pre-packed pixels shown instead of buf, see set_packed
+        self._packed = None
+
+        # Bytes written over SPI and time taken, see spi_stats.bytes_per_second
+        self.spi_stats = spi.SPIStats()
+
+        # Time spent in each phase of an update, see timing.Timings
+        self.timings = timing.get_timings(timings)
+
+        # Controller power state: 'unknown', 'awake', 'busy' (updating) or 'sleep' (deep sleep)
+        self.warm_wake = warm_wake
+        self.power_state = 'unknown'
+
+        # Compiled setup programs by configuration, and register values held by the controller since its last reset
+        self._programs = {}
+        self._registers = {}
+
+        # Skip refreshing frames already on the display, see cache.FrameCache
+        if frame_cache is not None and not isinstance(frame_cache, cache.FrameCache):
+            frame_cache = cache.FrameCache(frame_cache)
+        self.frame_cache = frame_cache
+
+        # Archive every frame shown, see record.Recorder
+        self.recorder = None
+
         self._luts = None
 
     def _palette_blend(self, saturation, dtype='uint8'):
-        saturation = float(saturation)
-        palette = []
-        for i in range(7):
-            rs, gs, bs = [c * saturation for c in SATURATED_PALETTE[i]]
-            rd, gd, bd = [c * (1.0 - saturation) for c in DESATURATED_PALETTE[i]]
-            if dtype == 'uint8':
-                palette += [int(rs + rd), int(gs + gd), int(bs + bd)]
-            if dtype == 'uint24':
-                palette += [(int(rs + rd) << 16) | (int(gs + gd) << 8) | int(bs + bd)]
-        if dtype == 'uint8':
-            palette += [255, 255, 255]
+        palette = _QUANTIZER.palette(saturation).astype(numpy.uint32)
         if dtype == 'uint24':
-            palette += [0xffffff]
-        return palette
+            return ((palette[:, 0] << 16) | (palette[:, 1] << 8) | palette[:, 2]).tolist()
+        return palette.reshape(-1).tolist()
 
     def setup(self):
-        """Set up Inky GPIO and reset display."""
+        """Set up Inky GPIO and reset display.
+
+        With warm_wake enabled the reset is skipped if the controller is already awake,
+        only changed registers are sent.
+
+        """
         if not self._gpio_setup:
             if self._gpio is None:
                 try:
@@ -199,6 +250,7 @@ class Inky:
             self._gpio.setup(self.dc_pin, self._gpio.OUT, initial=self._gpio.LOW, pull_up_down=self._gpio.PUD_OFF)
             self._gpio.setup(self.reset_pin, self._gpio.OUT, initial=self._gpio.HIGH, pull_up_down=self._gpio.PUD_OFF)
             self._gpio.setup(self.busy_pin, self._gpio.IN, pull_up_down=self._gpio.PUD_OFF)
+            self._busy = busy.BusyPin(self._gpio, self.busy_pin, active_low=True)
 
             if self._spi_bus is None:
                 import spidev
@@ -206,23 +258,45 @@ class Inky:
 
             self._spi_bus.open(0, self.cs_channel)
             self._spi_bus.no_cs = True
-            self._spi_bus.max_speed_hz = 3000000
+            self._spi_bus.max_speed_hz = _SPI_SPEED_HZ
 
             self._gpio_setup = True
 
+        if self.warm_wake and self.power_state == 'awake':
+            self._run_program(self._get_init_program())
+            return
+
+        self.power_state = 'unknown'
+        self._registers.clear()
+
         self._gpio.output(self.reset_pin, self._gpio.LOW)
         time.sleep(0.1)
         self._gpio.output(self.reset_pin, self._gpio.HIGH)
 
         self._busy_wait(1.0)
 
+        self._run_program(self._get_init_program())
+        self.power_state = 'awake'
+
+    def sleep(self):
+        """Put the controller into deep sleep, the next update will reset it."""
+        if not self._gpio_setup or self.power_state == 'sleep':
+            return
+        self._send_command(UC8159_DSLP, [0xA5])  # 0xA5 check code required to enter deep sleep
+        self._registers.clear()
+        self.power_state = 'sleep'
+
+    def _init_commands(self):
+        """Return the (command, data) controller setup sequence sent after reset."""
+        commands = []
+
         # Resolution Setting
         # 10bit horizontal followed by a 10bit vertical resolution
         # we'll let struct.pack do the work here and send 16bit values
         # life is too short for manual bit wrangling
-        self._send_command(
+        commands.append((
             UC8159_TRES,
-            struct.pack(">HH", self.width, self.height))
+            struct.pack(">HH", self.width, self.height)))
 
         # Panel Setting
         # 0b11000000 = Resolution select, 0b00 = 640x480, our panel is 0b11 = 600x448
@@ -234,16 +308,16 @@ class Inky:
         # 0b00000001 = Soft reset, 0 = Reset, 1 = Normal (Default)
         # 0b11 = 600x448
         # 0b10 = 640x400
-        self._send_command(
+        commands.append((
             UC8159_PSR,
             [
                 (self.resolution_setting << 6) | 0b101111,  # See above for more magic numbers
                 0x08                                        # display_colours == UC8159_7C
             ]
-        )
+        ))
 
         # Power Settings
-        self._send_command(
+        commands.append((
             UC8159_PWR,
             [
                 (0x06 << 3) |  # ??? - not documented in UC8159 datasheet
@@ -254,7 +328,7 @@ class Inky:
                 0x23,          # UC8159_7C
                 0x23           # UC8159_7C
             ]
-        )
+        ))
 
         # Set the PLL clock frequency to 50Hz
         # 0b11000000 = Ignore
@@ -263,35 +337,50 @@ class Inky:
         # PLL = 2MHz * (M / N)
         # PLL = 2MHz * (7 / 4)
         # PLL = 2,800,000 ???
-        self._send_command(UC8159_PLL, [0x3C])  # 0b00111100
+        commands.append((UC8159_PLL, [0x3C]))  # 0b00111100
 
         # Send the TSE register to the display
-        self._send_command(UC8159_TSE, [0x00])  # Colour
+        commands.append((UC8159_TSE, [0x00]))  # Colour
 
         # VCOM and Data Interval setting
         # 0b11100000 = Vborder control (0b001 = LUTB voltage)
         # 0b00010000 = Data polarity
         # 0b00001111 = Vcom and data interval (0b0111 = 10, default)
         cdi = (self.border_colour << 5) | 0x17
-        self._send_command(UC8159_CDI, [cdi])  # 0b00110111
+        commands.append((UC8159_CDI, [cdi]))  # 0b00110111
 
         # Gate/Source non-overlap period
         # 0b11110000 = Source to Gate (0b0010 = 12nS, default)
         # 0b00001111 = Gate to Source
-        self._send_command(UC8159_TCON, [0x22])  # 0b00100010
+        commands.append((UC8159_TCON, [0x22]))  # 0b00100010
 
         # Disable external flash
-        self._send_command(UC8159_DAM, [0x00])
+        commands.append((UC8159_DAM, [0x00]))
 
         # UC8159_7C
-        self._send_command(UC8159_PWS, [0xAA])
+        commands.append((UC8159_PWS, [0xAA]))
 
         # Power off sequence
         # 0b00110000 = power off sequence of VDH and VDL, 0b00 = 1 frame (default)
         # All other bits ignored?
-        self._send_command(
+        commands.append((
             UC8159_PFS, [0x00]  # PFS_1_FRAME
-        )
+        ))
+
+        return commands
+
+    def _get_init_program(self):
+        """Return the compiled setup program for the current configuration."""
+        key = (self.width, self.height, self.resolution_setting, self.border_colour)
+        compiled = self._programs.get(key)
+        if compiled is None:
+            compiled = program.CommandProgram(self._init_commands(), registers=_REGISTERS)
+            self._programs[key] = compiled
+        return compiled
+
+    def _run_program(self, compiled):
+        """Send a compiled program, skipping registers the controller already holds."""
+        compiled.run(self._spi_write, self._registers)
 
     def _busy_wait(self, timeout=40.0):
         """Wait for busy/wait pin."""
@@ -305,13 +394,12 @@ class Inky:
             return
 
         # If the busy_pin is *low* (pulled down by inky)
-        # then wait for it to high.
+        # then wait for the rising edge as it goes high.
         t_start = time.time()
-        while not self._gpio.input(self.busy_pin):
-            time.sleep(0.01)
-            if time.time() - t_start >= timeout:
-                warnings.warn("Busy Wait: Timed out after {:0.2f}s".format(time.time() - t_start))
-                return
+        if not self._busy.wait(timeout):
+            # The controller is in an unknown state, reset it before the next update
+            self.power_state = 'unknown'
+            warnings.warn("Busy Wait: Timed out after {:0.2f}s".format(time.time() - t_start))
 
     def _update(self, buf):
         """Update display.
@@ -322,18 +410,27 @@ class Inky:
         :param buf_b: Yellow/Red pixels
 
         """
-        self.setup()
+        with self.timings.phase('setup'):
+            self.setup()
+
+        # A busy timeout or other error during the update leaves the state unknown, forcing a reset
+        self.power_state = 'busy'
 
         self._send_command(UC8159_DTM1, buf)
 
         self._send_command(UC8159_PON)
         self._busy_wait(0.2)
 
-        self._send_command(UC8159_DRF)
-        self._busy_wait(32.0)
+        with self.timings.phase('refresh'):
+            self._send_command(UC8159_DRF)
+            self._busy_wait(32.0)
 
-        self._send_command(UC8159_POF)
-        self._busy_wait(0.2)
+        with self.timings.phase('power_off'):
+            self._send_command(UC8159_POF)
+            self._busy_wait(0.2)
+
+        if self.power_state == 'busy':
+            self.power_state = 'awake'
 
     def set_pixel(self, x, y, v):
         """Set a single pixel.
@@ -344,77 +441,122 @@ class Inky:
 
         """
         self.buf[y][x] = v & 0x07
+        self._packed = None
 
-    def show(self, busy_wait=True):
+    def show(self, busy_wait=True, force=False):
         """Show buffer on display.
 
         :param busy_wait: If True, wait for display update to finish before returning.
+        :param force: If True, refresh even if frame_cache says this frame is already displayed.
 
         """
-        region = self.buf
+        self._show(self.buf if self._packed is None else self._packed, busy_wait=busy_wait, force=force)
 
-        if self.v_flip:
-            region = numpy.fliplr(region)
+    def show_async(self, busy_wait=True, force=False):
+        """Show buffer on display without blocking the asyncio event loop.
 
-        if self.h_flip:
-            region = numpy.flipud(region)
+        Returns an awaitable. The buffer is copied when the update starts, so
+        drawing can continue during the refresh. Concurrent calls are serialised.
 
-        if self.rotation:
-            region = numpy.rot90(region, self.rotation // 90)
+        :param busy_wait: If True, wait for display update to finish before completing.
+        :param force: If True, refresh even if frame_cache says this frame is already displayed.
+        """
+        from . import aio
+        return aio.show(self, busy_wait=busy_wait, force=force)
 
-        buf = region.flatten()
+    def _show(self, buf, busy_wait=True, force=False):
+        """Pack `buf` and show it on display, see :meth:`show`.
 
-        buf = ((buf[::2] << 4) & 0xF0) | (buf[1::2] & 0x0F)
+        `buf` may also be a tuple holding pre-packed pixels, see :meth:`set_packed`.
 
-        self._update(buf.astype('uint8').tolist())
+        """
+        if isinstance(buf, tuple):
+            buf, = buf
+        else:
+            packer = self._get_packer(buf)
+            with self.timings.phase('transform'):
+                packer.transform(buf)
+            with self.timings.phase('pack'):
+                buf = packer.pack_bits()
+
+        key = self._frame_key(buf)
+        if key is not None and not force and self.frame_cache.check(key):
+            return
+
+        self._update(buf)
+
+        if self.recorder is not None:
+            self.recorder.record(self, (buf,))
+
+        if key is not None:
+            self.frame_cache.store(key)
+
+    def _get_packer(self, buf):
+        """Return a pixel packer for the shape of `buf` and the current orientation."""
+        key = (buf.shape, self.rotation, self.h_flip, self.v_flip)
+        if self._packer is None or self._packer.key != key:
+            self._packer = packing.NibblePacker(buf.shape, self.rotation, self.h_flip, self.v_flip)
+        return self._packer
+
+    def _frame_key(self, *planes):
+        """Return the frame cache key for packed planes, or `None` if caching is disabled."""
+        if self.frame_cache is None:
+            return None
+        return cache.frame_key(planes, self.resolution, self.colour, self.border_colour, self.lut)
 
     def set_border(self, colour):
         """Set the border colour."""
         if colour in (BLACK, WHITE, GREEN, BLUE, RED, YELLOW, ORANGE, CLEAN):
             self.border_colour = colour
 
-    def set_image(self, image, saturation=0.5):
+    def set_image(self, image, saturation=0.5, dither=quantize.DITHER_FLOYD_STEINBERG):
         """Copy an image to the display.
 
-        :param image: PIL image to copy, must be 600x448
+        "P" images, and arrays or memoryviews of palette indexes, are written into the existing buffer.
+        Other images are quantized, those that only use panel colours are copied without dithering.
+
+        :param image: PIL image, numpy array or memoryview to copy, must be 600x448
         :param saturation: Saturation for quantization palette - higher value results in a more saturated image
+        :param dither: one of 'none', 'bayer' or 'floyd-steinberg', default: 'floyd-steinberg'
+
+        """
+        if buffer.is_image(image):
+            if not image.size == (self.width, self.height):
+                raise ValueError("Image must be ({}x{}) pixels!".format(self.width, self.height))
+            if image.mode not in ("P", "1"):
+                if quantize.pil_image() is None:
+                    raise RuntimeError("PIL is required for converting images: sudo apt install python-pil python3-pil")
+                image = _QUANTIZER.quantize(image, saturation, dither)
+        elif getattr(image, 'ndim', None) == 3:
+            image = _QUANTIZER.quantize(image, saturation, dither)
+        buffer.copy_into(self.buf, image, 8, one_bit=(BLACK, WHITE))
+        self._packed = None
+
+    def set_packed(self, pixels):
+        """Show pre-packed pixels on the next update, skipping the buffer.
+
+        Pixels are two per byte, first pixel in the high nibble, in controller scan order, as sent to the display.
+        They are not copied, and are shown instead of the buffer until the next set_image or set_pixel.
+
+        :param pixels: packed pixels as bytes, memoryview or numpy array
 
         """
-        if not image.size == (self.width, self.height):
-            raise ValueError("Image must be ({}x{}) pixels!".format(self.width, self.height))
-        if not image.mode == "P":
-            if Image is None:
-                raise RuntimeError("PIL is required for converting images: sudo apt install python-pil python3-pil")
-            palette = self._palette_blend(saturation)
-            # Image size doesn't matter since it's just the palette we're using
-            palette_image = Image.new("P", (1, 1))
-            # Set our 7 colour palette (+ clear) and zero out the other 247 colours
-            palette_image.putpalette(palette + [0, 0, 0] * 248)
-            # Force source image data to be loaded for `.im` to work
-            image.load()
-            image = image.im.convert("P", True, palette_image.im)
-        self.buf = numpy.array(image, dtype=numpy.uint8).reshape((self.rows, self.cols))
+        size = self.rows * self.cols // 2
+        self._packed = (buffer.as_plane(pixels, size, 'packed pixels'),)
 
     def _spi_write(self, dc, values):
         """Write values over SPI.
 
         :param dc: whether to write as data or command
-        :param values: list of values to write
+        :param values: bytes, bytearray, numpy.ndarray or list of values to write
 
         """
-        self._gpio.output(self.cs_pin, 0)
-        self._gpio.output(self.dc_pin, dc)
+        with self._bus_lock:
+            self._gpio.output(self.cs_pin, 0)
+            self._gpio.output(self.dc_pin, dc)
 
-        if type(values) is str:
-            values = [ord(c) for c in values]
-
-        try:
-            self._spi_bus.xfer3(values)
-        except AttributeError:
-            for x in range(((len(values) - 1) // _SPI_CHUNK_SIZE) + 1):
-                offset = x * _SPI_CHUNK_SIZE
-                self._spi_bus.xfer(values[offset:offset + _SPI_CHUNK_SIZE])
-        self._gpio.output(self.cs_pin, 1)
+            spi.timed_write(self._spi_bus, values, self.spi_stats, timings=self.timings)
+            self._gpio.output(self.cs_pin, 1)
 
     def _send_command(self, command, data=None):
         """Send command over SPI.
@@ -1,31 +1,69 @@
-"""PIL/Tkinter based simulator for InkyWHAT and InkyWHAT."""
+"""PIL/Tkinter based simulator for InkyWHAT and InkyWHAT.
+
+With `headless=True` no window is opened and neither Tkinter nor PIL is
+needed: shown frames are rendered to RGB arrays, see :meth:`InkyMock.image`,
+and optionally passed to a function or saved as PNG files::
+
+    >>> from inky.mock import InkyMockWHAT
+    >>> display = InkyMockWHAT('red', headless=True, output='frame-{frame:04d}.png')
+    >>> display.show()
+    >>> display.image().shape
+    (300, 400, 3)
+
+"""
+import io
+
 import numpy
 
 
+from . import buffer
+from . import clock
 from . import inky
+from . import inky_ssd1608
 from . import inky_uc8159
+from . import packing
+from . import quantize
+from . import waveform
+
+# Set by the first windowed simulator, see InkyMock.__init__
+Image = None
 
 
 class InkyMock(inky.Inky):
     """Base simulator class for Inky."""
 
-    def __init__(self, colour, h_flip=False, v_flip=False):
+    # Driver module simulated, its LUTs and SPI speed give the refresh time model, see simulate_time
+    _DRIVER = inky
+    _CONTROLLER = 'ssd1675'
+    _BITS_PER_PIXEL = 2
+
+    # Seconds the driver spends resetting the controller, and bytes of setup commands, for each update
+    _RESET_SECONDS = 0.2
+    _SETUP_BYTES = 100
+
+    def __init__(self, colour, h_flip=False, v_flip=False, headless=False, output=None, simulate_time=None):
         """Initialise an Inky pHAT Display.
 
         :param colour: one of red, black or yellow, default: black
+        :param headless: render frames to arrays only, without a Tkinter window, default: False
+        :param output: function called with each frame as an RGB array, or a PNG file path for each frame,
+            where {frame} is replaced by the frame number, default: None
+        :param simulate_time: 'block' for updates that take as long as on the panel, 'virtual' to advance clock
+            by that long instead, default: None for instant updates
 
         """
         global tkinter, ImageTk, Image
 
-        try:
-            import tkinter
-        except ImportError:
-            raise ImportError('Simulation requires tkinter')
+        if not headless:
+            try:
+                import tkinter
+            except ImportError:
+                raise ImportError('Simulation requires tkinter')
 
-        try:
-            from PIL import ImageTk, Image
-        except ImportError:
-            raise ImportError('Simulation requires PIL ImageTk and Image')
+            try:
+                from PIL import ImageTk, Image
+            except ImportError:
+                raise ImportError('Simulation requires PIL ImageTk and Image')
 
         resolution = (self.WIDTH, self.HEIGHT)
 
@@ -45,6 +83,14 @@ class InkyMock(inky.Inky):
 
         self.h_flip = h_flip
         self.v_flip = v_flip
+        self._orientation = None
+        self._orientation_key = None
+        self._packed = None
+        self._packer = None
+        self.border_colour = self.WHITE
+
+        # Archive every frame shown, as the driver would pack it, see record.Recorder
+        self.recorder = None
 
         impression_palette = [57, 48, 57,     # black
                               255, 255, 255,  # white
@@ -73,18 +119,43 @@ class InkyMock(inky.Inky):
                           'yellow': ylw_inky_palette,
                           'multi': impression_palette}
 
+        # RGB for every palette index, buffer values beyond the palette show as black
+        palette = numpy.array(self.c_palette[colour], dtype=numpy.uint8).reshape((-1, 3))
+        self._rgb = numpy.zeros((256, 3), dtype=numpy.uint8)
+        self._rgb[:len(palette)] = palette
+
+        # Last frame shown, as an RGB array, and the number shown so far
+        self.frame = None
+        self.frames = 0
+        self.headless = headless
+        self.output = output
+
+        # Update time model, and the clock it advances, see inky.clock
+        if simulate_time not in (None, 'block', 'virtual'):
+            raise ValueError("simulate_time must be 'block', 'virtual' or None")
+        self.refresh_model = None if simulate_time is None else self._refresh_model()
+        self.clock = clock.VirtualClock() if simulate_time == 'virtual' else clock.RealClock()
+        self.last_update = None
+        self._busy_until = 0.0
+
+        self.tk_root = None
+        self.cv = None
+        if headless:
+            return
+
         self._tk_done = False
         self.tk_root = tkinter.Tk()
         self.tk_root.title('Inky Preview')
         self.tk_root.geometry('{}x{}'.format(self.WIDTH, self.HEIGHT))
         self.tk_root.aspect(self.WIDTH, self.HEIGHT, self.WIDTH, self.HEIGHT)
         self.tk_root.protocol('WM_DELETE_WINDOW', self._close_window)
-        self.cv = None
         self.cvh = self.HEIGHT
         self.cvw = self.WIDTH
 
     def wait_for_window_close(self):
-        """Wait until the Tkinter window has closed."""
+        """Wait until the Tkinter window has closed, returns at once when headless."""
+        if self.headless:
+            return
         while not self._tk_done:
             self.tk_root.update_idletasks()
             self.tk_root.update()
@@ -109,43 +180,137 @@ class InkyMock(inky.Inky):
     def _send_command(self, command, data=None):
         pass
 
-    def _simulate(self, region):
-        pass
+    def image(self):
+        """Return the last frame shown as an RGB numpy array of (height, width, 3), or None before the first."""
+        return self.frame
+
+    def png(self):
+        """Return the last frame shown as PNG file contents, or None before the first.
+
+        Requires PIL.
 
-    def _display(self, region):
-        im = Image.fromarray(region, 'P')
-        im.putpalette(self.c_palette[self.colour])
+        """
+        if self.frame is None:
+            return None
+        pil = quantize.pil_image()
+        if pil is None:
+            raise ImportError('PNG output requires PIL\nInstall with: sudo apt install python-pil python3-pil')
+        data = io.BytesIO()
+        pil.fromarray(self.frame, 'RGB').save(data, format='PNG')
+        return data.getvalue()
 
-        self.disp_img_copy = im.copy()  # can be changed due to window resizing, so copy
+    def _simulate(self, region):
+        # A new array for each frame, so frames passed to output can be kept
+        self.frame = self._rgb[region]
+        self.frames += 1
+
+        if callable(self.output):
+            self.output(self.frame)
+        elif self.output is not None:
+            with open(self.output.format(frame=self.frames), 'wb') as f:
+                f.write(self.png())
+
+        if not self.headless:
+            self._display(self.frame)
+
+    def _display_orientation(self, orientation):
+        """Follow the driver's orientation with the turns that show the panel upright."""
+        return orientation.rot90(self.rotation // 90)
+
+    def _get_orientation(self):
+        """Return the buffer to screen orientation, combined into one view for the current flips."""
+        key = (self.rotation, self.h_flip, self.v_flip)
+        if self._orientation is None or self._orientation_key != key:
+            self._orientation = self._display_orientation(packing.Orientation(self.rotation, self.h_flip, self.v_flip))
+            self._orientation_key = key
+        return self._orientation
+
+    def _display(self, frame):
+        self.disp_img_copy = Image.fromarray(frame, 'RGB')  # kept for resizing the window
         image = self.disp_img_copy.resize([self.cvw, self.cvh])
         self.photo = ImageTk.PhotoImage(image)
         if self.cv is None:
             self.cv = tkinter.Canvas(self.tk_root, width=self.WIDTH, height=self.HEIGHT)
-        self.cv.pack(side='top', fill='both', expand='yes')
-        self.cvhandle = self.cv.create_image(0, 0, image=self.photo, anchor='nw')
-        self.cv.bind('<Configure>', self.resize)
+            self.cv.pack(side='top', fill='both', expand='yes')
+            self.cvhandle = self.cv.create_image(0, 0, image=self.photo, anchor='nw')
+            self.cv.bind('<Configure>', self.resize)
+        else:
+            # Replace the image on the one canvas item, rather than stacking a new item each frame
+            self.cv.itemconfig(self.cvhandle, image=self.photo)
         self.tk_root.update()
 
-    def show(self, busy_wait=True):
+    def set_packed(self, black_white, colour=None):
+        """Unpack pre-packed planes into the buffer, for simulation.
+
+        :param black_white: black/white plane in controller scan order, bits set for white
+        :param colour: red/yellow plane, bits set for red/yellow, default: None for no colour
+
+        """
+        region = packing.Orientation(self.rotation, self.h_flip, self.v_flip).view(self.buf)
+        size = (region.size + 7) // 8
+        white = numpy.unpackbits(buffer.as_plane(black_white, size, 'black/white plane'))[:region.size].reshape(region.shape)
+        region[...] = numpy.where(white, self.WHITE, self.BLACK)
+        if colour is not None:
+            red = numpy.unpackbits(buffer.as_plane(colour, size, 'colour plane'))[:region.size].reshape(region.shape)
+            region[red.astype(bool)] = self.RED
+
+    def show(self, busy_wait=True, force=False):
         """Show buffer on display.
 
-        :param busy_wait: Ignored. Updates are simulated and instant.
+        :param busy_wait: If True, wait for the simulated refresh to finish, see simulate_time. Instant updates ignore it.
+        :param force: Ignored. Every frame is simulated.
 
         """
-        print('>> Simulating {} {}x{}...'.format(self.colour, self.WIDTH, self.HEIGHT))
+        self._show(self.buf, busy_wait=busy_wait, force=force)
 
-        region = self.buf
+    def show_async(self, busy_wait=True, force=False):
+        """Show buffer on display from asyncio.
 
-        if self.v_flip:
-            region = numpy.fliplr(region)
+        Returns an awaitable. Tkinter is not thread safe, so the simulated update runs in the event loop thread.
 
-        if self.h_flip:
-            region = numpy.flipud(region)
+        """
+        from . import aio
+        return aio.show(self, busy_wait=busy_wait, force=force, inline=True)
+
+    def _show(self, buf, busy_wait=True, force=False):
+        if not self.headless:
+            print('>> Simulating {} {}x{}...'.format(self.colour, self.WIDTH, self.HEIGHT))
 
-        if self.rotation:
-            region = numpy.rot90(region, self.rotation // 90)
+        # The driver's scan order orientation and its reversal for display, in one pass
+        region = numpy.ascontiguousarray(self._get_orientation().view(buf))
 
         self._simulate(region)
+        self._simulate_time(busy_wait)
+
+        if self.recorder is not None:
+            self.recorder.record(self, self._pack(buf))
+
+    def _pack(self, buf):
+        """Return the planes the simulated driver would send for `buf`."""
+        key = (buf.shape, self.rotation, self.h_flip, self.v_flip)
+        if self._packer is None or self._packer.key != key:
+            self._packer = packing.PlanePacker(buf.shape, self.rotation, self.h_flip, self.v_flip, black=self.BLACK, colour=self.RED)
+        return self._packer.pack(buf)
+
+    def _refresh_model(self):
+        """Return the update time model for the simulated panel, see inky.clock.RefreshModel."""
+        refresh = dict((name, waveform.lut_seconds(lut, self._CONTROLLER)) for name, lut in self._DRIVER._LUTS.items())
+        frame_bytes = self.WIDTH * self.HEIGHT * self._BITS_PER_PIXEL // 8
+        return clock.RefreshModel(self._RESET_SECONDS, self._DRIVER._SPI_SPEED_HZ, frame_bytes, refresh, self._SETUP_BYTES)
+
+    def _simulate_time(self, busy_wait):
+        """Take as long as the panel would to update, on `clock`, and record the time of each phase in last_update."""
+        if self.refresh_model is None:
+            return
+        # Like the drivers, wait for a refresh still running from show(busy_wait=False)
+        self.clock.sleep(self._busy_until - self.clock.time())
+
+        phases = self.refresh_model.phases(self.colour if isinstance(self.refresh_model.refresh, dict) else None)
+        self.clock.sleep(phases['setup'] + phases['spi'])
+        self._busy_until = self.clock.time() + phases['refresh']
+        if busy_wait:
+            self.clock.sleep(phases['refresh'])
+        self.last_update = phases
 
 
 class InkyMockPHAT(InkyMock):
@@ -159,16 +324,19 @@ class InkyMockPHAT(InkyMock):
     RED = 2
     YELLOW = 2
 
-    def _simulate(self, region):
-        region = numpy.rot90(region, self.rotation // 90)
-        region = numpy.flipud(region)  # spec: phat rotated -90
-        region = numpy.fliplr(region)  # spec: phat rotated -90
-        self._display(region)
+    def _display_orientation(self, orientation):
+        # spec: phat rotated -90
+        return orientation.rot90(self.rotation // 90).flipud().fliplr()
 
 
 class InkyMockPHATSSD1608(InkyMock):
     """Inky PHAT SSD1608 (250x122) e-Ink Display Simulator."""
 
+    _DRIVER = inky_ssd1608
+    _CONTROLLER = 'ssd1608'
+    _RESET_SECONDS = 2.0
+    _SETUP_BYTES = 60
+
     WIDTH = 250
     HEIGHT = 122
 
@@ -177,11 +345,16 @@ class InkyMockPHATSSD1608(InkyMock):
     RED = 2
     YELLOW = 2
 
-    def _simulate(self, region):
-        region = numpy.rot90(region, self.rotation // 90)
-        region = numpy.flipud(region)  # spec: phat rotated -90
-        region = numpy.fliplr(region)  # spec: phat rotated -90
-        self._display(region)
+    def _display_orientation(self, orientation):
+        # spec: phat rotated -90
+        return orientation.rot90(self.rotation // 90).flipud().fliplr()
+
+    def _pack(self, buf):
+        """Return the planes the simulated driver would send for `buf`, padded to the controller's rows."""
+        cols, rows, _, x, y = inky_ssd1608._RESOLUTION[(self.WIDTH, self.HEIGHT)]
+        padded = numpy.full((cols, rows), self.WHITE, dtype=numpy.uint8)
+        padded[y:y + self.HEIGHT, x:x + self.WIDTH] = buf
+        return InkyMock._pack(self, padded)
 
 
 class InkyMockWHAT(InkyMock):
@@ -195,11 +368,6 @@ class InkyMockWHAT(InkyMock):
     RED = 2
     YELLOW = 2
 
-    def _simulate(self, region):
-        region = numpy.rot90(region, self.rotation // 90)
-        region = region.reshape(300, 400)  # for display
-        self._display(region)
-
 
 class InkyMockImpression(InkyMock):
     """Inky Impression e-Ink Display Simulator."""
@@ -213,38 +381,77 @@ class InkyMockImpression(InkyMock):
     ORANGE = 6
     CLEAN = 7
 
+    _colours = inky_uc8159.Inky._colours
+
     WIDTH = 600
     HEIGHT = 448
 
-    def __init__(self):
-        """Initialize a new mock Inky Impression."""
-        InkyMock.__init__(self, 'multi')
+    _DRIVER = inky_uc8159
+    _CONTROLLER = 'uc8159'
+    _BITS_PER_PIXEL = 4
+    _RESET_SECONDS = 0.3
+    _SETUP_BYTES = 40
 
-    def _simulate(self, region):
-        self._display(region)
+    # The UC8159 runs waveforms from its own memory, this is an approximate refresh time
+    _REFRESH_SECONDS = 30.0
+
+    def __init__(self, headless=False, output=None, simulate_time=None):
+        """Initialize a new mock Inky Impression.
+
+        :param headless: render frames to arrays only, without a Tkinter window, see InkyMock
+        :param output: function or PNG file path for each frame, see InkyMock
+        :param simulate_time: 'block', 'virtual' or None for instant updates, see InkyMock
+
+        """
+        InkyMock.__init__(self, 'multi', headless=headless, output=output, simulate_time=simulate_time)
+
+    def _refresh_model(self):
+        """Return the update time model for the simulated panel, see inky.clock.RefreshModel."""
+        frame_bytes = self.WIDTH * self.HEIGHT * self._BITS_PER_PIXEL // 8
+        return clock.RefreshModel(self._RESET_SECONDS, self._DRIVER._SPI_SPEED_HZ, frame_bytes, self._REFRESH_SECONDS, self._SETUP_BYTES)
+
+    def _pack(self, buf):
+        """Return the packed pixels the simulated driver would send for `buf`."""
+        key = (buf.shape, self.rotation, self.h_flip, self.v_flip)
+        if self._packer is None or self._packer.key != key:
+            self._packer = packing.NibblePacker(buf.shape, self.rotation, self.h_flip, self.v_flip)
+        return (self._packer.pack(buf),)
+
+    def set_border(self, colour):
+        """Set the border colour."""
+        if colour in self._colours:
+            self.border_colour = colour
 
     def set_pixel(self, x, y, v):
         """Set a single pixel on the display."""
         self.buf[y][x] = v & 0xf
 
-    def set_image(self, image, saturation=0.5):
+    def set_image(self, image, saturation=0.5, dither=quantize.DITHER_FLOYD_STEINBERG):
         """Copy an image to the display.
 
-        :param image: PIL image to copy, must be 600x448
+        :param image: PIL image, numpy array or memoryview to copy, must be 600x448
         :param saturation: Saturation for quantization palette - higher value results in a more saturated image
+        :param dither: one of 'none', 'bayer' or 'floyd-steinberg', default: 'floyd-steinberg'
+
+        """
+        if buffer.is_image(image):
+            if not image.size == (self.width, self.height):
+                raise ValueError("Image must be ({}x{}) pixels!".format(self.width, self.height))
+            if image.mode not in ("P", "1"):
+                if quantize.pil_image() is None:
+                    raise RuntimeError("PIL is required for converting images: sudo apt install python-pil python3-pil")
+                image = inky_uc8159._QUANTIZER.quantize(image, saturation, dither)
+        elif getattr(image, 'ndim', None) == 3:
+            image = inky_uc8159._QUANTIZER.quantize(image, saturation, dither)
+        buffer.copy_into(self.buf, image, 8, one_bit=(self.BLACK, self.WHITE))
+
+    def set_packed(self, pixels):
+        """Unpack pre-packed pixels into the buffer, for simulation.
+
+        :param pixels: two pixels per byte, first in the high nibble, in controller scan order
 
         """
-        if not image.size == (self.width, self.height):
-            raise ValueError("Image must be ({}x{}) pixels!".format(self.width, self.height))
-        if not image.mode == "P":
-            if Image is None:
-                raise RuntimeError("PIL is required for converting images: sudo apt install python-pil python3-pil")
-            palette = inky_uc8159.Inky._palette_blend(self, saturation)
-            # Image size doesn't matter since it's just the palette we're using
-            palette_image = Image.new("P", (1, 1))
-            # Set our 7 colour palette (+ clear) and zero out the other 247 colours
-            palette_image.putpalette(palette + [0, 0, 0] * 248)
-            # Force source image data to be loaded for `.im` to work
-            image.load()
-            image = image.im.convert("P", True, palette_image.im)
-        self.buf = numpy.array(image, dtype=numpy.uint8).reshape((self.rows, self.cols))
+        region = packing.Orientation(self.rotation, self.h_flip, self.v_flip).view(self.buf)
+        packed = buffer.as_plane(pixels, region.size // 2, 'packed pixels').reshape((region.shape[0], -1))
+        region[:, 0::2] = packed >> 4
+        region[:, 1::2] = packed & 0x0F
@@ -0,0 +1,310 @@
+"""Bit-plane packing for tri-colour Inky displays."""
+try:
+    import numpy
+except ImportError:
+    raise ImportError('This library requires the numpy module\nInstall with: sudo apt install python-numpy')
+
+# Weight of each pixel within a packed byte, most significant bit first
+_BIT_WEIGHTS = numpy.array([128, 64, 32, 16, 8, 4, 2, 1], dtype=numpy.uint8)
+
+
+def orient(region, rotation=0, h_flip=False, v_flip=False):
+    """Return a view of `region` in controller scan order.
+
+    Matches the flip and rotation order used by the drivers' `show()` methods.
+
+    :param region: Display buffer as a 2d numpy array.
+    :param int rotation: Rotation in degrees, a multiple of 90.
+    :param bool h_flip: Flip the buffer vertically (rows), as `Inky.h_flip` does.
+    :param bool v_flip: Flip the buffer horizontally (columns), as `Inky.v_flip` does.
+    """
+    return Orientation(rotation, h_flip, v_flip).view(region)
+
+
+class Orientation:
+    """A sequence of flips and rotations reduced to a single strided view.
+
+    Any combination of `numpy.fliplr`, `numpy.flipud` and `numpy.rot90` is
+    an optional transpose followed by optional row and column flips, so
+    :meth:`view` applies it with one slice and no intermediate arrays.
+    """
+
+    def __init__(self, rotation=0, h_flip=False, v_flip=False):
+        """Initialise an orientation, in the order the drivers apply them.
+
+        :param int rotation: Rotation in degrees, a multiple of 90.
+        :param bool h_flip: Flip the buffer vertically (rows), as `Inky.h_flip` does.
+        :param bool v_flip: Flip the buffer horizontally (columns), as `Inky.v_flip` does.
+        """
+        self.transpose = False
+        self.flip_rows = False
+        self.flip_cols = False
+
+        if v_flip:
+            self.fliplr()
+
+        if h_flip:
+            self.flipud()
+
+        if rotation:
+            self.rot90(rotation // 90)
+
+    def fliplr(self):
+        """Follow with a horizontal flip, like `numpy.fliplr`."""
+        self.flip_cols = not self.flip_cols
+        return self
+
+    def flipud(self):
+        """Follow with a vertical flip, like `numpy.flipud`."""
+        self.flip_rows = not self.flip_rows
+        return self
+
+    def rot90(self, k=1):
+        """Follow with `k` anticlockwise quarter turns, like `numpy.rot90`.
+
+        :param int k: Number of quarter turns, negative turns clockwise.
+        """
+        for _ in range(k % 4):
+            # rot90(m) is flipud(m.T), and transposing swaps which axis is flipped
+            self.transpose = not self.transpose
+            self.flip_rows, self.flip_cols = not self.flip_cols, self.flip_rows
+        return self
+
+    def shape(self, shape):
+        """Return the shape of the view of a buffer with `shape`."""
+        rows, cols = shape
+        return (cols, rows) if self.transpose else (rows, cols)
+
+    def view(self, region):
+        """Return `region` oriented, as a view sharing its memory.
+
+        :param region: A 2d numpy array.
+        """
+        if self.transpose:
+            region = region.T
+        return region[::-1 if self.flip_rows else 1, ::-1 if self.flip_cols else 1]
+
+
+class PlanePacker:
+    """Pack a display buffer into black/white and red/yellow bit planes.
+
+    Scratch and output buffers are allocated once, so packing a frame
+    allocates nothing. Both planes are packed together in one pass.
+
+    Output is written in place and is overwritten by the next call to
+    :meth:`pack`, copy the planes if they must outlive the next frame.
+    """
+
+    def __init__(self, shape, rotation=0, h_flip=False, v_flip=False, black=1, colour=2):
+        """Initialise a packer for one display configuration.
+
+        :param shape: Shape of the display buffer as (rows, columns).
+        :param int rotation: Rotation in degrees, a multiple of 90.
+        :param bool h_flip: Flip the buffer vertically (rows).
+        :param bool v_flip: Flip the buffer horizontally (columns).
+        :param int black: Buffer value for black pixels, cleared in the first plane.
+        :param int colour: Buffer value for red/yellow pixels, set in the second plane.
+        """
+        self.shape = tuple(shape)
+        self.rotation = rotation
+        self.h_flip = h_flip
+        self.v_flip = v_flip
+        self.black = black
+        self.colour = colour
+
+        self.key = (self.shape, rotation, h_flip, v_flip)
+        self.orientation = Orientation(rotation, h_flip, v_flip)
+
+        rows, cols = self.scan_shape = self.orientation.shape(self.shape)
+
+        pixels = rows * cols
+        self.plane_size = (pixels + 7) // 8
+
+        # One byte per pixel for each plane, padded to whole bytes with zeros like numpy.packbits
+        self._scratch = numpy.zeros((2, self.plane_size * 8), dtype=numpy.bool_)
+        self._scratch_a = self._scratch[0, :pixels].reshape(self.scan_shape)
+        self._scratch_b = self._scratch[1, :pixels].reshape(self.scan_shape)
+        self._bits = self._scratch.view(numpy.uint8).reshape((-1, 8))
+
+        self._planes = numpy.zeros((2, self.plane_size), dtype=numpy.uint8)
+        self._packed = self._planes.reshape(-1)
+        self.plane_a = self._planes[0]
+        self.plane_b = self._planes[1]
+
+        self._source = None
+        self._region = None
+
+    def pack(self, buf):
+        """Pack `buf` into both bit planes.
+
+        Returns a tuple of (black/white, red/yellow) uint8 arrays.
+
+        :param buf: Display buffer, a 2d numpy array of the shape given at construction.
+        """
+        self.transform(buf)
+        return self.pack_bits()
+
+    def transform(self, buf):
+        """Orient `buf` into scan order and split it into one byte per pixel per plane.
+
+        The first half of :meth:`pack`, split out so each half can be timed.
+
+        :param buf: Display buffer, a 2d numpy array of the shape given at construction.
+        """
+        if buf is not self._source:
+            if buf.shape != self.shape:
+                raise ValueError('Buffer shape {} does not match packer shape {}'.format(buf.shape, self.shape))
+            self._region = self.orientation.view(buf)
+            self._source = buf
+
+        numpy.not_equal(self._region, self.black, out=self._scratch_a)
+        numpy.equal(self._region, self.colour, out=self._scratch_b)
+
+    def pack_bits(self):
+        """Pack the planes split by the last :meth:`transform` into bits.
+
+        Returns a tuple of (black/white, red/yellow) uint8 arrays.
+        """
+        numpy.dot(self._bits, _BIT_WEIGHTS, out=self._packed)
+        return self.plane_a, self.plane_b
+
+
+class NibblePacker:
+    """Pack a 7-colour display buffer into two pixels per byte.
+
+    Pixels are read straight from the oriented view of the buffer in
+    controller scan order, into an output buffer allocated once. Output is
+    overwritten by the next call to :meth:`pack`.
+
+    Like :class:`PlanePacker`, packing is split into :meth:`transform` and
+    :meth:`pack_bits` so each half can be timed.
+    """
+
+    def __init__(self, shape, rotation=0, h_flip=False, v_flip=False):
+        """Initialise a packer for one display configuration.
+
+        :param shape: Shape of the display buffer as (rows, columns).
+        :param int rotation: Rotation in degrees, a multiple of 90.
+        :param bool h_flip: Flip the buffer vertically (rows).
+        :param bool v_flip: Flip the buffer horizontally (columns).
+        """
+        self.shape = tuple(shape)
+        self.key = (self.shape, rotation, h_flip, v_flip)
+        self.orientation = Orientation(rotation, h_flip, v_flip)
+
+        rows, cols = self.scan_shape = self.orientation.shape(self.shape)
+        if cols % 2:
+            raise ValueError('Scan lines of {} pixels cannot be packed two pixels per byte'.format(cols))
+
+        self._packed = numpy.zeros(rows * cols // 2, dtype=numpy.uint8)
+        self._high = self._packed.reshape((rows, cols // 2))
+        self._low = numpy.zeros((rows, cols // 2), dtype=numpy.uint8)
+
+    def pack(self, buf):
+        """Pack `buf`, first pixel of each pair in the high nibble.
+
+        Returns a uint8 array of half the pixel count.
+
+        :param buf: Display buffer, a 2d numpy array of the shape given at construction.
+        """
+        self.transform(buf)
+        return self.pack_bits()
+
+    def transform(self, buf):
+        """Orient `buf` into scan order and split each pair of pixels into its high and low nibble.
+
+        The first half of :meth:`pack`, split out so each half can be timed.
+
+        :param buf: Display buffer, a 2d numpy array of the shape given at construction.
+        """
+        if buf.shape != self.shape:
+            raise ValueError('Buffer shape {} does not match packer shape {}'.format(buf.shape, self.shape))
+        region = self.orientation.view(buf)
+
+        numpy.left_shift(region[:, 0::2], 4, out=self._high, casting='unsafe')
+        numpy.bitwise_and(region[:, 1::2], 0x0F, out=self._low, casting='unsafe')
+
+    def pack_bits(self):
+        """Combine the nibbles split by the last :meth:`transform` into bytes.
+
+        Returns a uint8 array of half the pixel count.
+        """
+        numpy.bitwise_or(self._high, self._low, out=self._high)
+        return self._packed
+
+
+class FrameDiff:
+    """Track the bit planes last written to controller RAM.
+
+    Used for partial RAM writes: :meth:`window` returns the bounding box of
+    bytes that differ from the previous frame, in controller RAM units of
+    bytes (X) and rows (Y).
+    """
+
+    def __init__(self, scan_shape):
+        """Initialise frame tracking for one display configuration.
+
+        :param scan_shape: Shape of the display in controller scan order as (rows, columns).
+        """
+        self.rows, cols = scan_shape
+        self.row_bytes = cols // 8
+        # Windowing needs each RAM row to start on a byte boundary
+        self.supported = cols % 8 == 0
+        self.full = (0, self.row_bytes - 1, 0, self.rows - 1)
+
+        size = self.rows * self.row_bytes
+        self._last_a = numpy.zeros(size, dtype=numpy.uint8)
+        self._last_b = numpy.zeros(size, dtype=numpy.uint8)
+        self._changed = numpy.zeros((self.rows, self.row_bytes), dtype=numpy.bool_)
+        self._scratch = numpy.zeros((self.rows, self.row_bytes), dtype=numpy.bool_)
+        self.valid = False
+
+    def invalidate(self):
+        """Forget the previous frame, the next window will cover the whole display."""
+        self.valid = False
+
+    def window(self, plane_a, plane_b):
+        """Return the (x_start, x_end, y_start, y_end) window of changed bytes, inclusive.
+
+        Returns the full display when there is no valid previous frame,
+        or `None` when neither plane has changed.
+
+        :param plane_a: Packed black/white plane.
+        :param plane_b: Packed red/yellow plane.
+        """
+        if not self.valid or not self.supported:
+            return self.full
+
+        shape = (self.rows, self.row_bytes)
+        plane_a = numpy.asarray(plane_a, dtype=numpy.uint8).reshape(shape)
+        plane_b = numpy.asarray(plane_b, dtype=numpy.uint8).reshape(shape)
+        numpy.not_equal(plane_a, self._last_a.reshape(shape), out=self._changed)
+        numpy.not_equal(plane_b, self._last_b.reshape(shape), out=self._scratch)
+        numpy.logical_or(self._changed, self._scratch, out=self._changed)
+
+        rows = numpy.flatnonzero(self._changed.any(axis=1))
+        if len(rows) == 0:
+            return None
+        cols = numpy.flatnonzero(self._changed.any(axis=0))
+
+        return int(cols[0]), int(cols[-1]), int(rows[0]), int(rows[-1])
+
+    def crop(self, plane, window):
+        """Return the bytes of `plane` inside `window`, in RAM write order.
+
+        :param plane: Packed bit plane.
+        :param window: (x_start, x_end, y_start, y_end) as returned by :meth:`window`.
+        """
+        x_start, x_end, y_start, y_end = window
+        if window == self.full:
+            return plane
+        plane = numpy.asarray(plane, dtype=numpy.uint8).reshape((self.rows, self.row_bytes))
+        return plane[y_start:y_end + 1, x_start:x_end + 1]
+
+    def commit(self, plane_a, plane_b):
+        """Record both planes as the current contents of controller RAM."""
+        if not self.supported:
+            return
+        numpy.copyto(self._last_a, plane_a)
+        numpy.copyto(self._last_b, plane_b)
+        self.valid = True
@@ -23,10 +23,11 @@ class InkyPHAT_SSD1608(inky_ssd1608.Inky):
     RED = 2
     YELLOW = 2
 
-    def __init__(self, colour):
+    def __init__(self, colour, epd_type=None):
         """Initialise an Inky pHAT Display.
 
         :param colour: one of red, black or yellow, default: black
+        :param epd_type: eeprom.EPDType already read, eg: by auto()
 
         """
         inky_ssd1608.Inky.__init__(
@@ -34,7 +35,8 @@ class InkyPHAT_SSD1608(inky_ssd1608.Inky):
             resolution=(self.WIDTH, self.HEIGHT),
             colour=colour,
             h_flip=False,
-            v_flip=False)
+            v_flip=False,
+            epd_type=epd_type)
 
 
 class InkyPHAT(inky.Inky):
@@ -45,9 +47,7 @@ class InkyPHAT(inky.Inky):
         >>> from inky import InkyPHAT
         >>> display = InkyPHAT('red')
         >>> display.set_border(display.BLACK)
-        >>> for x in range(display.WIDTH):
-        >>>     for y in range(display.HEIGHT):
-        >>>         display.set_pixel(x, y, display.RED)
+        >>> display.fill_rect(0, 0, display.WIDTH, display.HEIGHT, display.RED)
         >>> display.show()
     """
 
@@ -59,14 +59,17 @@ class InkyPHAT(inky.Inky):
     RED = 2
     YELLOW = 2
 
-    def __init__(self, colour='black'):
+    def __init__(self, colour='black', epd_type=None):
         """Initialise an Inky pHAT Display.
 
         :param str colour: one of 'red', 'black' or 'yellow', default: 'black'.
+        :param epd_type: EEPROM contents already read, eg: by :func:`inky.auto`. Default: `None`.
+        :type epd_type: :class:`inky.eeprom.EPDType`
         """
         inky.Inky.__init__(
             self,
             resolution=(self.WIDTH, self.HEIGHT),
             colour=colour,
             h_flip=False,
-            v_flip=False)
+            v_flip=False,
+            epd_type=epd_type)
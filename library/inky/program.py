@@ -0,0 +1,92 @@
+"""Precompiled controller command sequences."""
+from . import spi
+
+_SPI_COMMAND = 0
+_SPI_DATA = 1
+
+
+class CommandProgram:
+    """A controller command sequence compiled into a single byte stream.
+
+    Commands and their data are stored back to back in one buffer, along
+    with the offsets where the data/command line must change. Replaying the
+    program writes memoryview slices of that buffer, so no per-command lists
+    are built.
+
+    Commands listed in `registers` only set controller state. If the
+    register values last written are passed to :meth:`run`, unchanged
+    registers are skipped. A register written more than once is compiled to
+    a single write of its final value.
+    """
+
+    def __init__(self, commands, registers=()):
+        """Compile a command sequence.
+
+        :param commands: Sequence of (command, data) tuples, data may be `None`, an int, a list, bytes or a numpy array.
+        :param registers: Commands that only set register values and are safe to skip when unchanged.
+        """
+        self.registers = frozenset(registers)
+
+        # Later writes to the same register supersede earlier ones
+        compiled = []
+        for command, data in commands:
+            data = b'' if data is None else spi.as_buffer(data).tobytes()
+            if command in self.registers:
+                compiled = [(c, d) for c, d in compiled if c != command]
+            compiled.append((command, data))
+
+        self._stream = bytearray()
+        self._commands = []
+        for command, data in compiled:
+            start = len(self._stream)
+            self._stream.append(command)
+            self._stream.extend(data)
+            self._commands.append((command, data, start, len(self._stream)))
+
+        self._view = memoryview(self._stream)
+        self._segments = self._plan(self._commands)
+
+    def __len__(self):
+        """Return the number of bytes in the full program."""
+        return len(self._stream)
+
+    def _plan(self, commands):
+        """Return (dc, start, end) segments for commands, merging runs with the same data/command level."""
+        segments = []
+        for command, data, start, end in commands:
+            parts = [(_SPI_COMMAND, start, start + 1)]
+            if data:
+                parts.append((_SPI_DATA, start + 1, end))
+            for dc, seg_start, seg_end in parts:
+                if segments and segments[-1][0] == dc and segments[-1][2] == seg_start:
+                    segments[-1] = (dc, segments[-1][1], seg_end)
+                else:
+                    segments.append((dc, seg_start, seg_end))
+        return segments
+
+    def run(self, spi_write, state=None):
+        """Write the program over SPI, returning the number of bytes written.
+
+        :param spi_write: Function taking (dc, buffer), eg: a driver's `_spi_write`.
+        :param dict state: Register values currently held by the controller. Registers already
+            holding the programmed value are skipped, and `state` is updated with the values written.
+            Clear it whenever the controller is reset or loses its registers.
+        """
+        commands = self._commands
+        segments = self._segments
+        if state is not None and self.registers:
+            commands = [c for c in commands if c[0] not in self.registers or state.get(c[0]) != c[1]]
+            if len(commands) != len(self._commands):
+                segments = self._plan(commands)
+
+        nbytes = 0
+        for dc, start, end in segments:
+            spi_write(dc, self._view[start:end])
+            nbytes += end - start
+
+        if state is not None:
+            for command, data, start, end in commands:
+                if command in self.registers:
+                    state[command] = data
+
+        return nbytes
@@ -0,0 +1,273 @@
+"""Palette quantisation for the 7-colour Inky Impression."""
+try:
+    import numpy
+except ImportError:
+    raise ImportError('This library requires the numpy module\nInstall with: sudo apt install python-numpy')
+
+DITHER_NONE = 'none'
+DITHER_BAYER = 'bayer'
+DITHER_FLOYD_STEINBERG = 'floyd-steinberg'
+
+DITHER_MODES = (DITHER_NONE, DITHER_BAYER, DITHER_FLOYD_STEINBERG)
+
+# Palettes cached per saturation value, cleared if more are requested
+_CACHE_SIZE = 16
+
+# Amplitude, in 8-bit colour units, of the ordered dither threshold map
+_BAYER_STRENGTH = 64
+
+
+def pil_image():
+    """Return PIL's Image module, or `None` if PIL isn't installed.
+
+    Imported when first needed, so importing the drivers doesn't load PIL.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def _bayer_matrix(size):
+    """Return a size x size Bayer threshold matrix with values 0 to size*size - 1."""
+    matrix = numpy.zeros((1, 1), dtype=numpy.int32)
+    while matrix.shape[0] < size:
+        matrix = numpy.vstack((numpy.hstack((4 * matrix, 4 * matrix + 2)),
+                               numpy.hstack((4 * matrix + 3, 4 * matrix + 1))))
+    return matrix
+
+
+# Threshold offsets centred on zero, one per pixel of an 8x8 tile
+_BAYER_8 = ((_bayer_matrix(8) + 0.5) / 64.0 - 0.5) * _BAYER_STRENGTH
+
+
+def blend_palette(saturated, desaturated, saturation):
+    """Return a palette blended between saturated and desaturated colours.
+
+    Matches the rounding of the original per-colour loop: each channel is
+    truncated to an int.
+
+    :param saturated: Sequence of [r, g, b] colours at full saturation.
+    :param desaturated: Sequence of [r, g, b] colours at zero saturation.
+    :param float saturation: Blend from 0.0 (desaturated) to 1.0 (saturated).
+    """
+    saturation = float(saturation)
+    saturated = numpy.array(saturated, dtype=numpy.float64)
+    desaturated = numpy.array(desaturated, dtype=numpy.float64)
+    return (saturated * saturation + desaturated * (1.0 - saturation)).astype(numpy.uint8)
+
+
+class Quantizer:
+    """Map RGB images to a panel's palette indexes.
+
+    Blended palettes, and the PIL palette images used for Floyd-Steinberg
+    dithering, are cached per saturation value.
+
+    Images that only use panel colours, from the blended, saturated or
+    desaturated palette, take a fast path: a lookup table maps each colour
+    straight to its index, with no dithering.
+    """
+
+    def __init__(self, saturated, desaturated, colours=7, clean=(255, 255, 255)):
+        """Initialise a quantizer for one panel.
+
+        :param saturated: Sequence of [r, g, b] panel colours at full saturation.
+        :param desaturated: Sequence of [r, g, b] panel colours at zero saturation.
+        :param int colours: Number of displayable colours, taken from the start of each palette.
+        :param clean: [r, g, b] of the extra clean colour that follows them, or `None`.
+        """
+        self.colours = colours
+        self.clean = clean
+        self._saturated = [list(c) for c in saturated[:colours]]
+        self._desaturated = [list(c) for c in desaturated[:colours]]
+        self._palettes = {}
+        self._palette_images = {}
+        self._lookups = {}
+        self._padding = None
+
+    def palette(self, saturation=0.5):
+        """Return the blended palette as an (N, 3) uint8 array, including the clean colour.
+
+        :param float saturation: Blend from 0.0 (desaturated) to 1.0 (saturated).
+        """
+        saturation = float(saturation)
+        palette = self._palettes.get(saturation)
+        if palette is None:
+            palette = blend_palette(self._saturated, self._desaturated, saturation)
+            if self.clean is not None:
+                palette = numpy.vstack((palette, numpy.array([self.clean], dtype=numpy.uint8)))
+            palette.setflags(write=False)
+            self._cache(self._palettes, saturation, palette)
+        return palette
+
+    def palette_image(self, saturation=0.5):
+        """Return a PIL "P" image carrying the blended palette, for `Image.quantize` style conversion.
+
+        Unused entries repeat the displayable colours, so every index PIL
+        can choose maps back to a colour the panel can show.
+
+        :param float saturation: Blend from 0.0 (desaturated) to 1.0 (saturated).
+        """
+        Image = pil_image()
+        if Image is None:
+            raise RuntimeError("PIL is required for converting images: sudo apt install python-pil python3-pil")
+        saturation = float(saturation)
+        palette_image = self._palette_images.get(saturation)
+        if palette_image is None:
+            palette = self.palette(saturation)
+            padding = numpy.resize(palette[:self.colours], (256 - len(palette), 3))
+            # Image size doesn't matter since it's just the palette we're using
+            palette_image = Image.new("P", (1, 1))
+            palette_image.putpalette(numpy.vstack((palette, padding)).reshape(-1).tolist())
+            self._cache(self._palette_images, saturation, palette_image)
+        return palette_image
+
+    def _padding_lut(self):
+        """Return a 256 entry table folding padding palette entries back onto the colours they repeat."""
+        if self._padding is None:
+            palette_size = self.colours + (self.clean is not None)
+            self._padding = numpy.arange(256, dtype=numpy.uint8)
+            self._padding[palette_size:] = numpy.arange(256 - palette_size) % self.colours
+        return self._padding
+
+    def _lookup(self, saturation):
+        """Return a hash table of packed RGB keys, and the palette index of each, for exact matching.
+
+        A key's slot is the key modulo the table size, chosen so no two panel
+        colours collide. Empty slots hold a key no 24-bit colour can match.
+        """
+        saturation = float(saturation)
+        lookup = self._lookups.get(saturation)
+        if lookup is None:
+            indexes = {}
+            for palette in (self.palette(saturation)[:self.colours], self._saturated, self._desaturated):
+                for index, (r, g, b) in enumerate(palette):
+                    indexes.setdefault((int(r) << 16) | (int(g) << 8) | int(b), index)
+
+            size = len(indexes)
+            while len(set(key % size for key in indexes)) < len(indexes):
+                size += 1
+
+            keys = numpy.full(size, 0xFFFFFFFF, dtype=numpy.uint32)
+            values = numpy.zeros(size, dtype=numpy.uint8)
+            for key, index in indexes.items():
+                keys[key % size] = key
+                values[key % size] = index
+            lookup = (keys, values)
+            self._cache(self._lookups, saturation, lookup)
+        return lookup
+
+    def _cache(self, cache, saturation, value):
+        if len(cache) >= _CACHE_SIZE:
+            cache.clear()
+        cache[saturation] = value
+
+    def match(self, rgb, saturation=0.5):
+        """Return palette indexes if every pixel is exactly a panel colour, otherwise `None`.
+
+        :param rgb: (rows, cols, 3) uint8 array.
+        :param float saturation: Saturation of the blended palette to also match.
+        """
+        keys, values = self._lookup(saturation)
+
+        # Most photos fail on the first row, check it before packing the whole image
+        for region in (rgb[:1], rgb):
+            packed = region[..., 0].astype(numpy.uint32) << 16
+            packed |= region[..., 1].astype(numpy.uint32) << 8
+            packed |= region[..., 2]
+            slots = packed % len(keys)
+            if not numpy.array_equal(keys[slots], packed):
+                return None
+
+        return values[slots]
+
+    def nearest(self, rgb, saturation=0.5, offset=None):
+        """Return the index of the nearest palette colour to each pixel.
+
+        :param rgb: (rows, cols, 3) uint8 array.
+        :param float saturation: Blend from 0.0 (desaturated) to 1.0 (saturated).
+        :param offset: Optional (rows, cols) array added to every channel before matching, eg: a dither threshold map.
+        """
+        palette = self.palette(saturation)[:self.colours].astype(numpy.int32)
+        channels = [rgb[..., channel].astype(numpy.int32) for channel in range(3)]
+        if offset is not None:
+            for channel in channels:
+                channel += offset
+
+        indexes = numpy.zeros(rgb.shape[:2], dtype=numpy.uint8)
+        best = numpy.empty(rgb.shape[:2], dtype=numpy.int32)
+        distance = numpy.empty(rgb.shape[:2], dtype=numpy.int32)
+        scratch = numpy.empty(rgb.shape[:2], dtype=numpy.int32)
+        for index, colour in enumerate(palette):
+            distance.fill(0)
+            for channel, value in zip(channels, colour):
+                numpy.subtract(channel, value, out=scratch)
+                numpy.multiply(scratch, scratch, out=scratch)
+                numpy.add(distance, scratch, out=distance)
+            if index == 0:
+                best[:] = distance
+                continue
+            indexes[distance < best] = index
+            numpy.minimum(best, distance, out=best)
+        return indexes
+
+    def bayer(self, rgb, saturation=0.5):
+        """Return palette indexes using an 8x8 ordered (Bayer) dither.
+
+        :param rgb: (rows, cols, 3) uint8 array.
+        :param float saturation: Blend from 0.0 (desaturated) to 1.0 (saturated).
+        """
+        rows, cols = rgb.shape[:2]
+        tiles = ((rows + 7) // 8, (cols + 7) // 8)
+        offset = numpy.tile(_BAYER_8, tiles)[:rows, :cols].astype(numpy.int16)
+        if pil_image() is None:
+            return self.nearest(rgb, saturation, offset=offset)
+
+        # Apply the threshold map here, PIL's undithered nearest colour match is faster than numpy
+        dithered = rgb.astype(numpy.int16)
+        dithered += offset[..., numpy.newaxis]
+        numpy.clip(dithered, 0, 255, out=dithered)
+        return self._pil_quantize(dithered.astype(numpy.uint8), saturation, dither=False)
+
+    def _pil_quantize(self, image, saturation, dither):
+        """Return palette indexes from PIL's quantiser, with or without Floyd-Steinberg dithering."""
+        Image = pil_image()
+        if isinstance(image, numpy.ndarray):
+            image = Image.fromarray(numpy.ascontiguousarray(image, dtype=numpy.uint8), 'RGB')
+        dither = Image.FLOYDSTEINBERG if dither else Image.NONE
+        converted = image.quantize(palette=self.palette_image(saturation), dither=dither)
+        return self._padding_lut()[numpy.asarray(converted, dtype=numpy.uint8)]
+
+    def quantize(self, image, saturation=0.5, dither=DITHER_FLOYD_STEINBERG):
+        """Return a (rows, cols) uint8 array of palette indexes for an image.
+
+        Without PIL, Floyd-Steinberg dithering is not available and no dithering is used instead.
+
+        :param image: PIL image, or a (rows, cols, 3) uint8 RGB array.
+        :param float saturation: Blend from 0.0 (desaturated) to 1.0 (saturated).
+        :param str dither: One of 'none', 'bayer' or 'floyd-steinberg', default: 'floyd-steinberg'.
+        """
+        if dither not in DITHER_MODES:
+            raise ValueError('Dither mode {} is not supported, use one of: {}'.format(dither, ', '.join(DITHER_MODES)))
+
+        if isinstance(image, numpy.ndarray):
+            rgb = image
+            if rgb.ndim != 3 or rgb.shape[2] != 3:
+                raise ValueError('Expected a (rows, cols, 3) RGB array')
+        else:
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            rgb = numpy.asarray(image, dtype=numpy.uint8)
+
+        indexes = self.match(rgb, saturation)
+        if indexes is not None:
+            return indexes
+
+        if dither == DITHER_BAYER:
+            return self.bayer(rgb, saturation)
+
+        if pil_image() is None:
+            return self.nearest(rgb, saturation)
+
+        return self._pil_quantize(image, saturation, dither=dither == DITHER_FLOYD_STEINBERG)
@@ -0,0 +1,442 @@
+"""Record shown frames to an append-only archive, and replay them.
+
+Attach a :class:`Recorder` to any driver or simulator and every frame it
+shows is appended to the archive, as the packed planes sent to the
+controller along with the time, border colour, LUT and the time spent
+in each phase of the update::
+
+    >>> from inky import record
+    >>> display.recorder = record.Recorder('frames.inkrec')
+    >>> display.show()
+
+Planes are stored as the XOR of the previous frame's planes, run-length
+encoded, so an unchanged region costs nothing. Every
+`KEYFRAME_INTERVAL` frames, and the first frame of each recording
+session, is stored against blank planes instead, so frames can be read
+without decoding the whole archive.
+
+:class:`Archive` indexes the frame headers when opened and decodes
+frames on demand. :func:`replay` shows them on a driver, simulator or
+emulator at the original speed, faster, or as fast as possible::
+
+    python -m inky.record replay frames.inkrec --speed 0
+
+Archives are a file header then one entry per frame. Each is a
+big-endian (header length, payload length) pair of uint32s, a JSON
+header and a binary payload, as in :mod:`inky.service`.
+"""
+import collections
+import json
+import os
+import struct
+import time
+
+try:
+    import numpy
+except ImportError:
+    raise ImportError('This library requires the numpy module\nInstall with: sudo apt install python-numpy')
+
+from .clock import RealClock
+
+MAGIC = b'INKYREC1'
+
+# Frames between frames stored against blank planes
+KEYFRAME_INTERVAL = 50
+
+_LENGTHS = struct.Struct('>II')
+
+# Offset and length of each run of changed bytes in an encoded delta
+_RUN = struct.Struct('>II')
+
+# Runs separated by fewer unchanged bytes than a run header are merged
+_MERGE_GAP = _RUN.size
+
+Frame = collections.namedtuple('Frame', 'index time border lut phases planes')
+
+
+def encode_delta(current, previous=None):
+    """Return the bytes that differ between two planes, run-length encoded.
+
+    Runs of changed bytes are stored as (offset, length) followed by the
+    XOR of the old and new bytes. Unchanged bytes are not stored.
+
+    :param current: Packed plane as a uint8 numpy array.
+    :param previous: Plane `current` replaces, or `None` for a blank plane.
+    """
+    current = numpy.asarray(current, dtype=numpy.uint8).reshape(-1)
+    delta = current if previous is None else numpy.bitwise_xor(current, previous)
+    changed = numpy.flatnonzero(delta)
+    if len(changed) == 0:
+        return b''
+
+    gaps = numpy.flatnonzero(numpy.diff(changed) > _MERGE_GAP)
+    starts = numpy.concatenate((changed[:1], changed[gaps + 1]))
+    ends = numpy.concatenate((changed[gaps] + 1, changed[-1:] + 1))
+
+    parts = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        parts.append(_RUN.pack(start, end - start))
+        parts.append(delta[start:end].tobytes())
+    return b''.join(parts)
+
+
+def max_delta_size(size):
+    """Return the largest encoded delta of a `size` byte plane.
+
+    Separate runs are at least `_MERGE_GAP` unchanged bytes apart, so
+    every run but the last covers at least `_MERGE_GAP + 1` bytes.
+
+    :param int size: Plane size in bytes.
+    """
+    return size + _RUN.size * ((size + _MERGE_GAP) // (_MERGE_GAP + 1))
+
+
+def apply_delta(plane, data):
+    """XOR an encoded delta into `plane`, in place.
+
+    :param plane: Writable uint8 numpy array holding the previous plane, or zeros for a delta from a blank plane.
+    :param data: Delta from :func:`encode_delta`.
+    """
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        if offset + _RUN.size > len(view):
+            raise ValueError('Delta run header at {} is cut short by the end of the delta'.format(offset))
+        start, length = _RUN.unpack_from(view, offset)
+        offset += _RUN.size
+        if start + length > len(plane) or offset + length > len(view):
+            raise ValueError('Delta run of {} bytes at {} does not fit a {} byte plane'.format(length, start, len(plane)))
+        run = numpy.frombuffer(view[offset:offset + length], dtype=numpy.uint8)
+        numpy.bitwise_xor(plane[start:start + length], run, out=plane[start:start + length])
+        offset += length
+    return plane
+
+
+def _display_info(display):
+    """Return the JSON serialisable description of a display stored in an archive header."""
+    cls = type(display)
+    return {
+        'driver': '{}.{}'.format(cls.__module__, cls.__name__),
+        'controller': getattr(display, '_CONTROLLER', None),
+        'resolution': list(display.resolution),
+        'colour': display.colour,
+    }
+
+
+def _write_message(f, header, payload=b''):
+    header = json.dumps(header, sort_keys=True).encode('utf-8')
+    f.write(_LENGTHS.pack(len(header), len(payload)))
+    f.write(header)
+    f.write(payload)
+
+
+def _read_message(f, payload=True):
+    """Return the next (header, payload) from `f`, or (`None`, `None`) at the end.
+
+    Without `payload` the payload is skipped, and its (offset, size) returned instead.
+    A message cut short by the end of the file is treated as the end.
+    """
+    lengths = f.read(_LENGTHS.size)
+    if len(lengths) < _LENGTHS.size:
+        return None, None
+    header_size, payload_size = _LENGTHS.unpack(lengths)
+    header = f.read(header_size)
+    if len(header) < header_size:
+        return None, None
+    header = json.loads(header.decode('utf-8'))
+    if not payload:
+        offset = f.tell()
+        if offset + payload_size > os.fstat(f.fileno()).st_size:
+            return None, None
+        f.seek(payload_size, os.SEEK_CUR)
+        return header, (offset, payload_size)
+    data = f.read(payload_size)
+    if len(data) < payload_size:
+        return None, None
+    return header, data
+
+
+def _read_index(f):
+    """Return the (header, (payload offset, size)) of each message from `f`, and the offset after the last one.
+
+    A frame left incomplete by a recorder stopped mid write ends the index.
+    """
+    index = []
+    end = f.tell()
+    while True:
+        header, payload = _read_message(f, payload=False)
+        if header is None:
+            return index, end
+        index.append((header, payload))
+        end = f.tell()
+
+
+class Recorder:
+    """Append every frame a display shows to an archive.
+
+    Set as a display's `recorder`. Opening an existing archive appends to
+    it, it must have been recorded from the same kind of display.
+    """
+
+    def __init__(self, path, keyframe_interval=KEYFRAME_INTERVAL):
+        """Initialise a recorder.
+
+        :param str path: Archive file path, created if it doesn't exist.
+        :param int keyframe_interval: Frames between frames stored against blank planes, default: `KEYFRAME_INTERVAL`.
+        """
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.frames = 0
+        self.bytes_written = 0
+        self._file = None
+        self._previous = None
+        self._phase_totals = {}
+
+    def _open(self, display):
+        info = _display_info(display)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError('{} is not an Inky frame archive'.format(self.path))
+                header, _ = _read_message(f)
+                _, end = _read_index(f)
+            if header is None or (header['driver'], header['resolution']) != (info['driver'], info['resolution']):
+                raise ValueError('{} was recorded from a different display'.format(self.path))
+            self._file = open(self.path, 'ab')
+            # Drop any frame left incomplete by a recorder stopped mid write
+            self._file.truncate(end)
+        else:
+            self._file = open(self.path, 'wb')
+            self._file.write(MAGIC)
+            _write_message(self._file, info)
+
+    def _phases(self, display):
+        """Return the seconds spent in each phase since the last frame recorded."""
+        simulated = getattr(display, 'last_update', None)
+        if simulated is not None:
+            return dict(simulated)
+        timings = getattr(display, 'timings', None)
+        phases = {}
+        for name, stats in getattr(timings, 'phases', {}).items():
+            phases[name] = stats.seconds - self._phase_totals.get(name, 0.0)
+            self._phase_totals[name] = stats.seconds
+        return phases
+
+    def record(self, display, planes):
+        """Append a frame, called by the display after each update.
+
+        :param display: Driver or simulator that showed the frame.
+        :param planes: Packed planes sent to the controller, as uint8 numpy arrays.
+        """
+        if self._file is None:
+            self._open(display)
+
+        planes = [numpy.array(plane, dtype=numpy.uint8).reshape(-1) for plane in planes]
+        key = self._previous is None or self.frames % self.keyframe_interval == 0 or \
+            [len(plane) for plane in planes] != [len(plane) for plane in self._previous]
+        deltas = [encode_delta(plane, None if key else previous)
+                  for plane, previous in zip(planes, self._previous or planes)]
+
+        last_refresh = getattr(display, 'last_refresh', None) or {}
+        lut = last_refresh.get('lut', getattr(display, 'lut', display.colour))
+        header = {
+            'time': time.time(),
+            'border': int(display.border_colour),
+            'lut': lut,
+            'phases': self._phases(display),
+            'key': key,
+            'planes': [[len(delta), len(plane)] for delta, plane in zip(deltas, planes)],
+        }
+        payload = b''.join(deltas)
+
+        start = self._file.tell()
+        _write_message(self._file, header, payload)
+        self._file.flush()
+        self.bytes_written += self._file.tell() - start
+        self._previous = planes
+        self.frames += 1
+
+    def close(self):
+        """Close the archive, a later frame reopens it and starts with a key frame."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._previous = None
+
+    def __enter__(self):
+        """Return the recorder, closing it on exit."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the archive."""
+        self.close()
+
+
+class Archive:
+    """Read frames from an archive, decoding them as they're used."""
+
+    def __init__(self, path):
+        """Open an archive and index its frames.
+
+        :param str path: Archive file path.
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError('{} is not an Inky frame archive'.format(path))
+        self.info, _ = _read_message(self._file)
+
+        # (header, (payload offset, payload size)) of each frame, payloads are read when a frame is
+        self._index, _ = _read_index(self._file)
+
+        self._cached = None
+
+    def __len__(self):
+        """Return the number of frames."""
+        return len(self._index)
+
+    def header(self, index):
+        """Return the header of a frame without decoding its planes."""
+        return self._index[index][0]
+
+    def _decode(self, index, planes):
+        """Apply frame `index` to `planes` from the frame before it, or blank planes for a key frame."""
+        header, (offset, size) = self._index[index]
+        self._file.seek(offset)
+        data = self._file.read(size)
+        if header['key'] or planes is None:
+            planes = [numpy.zeros(length, dtype=numpy.uint8) for _, length in header['planes']]
+        position = 0
+        for plane, (delta_size, _) in zip(planes, header['planes']):
+            apply_delta(plane, data[position:position + delta_size])
+            position += delta_size
+        return planes
+
+    def __getitem__(self, index):
+        """Return a :class:`Frame`, decoding from the key frame before it."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Frame {} is out of range'.format(index))
+
+        if self._cached is not None and self._cached[0] <= index:
+            start, planes = self._cached[0] + 1, [plane.copy() for plane in self._cached[1]]
+        else:
+            start, planes = index, None
+        while not self._index[start][0]['key'] and start > 0 and planes is None:
+            start -= 1
+        for position in range(start, index + 1):
+            planes = self._decode(position, planes)
+
+        self._cached = (index, planes)
+        header = self._index[index][0]
+        return Frame(index, header['time'], header['border'], header['lut'], header['phases'],
+                     tuple(plane.copy() for plane in planes))
+
+    def __iter__(self):
+        """Iterate over frames in order, decoding each once."""
+        for index in range(len(self)):
+            yield self[index]
+
+    def close(self):
+        """Close the archive file."""
+        self._file.close()
+
+    def __enter__(self):
+        """Return the archive, closing it on exit."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the archive file."""
+        self.close()
+
+
+def replay(frames, display, speed=1.0, clock=None):
+    """Show recorded frames on a display, and return throughput statistics.
+
+    :param frames: :class:`Archive`, or any sequence of :class:`Frame`.
+    :param display: Driver, simulator or emulated driver to show the frames on.
+    :param float speed: Playback speed, 1 for the original timing, 0 or `None` for as fast as possible.
+    :param clock: Clock to wait on, default: :class:`inky.clock.RealClock`.
+    """
+    clock = RealClock() if clock is None else clock
+    t_start = clock.time()
+    first = None
+    count = 0
+    for frame in frames:
+        if first is None:
+            first = frame.time
+        if speed:
+            clock.sleep(t_start + (frame.time - first) / speed - clock.time())
+        display.set_border(frame.border)
+        display.set_packed(*frame.planes)
+        display.show(force=True)
+        count += 1
+
+    seconds = clock.time() - t_start
+    return {
+        'frames': count,
+        'seconds': seconds,
+        'frames_per_second': count / seconds if seconds > 0 else None,
+    }
+
+
+def _emulated_display(info, time_scale=0):
+    """Return a driver for an archive's display, and the emulated controller it drives."""
+    from . import emulator, inky, inky_ssd1608, inky_uc8159
+
+    drivers = {
+        'ssd1675': (inky.Inky, emulator.InkyEmulator),
+        'ssd1608': (inky_ssd1608.Inky, emulator.SSD1608Emulator),
+        'uc8159': (inky_uc8159.Inky, emulator.UC8159Emulator),
+    }
+    if info.get('controller') not in drivers:
+        raise ValueError('Cannot emulate a {} display'.format(info.get('driver')))
+    driver, emulator_class = drivers[info['controller']]
+    resolution = tuple(info['resolution'])
+    colour = info['colour']
+    probe = driver(resolution=resolution, colour=colour, i2c_bus=emulator.EmulatedI2C())
+    panel = emulator_class(probe.cols, probe.rows, time_scale=time_scale)
+    display = driver(resolution=resolution, colour=colour, spi_bus=panel.spi, gpio=panel.gpio, i2c_bus=panel.i2c, warm_wake=True)
+    return display, panel
+
+
+def main(args=None):
+    """Summarise or replay an archive from the command line."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inky frame archives')
+    subparsers = parser.add_subparsers(dest='command')
+    info = subparsers.add_parser('info', help='summarise an archive')
+    info.add_argument('path')
+    play = subparsers.add_parser('replay', help='show an archive on an emulated, or real, display')
+    play.add_argument('path')
+    play.add_argument('--speed', type=float, default=1.0, help='playback speed, 0 for as fast as possible, default: %(default)s')
+    play.add_argument('--hardware', action='store_true', help='replay on the detected display rather than an emulator')
+    args = parser.parse_args(args)
+
+    if args.command is None:
+        parser.print_help()
+        return 1
+
+    with Archive(args.path) as archive:
+        if args.command == 'info':
+            duration = archive.header(len(archive) - 1)['time'] - archive.header(0)['time'] if len(archive) else 0.0
+            print('{driver} {resolution[0]}x{resolution[1]} {colour}'.format(**archive.info))
+            print('{} frames over {:0.1f}s, {} bytes'.format(len(archive), duration, os.path.getsize(args.path)))
+            return 0
+
+        if args.hardware:
+            from .auto import auto
+            display = auto(ask_user=True, verbose=True)
+        else:
+            display, _ = _emulated_display(archive.info)
+        result = replay(archive, display, speed=args.speed)
+        print('Replayed {frames} frames in {seconds:0.2f}s'.format(**result))
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    import sys
+    sys.exit(main())
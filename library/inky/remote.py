@@ -0,0 +1,400 @@
+"""Render frames on one machine and show them on a display attached to another.
+
+The sending side packs frames into the controller's planes, exactly as
+the driver would, and sends only the XOR of each plane against the last
+frame the receiver acknowledged, run-length encoded as in
+:mod:`inky.record`. The receiving side, which owns the display, applies
+deltas straight into its copy of the packed planes and shows them
+without unpacking or repacking anything.
+
+Run the receiver on the machine with the display::
+
+    python -m inky.remote --listen 0.0.0.0
+
+And render anywhere, into a driver or a headless simulator of the same
+display::
+
+    >>> from inky import remote
+    >>> from inky.mock import InkyMockWHAT
+    >>> canvas = InkyMockWHAT('red', headless=True)
+    >>> sender = remote.connect('inky-zero.local')
+    >>> canvas.set_image(image)
+    >>> sender.send(canvas)
+    {'status': 'shown', 'bytes': 1342, 'decode': 0.0004, 'update': 15.8, ...}
+
+Messages use the framing of :mod:`inky.service`. Each frame header
+gives the frame's sequence number, and the `base` sequence number its
+delta is against, or `None` for a delta against blank planes. A
+receiver that doesn't hold the base frame, after a restart, say, replies
+'resync' and the sender resends the frame against blank planes.
+"""
+import numbers
+import socket
+import time
+import warnings
+
+try:
+    import numpy
+except ImportError:
+    raise ImportError('This library requires the numpy module\nInstall with: sudo apt install python-numpy')
+
+from . import record
+from . import service
+from . import waveform
+
+DEFAULT_PORT = 7807
+
+
+def pack(display):
+    """Return the packed planes a driver or simulator would send for its buffer, as a tuple.
+
+    Planes are the packer's output buffers, overwritten by the next frame.
+
+    :param display: Driver or simulator, see :mod:`inky.mock`.
+    """
+    if hasattr(display, '_pack'):
+        planes = display._pack(display.buf)
+    else:
+        planes = display._get_packer(display.buf).pack(display.buf)
+    return planes if isinstance(planes, tuple) else (planes,)
+
+
+def _plane_sizes(display):
+    """Return the size in bytes of each packed plane a driver shows."""
+    if display._CONTROLLER == 'uc8159':
+        return [display.rows * display.cols // 2]
+    size = display._get_packer(display.buf).plane_size
+    return [size, size]
+
+
+def _is_count(value):
+    """Return True if a header value is a non-negative integer."""
+    return isinstance(value, numbers.Integral) and not isinstance(value, bool) and value >= 0
+
+
+class Receiver:
+    """Show delta frames from a :class:`Sender` on a display.
+
+    One connection is served at a time, and each frame is shown before
+    its reply is sent, so the sender's acknowledged frame is always the
+    one on the panel.
+    """
+
+    def __init__(self, display):
+        """Initialise a receiver.
+
+        :param display: Inky driver, eg: from :func:`inky.auto`.
+        """
+        self.display = display
+
+        # Keep the controller initialised between frames
+        if hasattr(display, 'warm_wake'):
+            display.warm_wake = True
+
+        self.sizes = _plane_sizes(display)
+        self.planes = tuple(numpy.zeros(size, dtype=numpy.uint8) for size in self.sizes)
+
+        # Largest frame payload accepted, larger messages are refused before they're read
+        self.max_payload = sum(record.max_delta_size(size) for size in self.sizes)
+
+        # Sequence number of the frame held in `planes`, `None` until a frame is received
+        self.seq = None
+
+        self.frames = 0
+        self.bytes_received = 0
+        self.last_frame = None
+        self._sock = None
+
+    def info(self):
+        """Return the description of the display sent to senders."""
+        info = record._display_info(self.display)
+        info.update(planes=self.sizes, seq=self.seq)
+        return info
+
+    def _check(self, header, payload):
+        """Raise ValueError if a frame doesn't fit the display, or asks for a setting it doesn't support."""
+        display = self.display
+        deltas = header.get('planes')
+        if not isinstance(deltas, list) or not all(_is_count(size) for size in deltas) or not _is_count(header.get('seq')):
+            raise ValueError('Frame header needs a list of plane delta sizes and a sequence number')
+        if header.get('sizes') != self.sizes or len(deltas) != len(self.planes) or sum(deltas) != len(payload):
+            raise ValueError("Frame planes {} do not match the display's {}".format(header.get('sizes'), self.sizes))
+
+        lut = header.get('lut')
+        if lut is not None and lut != display.lut and lut not in (display._luts or {}):
+            raise ValueError('LUT {} is not supported by this display'.format(lut))
+
+        refresh_mode = header.get('refresh_mode')
+        if refresh_mode is not None and (not hasattr(display, 'refresh_mode') or refresh_mode not in waveform.REFRESH_MODES):
+            raise ValueError('Refresh mode {} is not supported by this display'.format(refresh_mode))
+
+    def _apply(self, header, payload):
+        """Apply a frame's deltas to `planes`, and return the seconds it took.
+
+        `seq` is cleared, the planes no longer hold an acknowledged frame until this one is shown.
+        """
+        t_start = time.time()
+        deltas = header['planes']
+        self.seq = None
+        if header['base'] is None:
+            for plane in self.planes:
+                plane.fill(0)
+        view = memoryview(payload)
+        position = 0
+        for plane, size in zip(self.planes, deltas):
+            record.apply_delta(plane, view[position:position + size])
+            position += size
+        return time.time() - t_start
+
+    def _select(self, header):
+        """Apply the border, LUT and refresh mode chosen by the sender, see :meth:`_check`."""
+        display = self.display
+        if header.get('border') is not None:
+            display.set_border(header['border'])
+        if header.get('lut') is not None:
+            display.lut = header['lut']
+        if header.get('refresh_mode') is not None:
+            display.refresh_mode = header['refresh_mode']
+
+    def _handle_message(self, header, payload):
+        if not isinstance(header, dict):
+            raise ValueError('Message header must be a JSON object')
+        kind = header.get('type')
+        if kind == 'hello':
+            result = self.info()
+            result['status'] = 'ok'
+            return result
+        if kind != 'frame':
+            raise ValueError('Unknown message type {}'.format(kind))
+
+        if header.get('base') is not None and header['base'] != self.seq:
+            return {'status': 'resync', 'seq': self.seq}
+
+        # Refuse a frame before changing anything, so the acknowledged frame is kept
+        self._check(header, payload)
+        decode = self._apply(header, payload)
+        self._select(header)
+
+        # Pre-packed planes skip packing and go straight to _update, through the frame cache and recorder
+        t_update = time.time()
+        self.display._show(self.planes, force=header.get('force', False))
+        update = time.time() - t_update
+
+        # Only a frame that reached the panel is acknowledged
+        self.seq = header['seq']
+
+        self.frames += 1
+        self.bytes_received += len(payload)
+        last_refresh = getattr(self.display, 'last_refresh', None) or {}
+        self.last_frame = {
+            'status': 'shown',
+            'seq': self.seq,
+            'bytes': len(payload),
+            'decode': decode,
+            'update': update,
+            'lut': last_refresh.get('lut', self.display.lut),
+        }
+        return dict(self.last_frame)
+
+    def handle(self, conn):
+        """Serve frames from one sender until it disconnects.
+
+        :param conn: Connected stream socket.
+        """
+        try:
+            while True:
+                try:
+                    header, payload = service.recv_message(conn, max_payload=self.max_payload)
+                except ValueError as e:
+                    # The rest of the message is unread, so the connection can't continue
+                    service.send_message(conn, {'status': 'error', 'error': str(e), 'seq': self.seq})
+                    return
+                if header is None:
+                    return
+                try:
+                    reply = self._handle_message(header, payload)
+                except (ValueError, RuntimeError) as e:
+                    reply = {'status': 'error', 'error': str(e), 'seq': self.seq}
+                service.send_message(conn, reply)
+        except (IOError, OSError):
+            # Sender went away mid message
+            pass
+        finally:
+            conn.close()
+
+    def serve_forever(self, host='', port=DEFAULT_PORT):
+        """Listen for senders on a TCP port and serve them one at a time, until :meth:`close` is called.
+
+        :param str host: Address to listen on, default: all interfaces.
+        :param int port: TCP port, default: `DEFAULT_PORT`.
+        """
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen(1)
+        while self._sock is not None:
+            try:
+                conn, _ = self._sock.accept()
+            except (IOError, OSError, AttributeError):
+                # Socket closed by close()
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                self.handle(conn)
+            except Exception as e:
+                # One misbehaving sender mustn't stop the display accepting others
+                warnings.warn('Remote sender dropped: {!r}'.format(e))
+
+    def close(self):
+        """Stop accepting senders."""
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except (IOError, OSError):
+                pass
+            sock.close()
+
+
+class Sender:
+    """Send frames to a :class:`Receiver` as deltas against the last frame it acknowledged."""
+
+    def __init__(self, sock):
+        """Initialise a sender on a connected socket, see :func:`connect`.
+
+        :param sock: Stream socket connected to a receiver.
+        """
+        self._sock = sock
+        self.info = None
+
+        # Planes the receiver acknowledged, and their sequence number
+        self._acked = None
+        self._acked_seq = None
+        self._seq = 0
+
+        self.frames = 0
+        self.bytes_sent = 0
+        self.raw_bytes = 0
+        self.last_frame = None
+
+    def request(self, header, payload=b''):
+        """Send a message, and return the receiver's reply header and the bytes sent."""
+        sent = service.send_message(self._sock, header, payload)
+        reply, _ = service.recv_message(self._sock)
+        if reply is None:
+            raise RuntimeError('Receiver closed the connection')
+        return reply, sent
+
+    def hello(self):
+        """Return the receiver's display description, see :meth:`Receiver.info`."""
+        self.info, _ = self.request({'type': 'hello'})
+        return self.info
+
+    def send(self, display, force=False, refresh_mode=None):
+        """Pack a driver or simulator's buffer, and send it with its border and LUT.
+
+        Returns the reply, see :meth:`send_planes`.
+
+        :param display: Driver or simulator of the receiver's display, holding the frame to send.
+        :param bool force: If True, refresh even if the receiver's frame cache says the frame is shown.
+        :param str refresh_mode: Receiver's refresh mode, 'full' or 'auto', default: `None` to leave it unchanged.
+        """
+        lut = getattr(display, 'lut', None) if getattr(display, '_luts', None) else None
+        return self.send_planes(pack(display), border=display.border_colour, lut=lut, force=force, refresh_mode=refresh_mode)
+
+    def send_planes(self, planes, border=None, lut=None, force=False, refresh_mode=None):
+        """Send packed planes, and return the receiver's reply once the frame is shown.
+
+        The reply has `status`, 'shown' or 'error', the frame's `seq`,
+        `bytes` sent, the receiver's `decode` and `update` times in
+        seconds, and the local `encode` time.
+
+        :param planes: Packed planes in the driver's format, see `set_packed`.
+        :param int border: Border colour, default: `None` to leave it unchanged.
+        :param str lut: Name of the full waveform to use, default: `None` to leave it unchanged.
+        :param bool force: If True, refresh even if the receiver's frame cache says the frame is shown.
+        :param str refresh_mode: 'full' or 'auto', default: `None` to leave it unchanged.
+        """
+        planes = tuple(numpy.array(plane, dtype=numpy.uint8).reshape(-1) for plane in planes)
+        sizes = [len(plane) for plane in planes]
+        if self.info is not None and sizes != self.info['planes']:
+            raise ValueError("Planes of {} bytes do not match the receiver's {}".format(sizes, self.info['planes']))
+
+        self._seq += 1
+        base = self._acked_seq if self._acked is not None and sizes == [len(plane) for plane in self._acked] else None
+
+        while True:
+            t_start = time.time()
+            deltas = [record.encode_delta(plane, None if base is None else acked)
+                      for plane, acked in zip(planes, self._acked or planes)]
+            encode = time.time() - t_start
+
+            header = {
+                'type': 'frame',
+                'seq': self._seq,
+                'base': base,
+                'planes': [len(delta) for delta in deltas],
+                'sizes': sizes,
+                'border': border,
+                'lut': lut,
+                'refresh_mode': refresh_mode,
+                'force': force,
+            }
+            reply, sent = self.request(header, b''.join(deltas))
+            self.bytes_sent += sent
+            if reply['status'] != 'resync' or base is None:
+                break
+            # The receiver lost the base frame, send this one whole
+            base = None
+
+        if reply['status'] == 'shown' and reply.get('seq') == self._seq:
+            self._acked, self._acked_seq = planes, self._seq
+        else:
+            self._acked, self._acked_seq = None, None
+
+        self.frames += 1
+        self.raw_bytes += sum(sizes)
+        reply.update(bytes=sent, raw_bytes=sum(sizes), encode=encode)
+        self.last_frame = reply
+        return reply
+
+    def close(self):
+        """Close the connection."""
+        self._sock.close()
+
+
+def connect(host, port=DEFAULT_PORT):
+    """Return a :class:`Sender` connected to the receiver at `host`.
+
+    :param str host: Receiver's host name or address.
+    :param int port: Receiver's TCP port, default: `DEFAULT_PORT`.
+    """
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sender = Sender(sock)
+    sender.hello()
+    return sender
+
+
+def main(args=None):
+    """Receive frames for an auto-detected display."""
+    import argparse
+    from .auto import auto
+
+    parser = argparse.ArgumentParser(description='Inky remote display receiver')
+    parser.add_argument('--listen', default='', help='address to listen on, default: all interfaces')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='TCP port, default: %(default)s')
+    args, _ = parser.parse_known_args(args)
+
+    receiver = Receiver(auto(ask_user=True, verbose=True))
+    print('Receiving frames for {} on port {}'.format(type(receiver.display).__name__, args.port))
+    try:
+        receiver.serve_forever(args.listen, args.port)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.close()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
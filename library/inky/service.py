@@ -0,0 +1,431 @@
+"""Long running display service, accepting frames over a local Unix socket.
+
+One process owns the display and keeps its controller initialised
+(`warm_wake`), so clients don't reset the panel or fight over the bus.
+Frames that arrive while a refresh is in progress replace any frame
+still waiting, only the newest is shown. Refreshes are at least a
+minimum interval apart, set per panel type.
+
+Run the service with::
+
+    python -m inky.service --type phat --colour red
+
+And send frames from any process::
+
+    >>> from inky import service
+    >>> client = service.connect()
+    >>> client.send_frame(image, wait=True)
+    {'status': 'shown', 'latency': 15.2, 'pending': 0, ...}
+
+Messages are a big-endian (header length, payload length) pair of
+uint32s, a JSON header and a binary payload. Frame payloads are the
+palette indexes of every pixel, one byte each, as a height x width image:
+the layout `set_image` takes, which isn't always `buf`'s. The SSD1608
+pHAT's `buf` has rows of padding around its 250x122 pixels, say.
+"""
+import json
+import numbers
+import os
+import socket
+import struct
+import threading
+import time
+
+try:
+    import numpy
+except ImportError:
+    raise ImportError('This library requires the numpy module\nInstall with: sudo apt install python-numpy')
+
+DEFAULT_SOCKET = '/tmp/inky.sock'
+
+# Shortest time in seconds between the start of one refresh and the next, by display colour
+MIN_REFRESH_INTERVAL = {
+    'black': 5.0,
+    'red': 15.0,
+    'yellow': 15.0,
+    'multi': 30.0,
+}
+
+_LENGTHS = struct.Struct('>II')
+
+# Largest header accepted, frames themselves are only limited by the display size
+_MAX_HEADER = 64 * 1024
+
+
+def send_message(sock, header, payload=b''):
+    """Send a header dict and an optional binary payload, and return the number of bytes sent.
+
+    :param sock: Connected stream socket.
+    :param dict header: JSON serialisable header.
+    :param payload: bytes-like payload.
+    """
+    header = json.dumps(header).encode('utf-8')
+    size = getattr(payload, 'nbytes', None) or len(payload)
+    sock.sendall(_LENGTHS.pack(len(header), size) + header)
+    if size:
+        sock.sendall(payload)
+    return _LENGTHS.size + len(header) + size
+
+
+def _recv_exactly(sock, size):
+    """Return exactly `size` bytes from `sock`, or `None` if it closes first."""
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if count == 0:
+            return None
+        received += count
+    return data
+
+
+def recv_message(sock, max_payload=None):
+    """Return the next (header, payload) from `sock`, or (`None`, `None`) once it closes.
+
+    Headers larger than `_MAX_HEADER`, or payloads larger than
+    `max_payload`, raise ValueError before anything is allocated for them.
+    The rest of the message is left unread, so the connection can't be
+    used again.
+
+    :param sock: Connected stream socket.
+    :param int max_payload: Largest payload accepted in bytes, default: `None` for no limit.
+    """
+    lengths = _recv_exactly(sock, _LENGTHS.size)
+    if lengths is None:
+        return None, None
+    header_size, payload_size = _LENGTHS.unpack(bytes(lengths))
+    if header_size > _MAX_HEADER:
+        raise ValueError('Message header of {} bytes is too large'.format(header_size))
+    if max_payload is not None and payload_size > max_payload:
+        raise ValueError('Message payload of {} bytes is too large'.format(payload_size))
+    header = _recv_exactly(sock, header_size)
+    payload = _recv_exactly(sock, payload_size) if payload_size else bytearray()
+    if header is None or payload is None:
+        return None, None
+    return json.loads(header.decode('utf-8')), payload
+
+
+class _Frame:
+    """A frame waiting to be shown, and the client waiting for it, if any."""
+
+    def __init__(self, pixels, force=False):
+        self.pixels = pixels
+        self.force = force
+        self.received = time.time()
+        self.result = None
+        self._done = threading.Event()
+
+    def finish(self, result):
+        self.result = result
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        return self.result
+
+
+class DisplayService:
+    """Show frames from local clients on one display.
+
+    A single worker thread updates the display. Only the newest waiting
+    frame is kept, frames it replaces are counted as dropped and their
+    clients told they were superseded.
+    """
+
+    def __init__(self, display, path=DEFAULT_SOCKET, min_interval=None):
+        """Initialise a display service.
+
+        :param display: Inky driver, eg: from :func:`inky.auto`.
+        :param str path: Unix socket path to listen on, default: `/tmp/inky.sock`.
+        :param float min_interval: Shortest time between refreshes in seconds, default: by display colour from `MIN_REFRESH_INTERVAL`.
+        """
+        self.display = display
+        self.path = path
+        if min_interval is None:
+            min_interval = MIN_REFRESH_INTERVAL.get(getattr(display, 'colour', None), 15.0)
+        self.min_interval = min_interval
+
+        # Keep the controller initialised between frames
+        if hasattr(display, 'warm_wake'):
+            display.warm_wake = True
+
+        self.received = 0
+        self.dropped = 0
+        self.refreshes = 0
+        self.last_latency = None
+
+        self._condition = threading.Condition()
+        self._pending = None
+        self._refreshing = False
+        self._next_refresh = 0.0
+        self._running = False
+        self._worker = None
+        self._sock = None
+
+    def start(self):
+        """Start the worker thread that updates the display."""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._worker = threading.Thread(target=self._run, name='inky-service')
+        self._worker.daemon = True
+        self._worker.start()
+
+    def close(self):
+        """Stop accepting clients and stop the worker once the current refresh finishes."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._sock is not None:
+            try:
+                # Wakes serve_forever from accept()
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except (IOError, OSError):
+                pass
+            self._sock.close()
+            self._sock = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def status(self):
+        """Return counters, and the number of frames pending and refreshing."""
+        with self._condition:
+            return {
+                'pending': int(self._pending is not None),
+                'refreshing': self._refreshing,
+                'received': self.received,
+                'dropped': self.dropped,
+                'refreshes': self.refreshes,
+                'last_latency': self.last_latency,
+                'next_refresh_in': max(0.0, self._next_refresh - time.time()),
+            }
+
+    def submit(self, pixels, force=False):
+        """Queue a frame, replacing any frame still waiting.
+
+        Returns the queued frame, see `_Frame.wait`.
+
+        :param pixels: Palette indexes as a height x width image, anything `display.set_image` accepts.
+        :param bool force: Refresh even if the display's frame cache says this frame is already shown.
+        """
+        frame = _Frame(pixels, force=force)
+        with self._condition:
+            if not self._running:
+                raise RuntimeError('Display service is not running')
+            superseded = self._pending
+            self._pending = frame
+            self.received += 1
+            if superseded is not None:
+                self.dropped += 1
+            self._condition.notify_all()
+
+        if superseded is not None:
+            result = self.status()
+            result.update(status='superseded', latency=time.time() - superseded.received)
+            superseded.finish(result)
+        return frame
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and (self._pending is None or time.time() < self._next_refresh):
+                    timeout = None if self._pending is None else self._next_refresh - time.time()
+                    self._condition.wait(timeout)
+                if not self._running:
+                    frame, self._pending = self._pending, None
+                    if frame is not None:
+                        frame.finish({'status': 'cancelled'})
+                    return
+                frame, self._pending = self._pending, None
+                self._refreshing = True
+                t_start = time.time()
+                self._next_refresh = t_start + self.min_interval
+
+            error = None
+            try:
+                self.display.set_image(frame.pixels)
+                self.display.show(force=frame.force)
+            except Exception as e:
+                error = str(e)
+
+            with self._condition:
+                self._refreshing = False
+                latency = time.time() - frame.received
+                if error is None:
+                    self.refreshes += 1
+                    self.last_latency = latency
+
+            result = self.status()
+            result.update(status='shown' if error is None else 'error', latency=latency, refresh=time.time() - t_start)
+            if error is not None:
+                result['error'] = error
+            frame.finish(result)
+
+    def _frame_pixels(self, header, payload):
+        """Return the pixels of a frame message as a height x width array, or the shape it was sent with."""
+        shape = header.get('shape', (self.display.height, self.display.width))
+        if not isinstance(shape, (list, tuple)) or len(shape) != 2 or \
+                not all(isinstance(size, numbers.Integral) and not isinstance(size, bool) and size >= 0 for size in shape):
+            raise ValueError('Frame shape {} is not a height, width pair'.format(shape))
+        rows, cols = shape
+        if rows * cols != len(payload):
+            raise ValueError('Frame of {} bytes does not match shape {}x{}'.format(len(payload), rows, cols))
+        return numpy.frombuffer(payload, dtype=numpy.uint8).reshape((rows, cols))
+
+    def handle(self, conn):
+        """Serve requests from one client connection until it closes.
+
+        :param conn: Connected stream socket.
+        """
+        try:
+            while True:
+                try:
+                    # No frame is larger than one byte per pixel of the buffer, padding included
+                    header, payload = recv_message(conn, max_payload=self.display.buf.size)
+                except ValueError as e:
+                    # The rest of the message is unread, so the connection can't continue
+                    send_message(conn, {'status': 'error', 'error': str(e)})
+                    return
+                if header is None:
+                    return
+                try:
+                    reply = self._handle_message(header, payload)
+                except (ValueError, RuntimeError) as e:
+                    reply = {'status': 'error', 'error': str(e)}
+                send_message(conn, reply)
+        except (IOError, OSError):
+            # Client went away mid message
+            pass
+        finally:
+            conn.close()
+
+    def _handle_message(self, header, payload):
+        if not isinstance(header, dict):
+            raise ValueError('Message header must be a JSON object')
+        kind = header.get('type')
+        if kind == 'status':
+            result = self.status()
+            result['status'] = 'ok'
+            return result
+        if kind == 'frame':
+            frame = self.submit(self._frame_pixels(header, payload), force=header.get('force', False))
+            if header.get('wait', False):
+                return frame.wait()
+            result = self.status()
+            result['status'] = 'queued'
+            return result
+        raise ValueError('Unknown message type {}'.format(kind))
+
+    def bind(self):
+        """Listen on the Unix socket, refusing to start if another service is using it."""
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except (IOError, OSError):
+                # Left behind by a service that exited without cleaning up
+                os.unlink(self.path)
+            else:
+                raise RuntimeError('Display service already running on {}'.format(self.path))
+            finally:
+                probe.close()
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._sock.listen(8)
+
+    def serve_forever(self):
+        """Start the worker, then accept clients until :meth:`close` is called."""
+        if self._sock is None:
+            self.bind()
+        self.start()
+        while self._running:
+            try:
+                conn, _ = self._sock.accept()
+            except (IOError, OSError, AttributeError):
+                # Socket closed by close()
+                break
+            thread = threading.Thread(target=self.handle, args=(conn,), name='inky-service-client')
+            thread.daemon = True
+            thread.start()
+
+
+class Client:
+    """Send frames to a :class:`DisplayService`."""
+
+    def __init__(self, sock):
+        """Initialise a client on a connected socket, see :func:`connect`.
+
+        :param sock: Stream socket connected to a display service.
+        """
+        self._sock = sock
+
+    def request(self, header, payload=b''):
+        """Send a message and return the service's reply header."""
+        send_message(self._sock, header, payload)
+        reply, _ = recv_message(self._sock)
+        if reply is None:
+            raise RuntimeError('Display service closed the connection')
+        return reply
+
+    def send_frame(self, image, wait=False, force=False):
+        """Send a frame, and return the service's reply.
+
+        The reply includes `status` ('queued', or with `wait`: 'shown',
+        'superseded' or 'error'), `latency` in seconds from receipt to the
+        end of the refresh, `pending` frames and `dropped` frame counts.
+
+        :param image: Palette indexes as a height x width numpy array or "P" PIL image, as `set_image` takes them.
+        :param bool wait: If True, reply once the frame has been shown or superseded.
+        :param bool force: If True, refresh even if the frame is already shown.
+        """
+        pixels = numpy.ascontiguousarray(image, dtype=numpy.uint8)
+        if pixels.ndim != 2:
+            raise ValueError('Expected a 2d array of palette indexes')
+        header = {'type': 'frame', 'shape': list(pixels.shape), 'wait': wait, 'force': force}
+        return self.request(header, pixels.reshape(-1))
+
+    def status(self):
+        """Return the service's counters and queue depth."""
+        return self.request({'type': 'status'})
+
+    def close(self):
+        """Close the connection."""
+        self._sock.close()
+
+
+def connect(path=DEFAULT_SOCKET):
+    """Return a :class:`Client` connected to the display service at `path`."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    return Client(sock)
+
+
+def main(args=None):
+    """Run a display service for an auto-detected, or specified, display."""
+    import argparse
+    from .auto import auto
+
+    parser = argparse.ArgumentParser(description='Inky display service')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='Unix socket path, default: %(default)s')
+    parser.add_argument('--min-interval', type=float, default=None, help='Shortest time between refreshes in seconds')
+    args, _ = parser.parse_known_args(args)
+
+    service = DisplayService(auto(ask_user=True, verbose=True), path=args.socket, min_interval=args.min_interval)
+    print('Serving {} on {}, refreshing at most every {:0.1f}s'.format(
+        type(service.display).__name__, service.path, service.min_interval))
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,134 @@
+"""SPI transfer helpers shared by the Inky drivers."""
+import time
+
+try:
+    import numpy
+except ImportError:
+    raise ImportError('This library requires the numpy module\nInstall with: sudo apt install python-numpy')
+
+# Fallback chunk size, matches the default spidev kernel module bufsiz
+_SPI_CHUNK_SIZE = 4096
+_SPIDEV_BUFSIZ = '/sys/module/spidev/parameters/bufsiz'
+
+_bufsiz = None
+
+
+def get_bufsiz(path=_SPIDEV_BUFSIZ):
+    """Return the largest single transfer the spidev kernel module accepts.
+
+    The value is read from the `bufsiz` module parameter once and cached.
+
+    :param str path: Location of the spidev bufsiz parameter.
+    """
+    global _bufsiz
+    if _bufsiz is None:
+        try:
+            with open(path, 'r') as f:
+                _bufsiz = int(f.read().strip()) or _SPI_CHUNK_SIZE
+        except (IOError, OSError, ValueError):
+            _bufsiz = _SPI_CHUNK_SIZE
+    return _bufsiz
+
+
+def as_buffer(values):
+    """Return a flat, contiguous byte memoryview of `values` without copying where possible.
+
+    :param values: bytes, bytearray, memoryview, numpy.ndarray or a list of ints.
+    """
+    if isinstance(values, memoryview):
+        return values
+    if isinstance(values, (bytes, bytearray)):
+        return memoryview(values)
+    if isinstance(values, numpy.ndarray):
+        return memoryview(numpy.ascontiguousarray(values, dtype=numpy.uint8).reshape(-1))
+    if isinstance(values, int):
+        values = [values]
+    return memoryview(bytearray(values))
+
+
+class SPIStats:
+    """Running totals for bytes written over SPI and the time spent writing them."""
+
+    def __init__(self):
+        """Initialise empty SPI statistics."""
+        self.reset()
+
+    def reset(self):
+        """Clear all totals."""
+        self.bytes_written = 0
+        self.transfers = 0
+        self.seconds = 0.0
+
+    def record(self, nbytes, seconds):
+        """Add a single write to the totals.
+
+        :param int nbytes: Number of bytes written.
+        :param float seconds: Time taken to write them.
+        """
+        self.bytes_written += nbytes
+        self.transfers += 1
+        self.seconds += seconds
+
+    @property
+    def bytes_per_second(self):
+        """Return the average throughput across all recorded writes."""
+        if self.seconds <= 0:
+            return 0.0
+        return self.bytes_written / self.seconds
+
+    def __repr__(self):
+        """Return a summary of SPI throughput."""
+        return 'SPIStats({} bytes in {} transfers, {:0.3f}s, {:0.0f} B/s)'.format(
+            self.bytes_written, self.transfers, self.seconds, self.bytes_per_second)
+
+
+def write(spi_bus, values, chunk_size=None):
+    """Write values to an SPI bus, returning the number of bytes written.
+
+    Uses `spidev.SpiDev.writebytes2` where available, which accepts any
+    buffer-protocol object so no intermediate Python list is built.
+    Transfers are split into memoryview slices of the kernel's `bufsiz`.
+
+    Older spidev releases fall back to `xfer3`, or `xfer` in chunks.
+
+    :param spi_bus: SPI device, typically :class:`spidev.SpiDev`.
+    :param values: bytes, bytearray, memoryview, numpy.ndarray or a list of ints.
+    :param int chunk_size: Maximum bytes per transfer, default: spidev `bufsiz`.
+    """
+    buf = as_buffer(values)
+    length = len(buf)
+
+    if chunk_size is None:
+        chunk_size = get_bufsiz()
+
+    writebytes2 = getattr(spi_bus, 'writebytes2', None)
+    if writebytes2 is not None:
+        for offset in range(0, length, chunk_size):
+            writebytes2(buf[offset:offset + chunk_size])
+        return length
+
+    values = bytearray(buf)
+    try:
+        spi_bus.xfer3(list(values))
+    except AttributeError:
+        for offset in range(0, length, chunk_size):
+            spi_bus.xfer(list(values[offset:offset + chunk_size]))
+    return length
+
+
+def timed_write(spi_bus, values, stats, chunk_size=None, timings=None):
+    """Write values to an SPI bus and record the transfer in `stats`.
+
+    :param spi_bus: SPI device, typically :class:`spidev.SpiDev`.
+    :param values: bytes, bytearray, memoryview, numpy.ndarray or a list of ints.
+    :param stats: :class:`SPIStats` to update.
+    :param int chunk_size: Maximum bytes per transfer, default: spidev `bufsiz`.
+    :param timings: :class:`inky.timing.Timings` to also record the transfer in as an 'spi' phase sample.
+    """
+    t_start = time.time()
+    nbytes = write(spi_bus, values, chunk_size=chunk_size)
+    seconds = time.time() - t_start
+    stats.record(nbytes, seconds)
+    if timings is not None:
+        timings.record('spi', seconds, nbytes)
+    return nbytes
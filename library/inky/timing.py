@@ -0,0 +1,204 @@
+"""Per-phase timing instrumentation for the Inky refresh pipeline."""
+import bisect
+import collections
+import time
+
+# Phases recorded by the drivers, in the order they occur during show()
+PHASES = ('transform', 'pack', 'setup', 'spi', 'refresh', 'power_off')
+
+# Upper bounds, in seconds, of the default histogram bins, the last bin is unbounded
+HISTOGRAM_BINS = (0.0001, 0.0003, 0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0, 30.0)
+
+
+class _Phase:
+    """Context manager that records the time spent inside it as one phase sample."""
+
+    def __init__(self, timings, name):
+        self._timings = timings
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._timings.record(self._name, time.time() - self._start)
+
+
+class _NullPhase:
+    """Context manager that does nothing, used while timing is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class NullTimings:
+    """Disabled timing, every method is a no-op.
+
+    Drivers use this when no timings are requested, so instrumented code
+    costs a method call per phase and nothing more.
+    """
+
+    enabled = False
+
+    def phase(self, name):
+        """Return a context manager that records nothing."""
+        return _NULL_PHASE
+
+    def record(self, name, seconds, nbytes=0):
+        """Discard a sample."""
+        pass
+
+
+NULL_TIMINGS = NullTimings()
+
+
+class PhaseStats:
+    """Totals and a rolling window of recent samples for a single phase."""
+
+    def __init__(self, window=100):
+        """Initialise empty phase statistics.
+
+        :param int window: Number of recent samples kept for percentiles and histograms.
+        """
+        self.samples = collections.deque(maxlen=window)
+        self.count = 0
+        self.seconds = 0.0
+        self.bytes = 0
+
+    def record(self, seconds, nbytes=0):
+        """Add a sample.
+
+        :param float seconds: Time spent in the phase.
+        :param int nbytes: Bytes transferred during the phase, if any.
+        """
+        self.samples.append(seconds)
+        self.count += 1
+        self.seconds += seconds
+        self.bytes += nbytes
+
+    def percentile(self, percent):
+        """Return the given percentile of the recent samples, or `None` if there are none.
+
+        :param float percent: Percentile from 0 to 100.
+        """
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = int(round((len(ordered) - 1) * percent / 100.0))
+        return ordered[index]
+
+    def histogram(self, bins=HISTOGRAM_BINS):
+        """Return counts of the recent samples in each bin.
+
+        The result has one more entry than `bins`, counting samples above the last bound.
+
+        :param bins: Ascending upper bounds of each bin in seconds.
+        """
+        counts = [0] * (len(bins) + 1)
+        for seconds in self.samples:
+            counts[bisect.bisect_left(bins, seconds)] += 1
+        return counts
+
+    def as_dict(self, bins=HISTOGRAM_BINS):
+        """Return a JSON serialisable summary of this phase."""
+        return {
+            'count': self.count,
+            'seconds': self.seconds,
+            'bytes': self.bytes,
+            'mean': self.seconds / self.count if self.count else None,
+            'min': min(self.samples) if self.samples else None,
+            'max': max(self.samples) if self.samples else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'histogram': self.histogram(bins),
+        }
+
+
+class Timings:
+    """Record how long each phase of a display update takes.
+
+    Pass an instance as the `timings` argument of a driver. Each phase keeps
+    running totals plus a rolling window of recent samples, from which
+    percentiles and a histogram are computed, see :meth:`as_dict`.
+
+    SPI transfers are recorded individually with their size under the
+    'spi' phase. The optional `callback` is called with
+    `(phase, seconds, nbytes)` for every sample, eg: to forward them to a
+    metrics exporter.
+    """
+
+    enabled = True
+
+    def __init__(self, callback=None, window=100, bins=HISTOGRAM_BINS):
+        """Initialise timing.
+
+        :param callback: Function called with (phase, seconds, nbytes) for every sample, default: `None`.
+        :param int window: Number of recent samples kept per phase, default: 100.
+        :param bins: Ascending upper bounds, in seconds, of the histogram bins.
+        """
+        self.callback = callback
+        self.window = window
+        self.bins = tuple(bins)
+        self.phases = collections.OrderedDict()
+
+    def phase(self, name):
+        """Return a context manager that records the time spent inside it.
+
+        :param str name: Phase name, eg: 'setup'.
+        """
+        return _Phase(self, name)
+
+    def record(self, name, seconds, nbytes=0):
+        """Record a phase sample.
+
+        :param str name: Phase name.
+        :param float seconds: Time spent in the phase.
+        :param int nbytes: Bytes transferred during the phase, if any.
+        """
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats(self.window)
+        stats.record(seconds, nbytes)
+        if self.callback is not None:
+            self.callback(name, seconds, nbytes)
+
+    def reset(self):
+        """Discard all samples."""
+        self.phases.clear()
+
+    def __getitem__(self, name):
+        """Return the :class:`PhaseStats` for a phase."""
+        return self.phases[name]
+
+    def __contains__(self, name):
+        """Return True if a phase has been recorded."""
+        return name in self.phases
+
+    def as_dict(self):
+        """Return a JSON serialisable summary of every recorded phase."""
+        return dict((name, stats.as_dict(self.bins)) for name, stats in self.phases.items())
+
+    def __repr__(self):
+        """Return a summary of the mean time per phase."""
+        return 'Timings({})'.format(', '.join(
+            '{}={:0.4f}s'.format(name, stats.seconds / stats.count) for name, stats in self.phases.items()))
+
+
+def get_timings(timings=None):
+    """Return a timings object for a driver's `timings` argument.
+
+    :param timings: `None` to disable timing, a :class:`Timings` instance, or a callback taking (phase, seconds, nbytes).
+    """
+    if timings is None:
+        return NULL_TIMINGS
+    if callable(timings) and not isinstance(timings, (Timings, NullTimings)):
+        return Timings(callback=timings)
+    return timings
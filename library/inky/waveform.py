@@ -0,0 +1,142 @@
+"""Choose a waveform (LUT) for each update from panel temperature and frame content.
+
+E-ink particles move more slowly when cold, so a waveform is only safe
+within the temperature range it was tuned for. The short black/white
+"fast" waveforms skip the flashing phases that clear ghosting, and don't
+drive red/yellow pixels, so they are only used for frames with no colour
+pixels, at normal room temperatures, and for a limited number of updates
+in a row. The drivers' "black_fast" tables are hand-made and have not
+been tried on a panel.
+
+Tri-colour panels can also have a "mono" waveform: a full black/white
+update, flashing phases included, without the long phases that move the
+red/yellow particles. It's used for frames with no colour pixels that
+replace a frame with none, at any temperature.
+"""
+
+REFRESH_FULL = 'full'
+REFRESH_AUTO = 'auto'
+
+REFRESH_MODES = (REFRESH_FULL, REFRESH_AUTO)
+
+# (upper bound in degrees C, band), the first band whose bound is above the temperature applies
+TEMPERATURE_BANDS = (
+    (0.0, 'freezing'),
+    (10.0, 'cold'),
+    (35.0, 'normal'),
+    (None, 'hot'),
+)
+
+# Seconds a temperature read from the controller's sensor is reused for
+TEMPERATURE_INTERVAL = 60.0
+
+# Fast updates in a row before a full update is forced to clear ghosting
+FAST_LIMIT = 10
+
+
+def temperature_band(temperature):
+    """Return the name of the band `temperature` falls in, or `None` if it isn't known.
+
+    :param float temperature: Panel temperature in degrees C, or `None`.
+    """
+    if temperature is None:
+        return None
+    for bound, band in TEMPERATURE_BANDS:
+        if bound is None or temperature < bound:
+            return band
+
+
+def decode_temperature(data):
+    """Return degrees C from the two bytes of an SSD16xx temperature register, or `None`.
+
+    The register holds a 12-bit two's complement value in 1/16ths of a
+    degree, most significant bits first. All zero or all one bits are
+    what a bus that can't read back returns, so are treated as no reading.
+
+    :param data: Sequence of two bytes read from the controller.
+    """
+    if data is None or len(data) < 2:
+        return None
+    value = ((data[0] & 0xFF) << 4) | ((data[1] & 0xFF) >> 4)
+    if value in (0x000, 0xFFF):
+        return None
+    if value & 0x800:
+        value -= 0x1000
+    return value / 16.0
+
+
+class WaveformTable:
+    """Waveform (LUT) names keyed by temperature band and refresh mode.
+
+    Every band uses the `default` full waveform unless the table says
+    otherwise. A fast waveform is only chosen where the table has one for
+    the band, so an unknown temperature always gets a full update.
+    """
+
+    def __init__(self, default, entries=None, mono=None):
+        """Initialise a waveform table.
+
+        :param str default: LUT name for a full update at any temperature.
+        :param dict entries: LUT names by (band, mode), eg: {('normal', 'fast'): 'black_fast'}.
+        :param str mono: LUT name for a full black/white update at any temperature, default: `None` for none.
+        """
+        self.default = default
+        self.entries = dict(entries or {})
+        self.mono = mono
+
+    def select(self, temperature, refresh_mode=REFRESH_FULL, colour_pixels=True, fast_count=0):
+        """Return the (LUT name, mode, band) to use for an update.
+
+        :param float temperature: Panel temperature in degrees C, or `None` if unknown.
+        :param str refresh_mode: 'full' to always use a full waveform, or 'auto' to use the quickest safe one.
+        :param bool colour_pixels: Whether the frame, or the frame it replaces, has any red/yellow pixels.
+        :param int fast_count: Fast updates since the last full one.
+        """
+        if refresh_mode not in REFRESH_MODES:
+            raise ValueError('Refresh mode {} is not supported, use one of: {}'.format(refresh_mode, ', '.join(REFRESH_MODES)))
+        band = temperature_band(temperature)
+        if refresh_mode == REFRESH_AUTO and not colour_pixels:
+            lut = self.entries.get((band, 'fast')) if fast_count < FAST_LIMIT else None
+            if lut is not None:
+                return lut, 'fast', band
+            if self.mono is not None:
+                return self.mono, 'mono', band
+        return self.entries.get((band, REFRESH_FULL), self.default), REFRESH_FULL, band
+
+
+# Approximate rate each controller steps through LUT frames, per second, with the drivers' gate and dummy line settings
+FRAME_RATES = {
+    'ssd1675': 250.0,
+    'ssd1608': 50.0,
+}
+
+
+def lut_phases(lut, controller='ssd1675'):
+    """Return the number of frames each phase of a LUT lasts.
+
+    SSD1675 LUTs end with seven phases of four step lengths and a repeat
+    count, the phase lasts the steps' total once plus once per repeat.
+    SSD1608 LUTs end with ten bytes of phase lengths, two phases per byte.
+
+    :param lut: LUT bytes, as loaded with command 0x32.
+    :param str controller: 'ssd1675' for the pHAT and wHAT, 'ssd1608' for the SSD1608 pHAT.
+    """
+    lut = list(lut)
+    if controller == 'ssd1675':
+        timings = lut[35:70]
+        return [sum(timings[i:i + 4]) * (timings[i + 4] + 1) for i in range(0, len(timings), 5)]
+    if controller == 'ssd1608':
+        phases = []
+        for value in lut[20:30]:
+            phases.extend((value & 0x0F, value >> 4))
+        return phases
+    raise ValueError('Controller {} is not supported, use one of: {}'.format(controller, ', '.join(sorted(FRAME_RATES))))
+
+
+def lut_seconds(lut, controller='ssd1675'):
+    """Return the approximate time a refresh with `lut` takes, in seconds.
+
+    :param lut: LUT bytes, as loaded with command 0x32.
+    :param str controller: 'ssd1675' for the pHAT and wHAT, 'ssd1608' for the SSD1608 pHAT.
+    """
+    return sum(lut_phases(lut, controller)) / FRAME_RATES[controller]
@@ -17,9 +17,7 @@ class InkyWHAT(inky.Inky):
         >>> from inky import InkyWHAT
         >>> display = InkyWHAT('red')
         >>> display.set_border(display.BLACK)
-        >>> for x in range(display.WIDTH):
-        >>>     for y in range(display.HEIGHT):
-        >>>         display.set_pixel(x, y, display.RED)
+        >>> display.fill_rect(0, 0, display.WIDTH, display.HEIGHT, display.RED)
         >>> display.show()
     """
 
@@ -31,14 +29,17 @@ class InkyWHAT(inky.Inky):
     RED = 2
     YELLOW = 2
 
-    def __init__(self, colour='black'):
+    def __init__(self, colour='black', epd_type=None):
         """Initialise an Inky wHAT Display.
 
         :param str colour: one of 'red', 'black' or 'yellow', default: 'black'.
+        :param epd_type: EEPROM contents already read, eg: by :func:`inky.auto`. Default: `None`.
+        :type epd_type: :class:`inky.eeprom.EPDType`
         """
         inky.Inky.__init__(
             self,
             resolution=(self.WIDTH, self.HEIGHT),
             colour=colour,
             h_flip=False,
-            v_flip=False)
+            v_flip=False,
+            epd_type=epd_type)
@@ -8,7 +8,7 @@ import sys
 import mock
 import pytest
 
-from tools import MockSMBus
+from tools import MockGPIO, MockSMBus
 
 
 @pytest.fixture(scope='function', autouse=False)
@@ -24,6 +24,18 @@ def GPIO():
     del sys.modules['RPi.GPIO']
 
 
+@pytest.fixture(scope='function', autouse=False)
+def GPIO_edges():
+    """Mock RPi.GPIO module with pin levels and edge events."""
+    GPIO = MockGPIO()
+    sys.modules['RPi'] = mock.MagicMock()
+    sys.modules['RPi'].GPIO = GPIO
+    sys.modules['RPi.GPIO'] = GPIO
+    yield GPIO
+    del sys.modules['RPi']
+    del sys.modules['RPi.GPIO']
+
+
 @pytest.fixture(scope='function', autouse=False)
 def smbus2():
     """Mock smbus2 module."""
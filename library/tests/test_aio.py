@@ -0,0 +1,96 @@
+"""asyncio support tests for Inky."""
+import threading
+import time
+
+import pytest
+
+asyncio = pytest.importorskip('asyncio')
+
+
+def run(coroutine):
+    """Run a coroutine to completion on a new event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def slow_update(log, delay=0.2):
+    """Return a stand-in for Inky._update that takes `delay` seconds and logs its start and end."""
+    def _update(*args, **kwargs):
+        log.append(('start', threading.current_thread().name))
+        time.sleep(delay)
+        log.append(('end', threading.current_thread().name))
+    return _update
+
+
+def test_show_async_does_not_block_loop(spidev, smbus2, GPIO):
+    """Test the event loop keeps running while the update is in progress."""
+    from inky import InkyWHAT
+
+    inky = InkyWHAT('red')
+    log = []
+    inky._update = slow_update(log)
+    ticks = []
+
+    async def ticker():
+        while len(log) < 2:
+            ticks.append(time.time())
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(inky.show_async(), ticker())
+
+    run(main())
+
+    assert len(ticks) > 5
+    assert log[0][1] != threading.current_thread().name
+
+
+def test_show_async_serialised(spidev, smbus2, GPIO):
+    """Test concurrent show_async calls for one display do not overlap."""
+    from inky.inky_uc8159 import Inky
+
+    inky = Inky()
+    log = []
+    inky._update = slow_update(log, 0.05)
+
+    async def main():
+        await asyncio.gather(*[inky.show_async() for _ in range(3)])
+
+    run(main())
+
+    assert [event for event, thread in log] == ['start', 'end'] * 3
+
+
+def test_show_async_copies_buffer(spidev, smbus2, GPIO):
+    """Test drawing after show_async starts does not change the frame being shown."""
+    from inky import InkyPHAT_SSD1608
+
+    inky = InkyPHAT_SSD1608('red')
+    frames = []
+    inky._update = lambda buf_a, buf_b, busy_wait=True: frames.append(bytes(buf_b))
+
+    async def main():
+        task = asyncio.ensure_future(inky.show_async())
+        await asyncio.sleep(0)
+        inky.buf[:] = inky.RED
+        await task
+
+    run(main())
+
+    assert frames == [b'\x00' * len(frames[0])]
+
+
+def test_show_async_mock_inline(tkinter, PIL):
+    """Test the simulator updates in the event loop thread."""
+    from inky import InkyMockPHAT
+
+    inky = InkyMockPHAT('red')
+    threads = []
+    inky._simulate = lambda region: threads.append(threading.current_thread().name)
+
+    run(inky.show_async())
+
+    assert threads == [threading.current_thread().name]
@@ -26,3 +26,68 @@ def test_auto_fallback(spidev, smbus2, PIL, inky_type, inky_colour):
     assert isinstance(inky, inky_class) is True
     if inky_colour is not None:
         assert inky.colour == inky_colour
+
+
+@pytest.mark.parametrize('display_variant,inky_class', [(3, 'InkyWHAT'), (11, 'InkyPHAT_SSD1608'), (16, 'Inky7Colour')])
+def test_auto_detect_once(spidev, smbus2, PIL, tmpdir, display_variant, inky_class):
+    """Test the EEPROM is read once on the first start, and not at all once cached."""
+    import inky
+    from inky import auto
+    from inky.eeprom import EPDType, DetectionCache
+    from inky.emulator import EmulatedI2C
+
+    width, height = {3: (400, 300), 11: (250, 122), 16: (640, 400)}[display_variant]
+    i2c = EmulatedI2C(EPDType(width, height, 'red', 12, display_variant))
+    cache = DetectionCache(str(tmpdir.join('eeprom.json')), boot_id='boot-1')
+
+    display = auto(i2c_bus=i2c, cache=cache)
+    assert isinstance(display, getattr(inky, inky_class))
+    assert i2c.reads == 1
+
+    display = auto(i2c_bus=i2c, cache=cache)
+    assert isinstance(display, getattr(inky, inky_class))
+    assert display.eeprom.display_variant == display_variant
+    assert i2c.reads == 1
+
+
+def test_auto_no_cache(spidev, smbus2, PIL):
+    """Test the EEPROM is read on every start with the cache turned off."""
+    from inky import auto, InkyWHAT
+    from inky.eeprom import EPDType
+    from inky.emulator import EmulatedI2C
+
+    i2c = EmulatedI2C(EPDType(400, 300, 'black', 12, 3))
+
+    assert isinstance(auto(i2c_bus=i2c, cache=False), InkyWHAT)
+    assert isinstance(auto(i2c_bus=i2c, cache=False), InkyWHAT)
+    assert i2c.reads == 2
+
+
+def test_auto_failed_read_not_cached(spidev, smbus2, PIL, tmpdir):
+    """Test a failed EEPROM read, eg: before I2C is enabled, isn't remembered for the rest of the boot."""
+    from inky import auto, InkyWHAT
+    from inky.eeprom import EPDType, DetectionCache
+    from inky.emulator import EmulatedI2C
+
+    cache = DetectionCache(str(tmpdir.join('eeprom.json')), boot_id='boot-1')
+    cache.store(None, None)
+
+    with pytest.raises(RuntimeError):
+        auto(i2c_bus=EmulatedI2C(), cache=cache)
+    assert cache.load() == (None, None)
+
+    i2c = EmulatedI2C(EPDType(400, 300, 'black', 12, 3))
+    assert isinstance(auto(i2c_bus=i2c, cache=cache), InkyWHAT)
+    assert i2c.reads == 1
+
+
+def test_auto_cache_opt_in(spidev, smbus2, PIL, tmpdir, monkeypatch):
+    """Test auto() writes nothing to the cache directory unless asked to."""
+    from inky import auto
+    from inky.eeprom import EPDType
+    from inky.emulator import EmulatedI2C
+
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir))
+    monkeypatch.setattr('inky.eeprom.read_eeprom', lambda i2c_bus=None: EPDType(400, 300, 'black', 12, 3))
+    auto()
+    assert tmpdir.listdir() == []
@@ -0,0 +1,79 @@
+"""Benchmark suite smoke tests for Inky."""
+import json
+import os
+import sys
+
+import pytest
+
+
+@pytest.fixture()
+def bench_drivers():
+    """Import benchmarks/bench_drivers.py."""
+    pytest.importorskip('PIL')
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks')
+    sys.path.insert(0, path)
+    import bench_drivers
+    yield bench_drivers
+    sys.path.remove(path)
+
+
+def test_benchmark_run(bench_drivers):
+    """Test a benchmark run reports time and SPI bytes, and restores time.sleep."""
+    import time
+    sleep = time.sleep
+
+    results = bench_drivers.run(repeat=1, name_filter='what 400x300 show')
+
+    assert time.sleep is sleep
+    assert [result['name'] for result in results] == ['what 400x300 show']
+    assert results[0]['median'] > 0
+    # Both 15000 byte planes plus the setup sequence, in cold mode the blank colour plane is rewritten every update
+    assert 30000 < results[0]['spi_bytes'] < 31000
+
+
+def test_benchmark_output(bench_drivers, tmpdir):
+    """Test results are saved as JSON with the environment they were run in."""
+    output = str(tmpdir.join('results.json'))
+
+    bench_drivers.main(['--repeat', '1', '--filter', 'phat 212x104 set_image', '--output', output])
+
+    with open(output) as f:
+        saved = json.load(f)
+
+    assert saved['environment']['inky']
+    assert saved['results'][0]['benchmark'] == 'set_image'
+
+
+@pytest.fixture()
+def bench_startup():
+    """Import benchmarks/bench_startup.py."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks')
+    sys.path.insert(0, path)
+    import bench_startup
+    yield bench_startup
+    sys.path.remove(path)
+
+
+def test_startup_benchmark(bench_startup):
+    """Test start up is measured in a new process, and a warm cache skips the EEPROM."""
+    results = dict((result['name'], result) for result in bench_startup.run(repeat=1))
+
+    assert results['no cache']['eeprom_reads'] == 1
+    assert results['cold cache']['eeprom_reads'] == 1
+    assert results['warm cache']['eeprom_reads'] == 0
+    assert results['warm cache']['driver'] == 'InkyWHAT'
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='-X importtime requires Python 3.7')
+def test_import_benchmark(bench_startup):
+    """Test no statement imports the heavy modules it's meant to defer."""
+    results = bench_startup.run_imports()
+
+    assert [result['name'] for result in results] == [statement for statement, _ in bench_startup.IMPORTS]
+    for result in results:
+        assert result['forbidden'] == [], result['name']
+        assert result['total'] > 0
+
+    modules = dict((result['name'], [name for name, _ in result['modules']]) for result in results)
+    assert 'numpy' not in modules['import inky']
+    assert 'numpy' in modules['from inky import InkyWHAT']
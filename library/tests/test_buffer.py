@@ -0,0 +1,139 @@
+"""Image and packed plane input tests for Inky."""
+import mock
+import numpy
+import pytest
+
+
+def test_set_image_in_place(spidev, smbus2, GPIO):
+    """Test arrays, memoryviews and "P" images are written into the existing buffer."""
+    from PIL import Image
+    from inky import InkyWHAT
+
+    inky = InkyWHAT('red')
+    buf = inky.buf
+    pixels = numpy.random.RandomState(0).randint(0, 3, buf.shape).astype(numpy.uint8)
+
+    inky.set_image(pixels)
+    assert inky.buf is buf and (buf == pixels).all()
+
+    inky.set_image(memoryview(pixels[::-1].tobytes()))
+    assert inky.buf is buf and (buf == pixels[::-1]).all()
+
+    inky.set_image(Image.fromarray(pixels, 'P'))
+    assert inky.buf is buf and buf.shape == (300, 400) and (buf == pixels).all()
+
+
+def test_set_image_1bit(spidev, smbus2, GPIO):
+    """Test "1" images are copied as black and white."""
+    from PIL import Image
+    from inky import InkyPHAT
+    from inky.inky_uc8159 import Inky
+
+    for inky in (InkyPHAT('black'), Inky()):
+        image = Image.new('1', inky.resolution, 1)
+        image.putpixel((3, 2), 0)
+        inky.set_image(image)
+
+        assert inky.buf[2][3] == inky.BLACK
+        assert (inky.buf == inky.WHITE).sum() == inky.buf.size - 1
+
+
+def test_set_image_invalid(spidev, smbus2, GPIO):
+    """Test images of the wrong size, mode or palette range raise a ValueError."""
+    from PIL import Image
+    from inky import InkyWHAT
+
+    inky = InkyWHAT('red')
+
+    with pytest.raises(ValueError):
+        inky.set_image(numpy.zeros((104, 212), dtype=numpy.uint8))
+    with pytest.raises(ValueError):
+        inky.set_image(Image.new('RGB', (400, 300)))
+    with pytest.raises(ValueError):
+        inky.set_image(numpy.full((300, 400), 3, dtype=numpy.uint8))
+    with pytest.raises(ValueError):
+        inky.set_image(numpy.full((300, 400), -1))
+
+
+def test_set_image_ssd1608_offset(spidev, smbus2, GPIO):
+    """Test the SSD1608 writes images into the visible region of its controller sized buffer."""
+    from PIL import Image
+    from inky.inky_ssd1608 import Inky
+
+    inky = Inky()
+    inky.buf[:] = inky.RED
+    image = Image.new('P', (250, 122), inky.BLACK)
+
+    inky.set_image(image)
+
+    assert (inky.buf[6:128] == inky.BLACK).all()
+    assert (inky.buf[:6] == inky.WHITE).all() and (inky.buf[128:] == inky.WHITE).all()
+
+
+@pytest.mark.parametrize('driver', ['what', 'ssd1608'])
+def test_set_packed(spidev, smbus2, GPIO, driver):
+    """Test pre-packed planes are sent as they are, until the buffer is set again."""
+    from inky import inky, inky_ssd1608
+
+    GPIO.input.return_value = GPIO.LOW
+    display = inky.Inky(resolution=(400, 300), colour='red') if driver == 'what' else inky_ssd1608.Inky()
+    display.buf[:] = numpy.random.RandomState(1).randint(0, 3, display.buf.shape)
+
+    with mock.patch.object(display, '_update') as update:
+        display.show()
+        plane_a, plane_b = [plane.copy() for plane in update.call_args[0][:2]]
+
+        display.buf[:] = display.WHITE
+        display.set_packed(plane_a.tobytes(), memoryview(plane_b.tobytes()))
+        display.show()
+        sent_a, sent_b = update.call_args[0][:2]
+        assert sent_a.tobytes() == plane_a.tobytes() and sent_b.tobytes() == plane_b.tobytes()
+
+        display.set_pixel(0, 0, display.WHITE)
+        display.show()
+        sent_a, sent_b = update.call_args[0][:2]
+        assert (sent_a == 0xff).all() and (sent_b == 0).all()
+
+    with pytest.raises(ValueError):
+        display.set_packed(b'\x00' * 10)
+
+
+def test_set_packed_7colour(spidev, smbus2, GPIO):
+    """Test pre-packed pixels skip the UC8159 buffer and match what show() packs."""
+    from inky.inky_uc8159 import Inky
+
+    inky = Inky()
+    inky.buf[:] = numpy.random.RandomState(2).randint(0, 8, inky.buf.shape)
+
+    with mock.patch.object(inky, '_update') as update:
+        inky.show()
+        packed = update.call_args[0][0].copy()
+
+        inky.buf[:] = 0
+        inky.set_packed(packed.tobytes())
+        inky.show()
+
+    assert update.call_args[0][0].tobytes() == packed.tobytes()
+
+
+@pytest.mark.parametrize('mock_class,kwargs', [
+    ('InkyMockPHAT', {'colour': 'red'}),
+    ('InkyMockPHAT', {'colour': 'red', 'h_flip': True}),
+    ('InkyMockImpression', {}),
+])
+def test_mock_set_packed(tkinter, PIL, mock_class, kwargs):
+    """Test the simulators unpack planes back into the buffer they were packed from."""
+    from inky import mock as inky_mock, packing
+
+    display = getattr(inky_mock, mock_class)(**kwargs)
+    colours = 8 if mock_class == 'InkyMockImpression' else 3
+    pixels = numpy.random.RandomState(3).randint(0, colours, display.buf.shape).astype(numpy.uint8)
+
+    if colours == 8:
+        packed = (packing.NibblePacker(pixels.shape, display.rotation, display.h_flip, display.v_flip).pack(pixels),)
+    else:
+        packer = packing.PlanePacker(pixels.shape, display.rotation, display.h_flip, display.v_flip)
+        packed = packer.pack(pixels)
+    display.set_packed(*packed)
+
+    assert (display.buf == pixels).all()
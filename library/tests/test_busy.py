@@ -0,0 +1,79 @@
+"""Busy signal tests for Inky."""
+import time
+
+import pytest
+
+
+def test_busy_wait_idle(GPIO_edges):
+    """Test waiting on an idle controller returns immediately."""
+    from inky.busy import BusyPin
+
+    busy = BusyPin(GPIO_edges, 17)
+
+    assert busy.edge_events
+    assert busy.wait(1.0)
+    assert GPIO_edges.input_calls == 1
+
+
+def test_busy_wait_edge(GPIO_edges):
+    """Test the release edge wakes the waiting thread without polling."""
+    from inky.busy import BusyPin
+
+    GPIO_edges.set_input(17, GPIO_edges.HIGH)
+    busy = BusyPin(GPIO_edges, 17)
+
+    timer = GPIO_edges.set_input_after(17, GPIO_edges.LOW, 0.2)
+    t_start = time.time()
+    assert busy.wait(5.0)
+    timer.join()
+
+    assert time.time() - t_start < 1.0
+    assert GPIO_edges.input_calls <= 3
+
+
+def test_busy_wait_active_low(GPIO_edges):
+    """Test a controller that holds busy low, like the UC8159, is released on a rising edge."""
+    from inky.busy import BusyPin
+
+    busy = BusyPin(GPIO_edges, 17, active_low=True)
+
+    assert busy.is_busy()
+    timer = GPIO_edges.set_input_after(17, GPIO_edges.HIGH, 0.1)
+    assert busy.wait(5.0)
+    timer.join()
+
+
+def test_busy_wait_timeout(GPIO_edges):
+    """Test wait returns False if busy is never released."""
+    from inky.busy import BusyPin
+
+    GPIO_edges.set_input(17, GPIO_edges.HIGH)
+    busy = BusyPin(GPIO_edges, 17)
+
+    assert not busy.wait(0.1)
+
+
+def test_busy_wait_poll_fallback(GPIO_edges):
+    """Test polling is used if edge detection is already claimed."""
+    from inky.busy import BusyPin
+
+    GPIO_edges.add_event_detect(17, GPIO_edges.BOTH)
+    GPIO_edges.set_input(17, GPIO_edges.HIGH)
+    busy = BusyPin(GPIO_edges, 17)
+
+    assert not busy.edge_events
+    timer = GPIO_edges.set_input_after(17, GPIO_edges.LOW, 0.1)
+    assert busy.wait(5.0)
+    timer.join()
+
+
+def test_busy_wait_timeout_what(spidev, smbus2, GPIO_edges):
+    """Test InkyWHAT raises a RuntimeError if busy is never released."""
+    from inky import InkyWHAT
+
+    inky = InkyWHAT('black')
+    inky.setup()
+
+    GPIO_edges.set_input(inky.busy_pin, GPIO_edges.HIGH)
+    with pytest.raises(RuntimeError):
+        inky._busy_wait(0.1)
@@ -0,0 +1,93 @@
+"""Frame cache tests for Inky."""
+import mock
+
+
+def test_frame_cache_persists(tmpdir):
+    """Test the last frame key and skip count survive a new FrameCache."""
+    from inky.cache import FrameCache, frame_key
+
+    path = str(tmpdir.join('inky.json'))
+    key = frame_key([b'\x00' * 16, b'\xff' * 16], 'red', 0)
+
+    frame_cache = FrameCache(path)
+    assert not frame_cache.check(key)
+    frame_cache.store(key)
+    assert frame_cache.check(key)
+
+    frame_cache = FrameCache(path)
+    assert frame_cache.key == key
+    assert frame_cache.skipped == 1
+    assert frame_cache.check(key)
+    assert frame_cache.skipped == 2
+
+
+def test_frame_cache_corrupt(tmpdir):
+    """Test a corrupt state file is ignored."""
+    from inky.cache import FrameCache
+
+    path = tmpdir.join('inky.json')
+    path.write('{not json')
+
+    frame_cache = FrameCache(str(path))
+    assert frame_cache.key is None
+    assert not frame_cache.check('abc')
+
+
+def test_frame_key_settings():
+    """Test the key changes with border colour and LUT."""
+    from inky.cache import frame_key
+
+    planes = [b'\x00' * 16, b'\xff' * 16]
+
+    assert frame_key(planes, 0, 'red') == frame_key(planes, 0, 'red')
+    assert frame_key(planes, 0, 'red') != frame_key(planes, 1, 'red')
+    assert frame_key(planes, 0, 'red') != frame_key(planes, 0, 'red_ht')
+
+
+def test_show_skips_unchanged_frame(spidev, smbus2, GPIO, tmpdir):
+    """Test show() skips unchanged frames across driver instances."""
+    from inky import InkyWHAT
+    from inky.cache import FrameCache
+
+    GPIO.input.return_value = GPIO.LOW
+    path = str(tmpdir.join('inky.json'))
+
+    inky = InkyWHAT('red')
+    inky.frame_cache = FrameCache(path)
+    inky._update = mock.Mock()
+
+    inky.show()
+    inky.show()
+    assert inky._update.call_count == 1
+
+    inky = InkyWHAT('red')
+    inky.frame_cache = FrameCache(path)
+    inky._update = mock.Mock()
+
+    inky.show()
+    assert inky._update.call_count == 0
+    assert inky.frame_cache.skipped == 2
+
+    inky.show(force=True)
+    assert inky._update.call_count == 1
+
+    inky.set_border(inky.BLACK)
+    inky.show()
+    assert inky._update.call_count == 2
+
+
+def test_show_skips_unchanged_frame_7colour(spidev, smbus2, GPIO):
+    """Test the 7-colour driver accepts an in-memory frame cache."""
+    from inky.inky_uc8159 import Inky
+    from inky.cache import FrameCache
+
+    inky = Inky(frame_cache=FrameCache())
+    inky._update = mock.Mock()
+
+    inky.show()
+    inky.show()
+    assert inky._update.call_count == 1
+
+    inky.set_pixel(0, 0, inky.RED)
+    inky.show()
+    assert inky._update.call_count == 2
@@ -0,0 +1,95 @@
+"""Bulk drawing tests for Inky."""
+import numpy
+import pytest
+
+
+def test_fill_rect_and_lines(spidev, smbus2, GPIO):
+    """Test rectangles and lines match set_pixel, clipped to the display."""
+    from inky import InkyWHAT
+
+    inky = InkyWHAT('red')
+    expected = numpy.zeros_like(inky.buf)
+
+    inky.fill_rect(390, -5, 20, 10, inky.RED)
+    expected[0:5, 390:400] = inky.RED
+    inky.hline(-10, 100, 30, inky.BLACK)
+    expected[100, 0:20] = inky.BLACK
+    inky.vline(50, 290, 30, inky.BLACK)
+    expected[290:300, 50] = inky.BLACK
+    inky.fill_rect(500, 0, 10, 10, inky.BLACK)
+    inky.hline(0, 0, 0, inky.BLACK)
+
+    assert (inky.buf == expected).all()
+
+
+def test_set_pixels(spidev, smbus2, GPIO):
+    """Test many pixels are set at once, with one or many colours, skipping points off the display."""
+    from inky import InkyPHAT
+
+    inky = InkyPHAT('red')
+    xs = numpy.array([0, 5, 211, 212, -1, 7])
+    ys = numpy.array([0, 6, 103, 0, 0, 8])
+
+    inky.set_pixels(xs, ys, inky.BLACK)
+    assert inky.buf[0, 0] == inky.buf[6, 5] == inky.buf[103, 211] == inky.BLACK
+    assert (inky.buf == inky.BLACK).sum() == 4
+
+    inky.set_pixels(xs, ys, [inky.RED, inky.WHITE, inky.RED, inky.RED, inky.RED, inky.WHITE])
+    assert inky.buf[0, 0] == inky.buf[103, 211] == inky.RED
+    assert inky.buf[6, 5] == inky.buf[8, 7] == inky.WHITE
+
+    inky.set_pixels(range(10), 50, inky.RED)
+    assert (inky.buf[50, :10] == inky.RED).all()
+
+
+def test_blit(spidev, smbus2, GPIO):
+    """Test a mask is drawn in a colour at an offset, clipped to the display."""
+    from inky.inky_uc8159 import Inky
+
+    inky = Inky()
+    inky.buf[:] = inky.WHITE
+    mask = numpy.zeros((4, 4), dtype=bool)
+    mask[1, 2] = mask[3, 3] = True
+
+    inky.blit(mask, inky.ORANGE, x=10, y=20)
+    inky.blit(mask, inky.GREEN, x=-3, y=-1)
+
+    assert inky.buf[21, 12] == inky.buf[23, 13] == inky.ORANGE
+    assert inky.buf[2, 0] == inky.GREEN
+    assert (inky.buf != inky.WHITE).sum() == 3
+
+
+def test_invalid_colour(spidev, smbus2, GPIO):
+    """Test drawing with a colour the display cannot show raises a ValueError, and draws nothing."""
+    from inky import InkyWHAT
+
+    inky = InkyWHAT('red')
+
+    for draw in (lambda: inky.fill_rect(0, 0, 10, 10, 3),
+                 lambda: inky.set_pixels([0, 1], [0, 1], [1, 5]),
+                 lambda: inky.blit(numpy.ones((2, 2)), -1)):
+        with pytest.raises(ValueError):
+            draw()
+
+    assert (inky.buf == 0).all()
+
+
+def test_draw_clears_packed(spidev, smbus2, GPIO):
+    """Test drawing replaces pre-packed planes set with set_packed."""
+    from inky import InkyPHAT
+
+    inky = InkyPHAT('black')
+    inky.set_packed(b'\xff' * inky._packer.plane_size)
+    inky.hline(0, 0, 10, inky.BLACK)
+
+    assert inky._packed is None
+
+
+def test_mock_draw(tkinter, PIL):
+    """Test the simulators support bulk drawing."""
+    from inky.mock import InkyMockImpression
+
+    inky = InkyMockImpression()
+    inky.fill_rect(0, 0, 600, 448, inky.CLEAN)
+
+    assert (inky.buf == inky.CLEAN).all()
@@ -27,3 +27,40 @@ def test_eeprom_7color_4_inch(spidev, smbus2_eeprom, PIL):
     inky = Inky()
 
     assert inky.resolution == (640, 400)
+
+
+def test_detection_cache(tmpdir):
+    """Test detection results are kept for the boot they were made in."""
+    from inky.eeprom import EPDType, DetectionCache
+
+    path = str(tmpdir.join('inky', 'eeprom.json'))
+    cache = DetectionCache(path, boot_id='boot-1')
+    assert cache.load() is None
+
+    cache.store(EPDType.from_bytes(EPDType(212, 104, 'red', 12, 1).encode()), 'InkyPHAT')
+    epd, driver = DetectionCache(path, boot_id='boot-1').load()
+    assert (epd.width, epd.height, epd.get_color(), epd.display_variant) == (212, 104, 'red', 1)
+    assert driver == 'InkyPHAT'
+
+    # A reboot may mean a different HAT
+    assert DetectionCache(path, boot_id='boot-2').load() is None
+
+    cache.store(None, None)
+    assert cache.load() == (None, None)
+
+    cache.clear()
+    assert cache.load() is None
+
+
+def test_detection_cache_corrupt(tmpdir):
+    """Test a corrupt or unwritable cache file is a miss, not an error."""
+    from inky.eeprom import EPDType, DetectionCache
+
+    path = tmpdir.join('eeprom.json')
+    path.write('{"validity": ')
+    cache = DetectionCache(str(path), boot_id='boot-1')
+    assert cache.load() is None
+
+    unwritable = DetectionCache(str(tmpdir.join('eeprom.json', 'eeprom.json')), boot_id='boot-1')
+    unwritable.store(EPDType(400, 300, 'black', 12, 3), 'InkyWHAT')
+    assert unwritable.load() is None
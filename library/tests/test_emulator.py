@@ -0,0 +1,153 @@
+"""Controller emulator tests for Inky."""
+import time
+import warnings
+
+import mock
+import numpy
+import pytest
+
+from tools import emulate
+
+
+def tricolour_displays():
+    """Return (driver, emulator, resolution) for each tri-colour display."""
+    from inky import emulator, inky, inky_ssd1608
+    return [
+        (inky.Inky, emulator.InkyEmulator, (400, 300)),
+        (inky.Inky, emulator.InkyEmulator, (212, 104)),
+        (inky_ssd1608.Inky, emulator.SSD1608Emulator, (250, 122)),
+    ]
+
+
+@pytest.mark.parametrize('index', range(3))
+@pytest.mark.parametrize('h_flip,v_flip', [(False, False), (True, False), (False, True)])
+def test_tricolour_image(index, h_flip, v_flip):
+    """Test the image decoded from controller RAM matches the display buffer."""
+    driver, emulator_class, resolution = tricolour_displays()[index]
+    display, panel = emulate(driver, emulator_class, resolution=resolution, colour='red', h_flip=h_flip, v_flip=v_flip)
+    display.buf[:] = numpy.random.RandomState(index).randint(0, 3, display.buf.shape)
+
+    with mock.patch('time.sleep'):
+        display.show()
+
+    assert panel.refreshes == 1
+    assert panel.errors == []
+    assert panel.border_colour == 'white'
+    assert (panel.image(display.rotation, display.h_flip, display.v_flip) == display.buf).all()
+
+
+@pytest.mark.parametrize('index', range(3))
+def test_tricolour_partial_update(index):
+    """Test a partial RAM write leaves the rest of the previous frame in place."""
+    driver, emulator_class, resolution = tricolour_displays()[index]
+    display, panel = emulate(driver, emulator_class, resolution=resolution, colour='red', partial_update=True)
+    display.buf[:] = numpy.random.RandomState(index).randint(0, 3, display.buf.shape)
+
+    with mock.patch('time.sleep'):
+        display.show()
+        full = panel.bytes_to_ram
+
+        display.buf[10:20, 30:40] = display.RED
+        display.show()
+
+    assert panel.bytes_to_ram - full < full // 10
+    assert (panel.image(display.rotation, display.h_flip, display.v_flip) == display.buf).all()
+
+
+def test_7colour_image():
+    """Test the UC8159 image and border match the driver."""
+    from inky import emulator, inky_uc8159
+
+    display, panel = emulate(inky_uc8159.Inky, emulator.UC8159Emulator, resolution=(640, 400), colour='multi')
+    display.buf[:] = numpy.random.RandomState(0).randint(0, 8, display.buf.shape)
+    display.set_border(display.GREEN)
+
+    with mock.patch('time.sleep'), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        display.show()
+
+    assert panel.errors == []
+    assert panel.border_colour == display.GREEN
+    assert not panel.powered
+    assert (panel.image() == display.buf).all()
+
+
+def test_what_deep_sleep():
+    """Test the default mode deep sleeps after each update, and is reset before the next."""
+    from inky import emulator, inky
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, resolution=(400, 300), colour='black')
+
+    with mock.patch('time.sleep'):
+        display.show()
+        assert panel.asleep
+        display.show()
+
+    assert panel.resets == 2
+    assert panel.errors == []
+
+
+def test_what_warm_wake():
+    """Test warm_wake updates are not reset and never send commands to a sleeping controller."""
+    from inky import emulator, inky
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, resolution=(400, 300), colour='black', warm_wake=True)
+
+    with mock.patch('time.sleep'):
+        display.show()
+        display.show()
+        assert panel.resets == 1
+        assert not panel.asleep
+
+        display.sleep()
+        display.show()
+
+    assert panel.resets == 2
+    assert panel.refreshes == 3
+    assert panel.errors == []
+
+
+def test_command_during_sleep():
+    """Test commands sent during deep sleep are reported."""
+    from inky import emulator, inky
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, resolution=(400, 300), colour='black')
+
+    with mock.patch('time.sleep'):
+        display.show()
+    display._send_command(0x20)
+
+    assert panel.refreshes == 1
+    assert panel.errors == ['Command 0x20 sent during deep sleep']
+
+    panel.strict = True
+    with pytest.raises(RuntimeError):
+        display._send_command(0x20)
+
+
+def test_busy_timing():
+    """Test the busy signal is held for the emulated refresh time."""
+    from inky import emulator, inky
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, resolution=(212, 104), colour='black')
+    panel.time_scale = 1.0
+    panel.busy_times['refresh'] = 0.2
+
+    with mock.patch('time.sleep'):
+        display.show(busy_wait=False)
+    assert panel.busy()
+
+    t_start = time.time()
+    display._busy_wait(1.0)
+    assert 0.0 < time.time() - t_start < 0.5
+    assert not panel.busy()
+
+
+def test_eeprom():
+    """Test the emulated EEPROM is read by the driver."""
+    from inky import emulator, eeprom, inky_uc8159
+
+    panel = emulator.UC8159Emulator(640, 400, time_scale=0, eeprom=eeprom.EPDType(640, 400, '7colour', 12, 16))
+    display = inky_uc8159.Inky(spi_bus=panel.spi, gpio=panel.gpio, i2c_bus=panel.i2c)
+
+    assert display.resolution == (640, 400)
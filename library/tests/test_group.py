@@ -0,0 +1,101 @@
+"""Display group tests for Inky."""
+import threading
+import time
+
+import pytest
+
+
+def emulated_whats(count, refresh=0.3):
+    """Return `count` wHAT drivers on separate pins, each driving its own emulated panel."""
+    from inky import emulator, inky
+
+    displays, panels = [], []
+    for index in range(count):
+        pins = {'reset_pin': 27 - index, 'busy_pin': 17 - index}
+        panel = emulator.InkyEmulator(400, 300, busy_times={'refresh': refresh}, **pins)
+        displays.append(inky.Inky(resolution=(400, 300), colour='black', cs_channel=index,
+                                  spi_bus=panel.spi, gpio=panel.gpio, i2c_bus=panel.i2c, **pins))
+        panels.append(panel)
+    return displays, panels
+
+
+def test_group_refreshes_concurrently():
+    """Test three displays refresh in about the time of one."""
+    from inky.group import DisplayGroup
+
+    displays, panels = emulated_whats(3)
+
+    t_start = time.time()
+    displays[0].show()
+    single = time.time() - t_start
+
+    group = DisplayGroup(displays)
+    t_start = time.time()
+    group.show()
+    both = time.time() - t_start
+
+    assert both < single * 1.8
+    assert [panel.refreshes for panel in panels] == [2, 1, 1]
+    assert all(panel.errors == [] for panel in panels)
+
+
+def test_group_shares_lock():
+    """Test every display's SPI transfers and GPIO calls take the group lock."""
+    from inky.group import DisplayGroup, LockedGPIO
+
+    displays, panels = emulated_whats(2)
+    group = DisplayGroup(displays)
+
+    assert len(group) == 2
+    for display in group:
+        assert display._bus_lock is group.lock
+        assert isinstance(display._gpio, LockedGPIO)
+        assert display._gpio.OUT == panels[0].gpio.OUT
+
+    # GPIO calls from another thread wait while the lock is held
+    calls = []
+    with group.lock:
+        thread = threading.Thread(target=lambda: calls.append(displays[1]._gpio.input(displays[1].busy_pin)))
+        thread.start()
+        thread.join(0.1)
+        assert calls == []
+    thread.join()
+    assert len(calls) == 1
+
+
+def test_group_shared_pins():
+    """Test displays sharing a busy or reset pin, or chip-select, are rejected."""
+    from inky.group import DisplayGroup
+
+    displays, panels = emulated_whats(2)
+    displays[1].busy_pin = displays[0].busy_pin
+
+    with pytest.raises(ValueError):
+        DisplayGroup(displays)
+
+    displays, panels = emulated_whats(2)
+    displays[1].cs_channel = displays[0].cs_channel
+
+    with pytest.raises(ValueError):
+        DisplayGroup(displays)
+
+    with pytest.raises(ValueError):
+        DisplayGroup([])
+
+
+def test_group_error():
+    """Test an error updating one display is raised once the others have finished."""
+    from inky.group import DisplayGroup
+
+    displays, panels = emulated_whats(2, refresh=0.0)
+    group = DisplayGroup(displays)
+
+    def fail(busy_wait=True, force=False):
+        raise RuntimeError('Timed out')
+
+    displays[0].show = fail
+
+    with pytest.raises(RuntimeError):
+        group.show()
+
+    assert panels[1].refreshes == 1
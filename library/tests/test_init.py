@@ -156,3 +156,35 @@ def test_init_7colour_setup(spidev, smbus2, GPIO):
 
     # Check API will been opened
     spidev.SpiDev().open.assert_called_with(0, inky.cs_channel)
+
+
+def test_lazy_names():
+    """Test public names resolve on first use and are listed before they're imported."""
+    import sys
+    import inky
+
+    assert 'InkyWHAT' in dir(inky)
+    assert inky.InkyWHAT is inky.what.InkyWHAT
+    assert inky.Inky7Colour is inky.inky_uc8159.Inky
+    assert inky.BLACK == inky.inky.BLACK
+    assert callable(inky.auto)
+
+    with pytest.raises(AttributeError):
+        inky.InkyOctarine
+
+    # A fresh import, with no driver module imported yet
+    with mock.patch.dict(sys.modules):
+        for name in [name for name in sys.modules if name == 'inky' or name.startswith('inky.')]:
+            del sys.modules[name]
+
+        namespace = {}
+        exec('from inky import *', namespace)
+        fresh = sys.modules['inky']
+
+        for name in ('phat', 'what', 'mock', 'inky_uc8159', 'inky_ssd1608'):
+            assert getattr(fresh, name) is sys.modules['inky.' + name]
+
+    for name in ('InkyPHAT', 'InkyPHAT_SSD1608', 'InkyWHAT', 'InkyMockPHAT', 'InkyMockWHAT', 'Inky7Colour', 'BLACK', 'auto', 'phat'):
+        assert name in namespace
+    assert namespace['InkyPHAT'] is namespace['phat'].InkyPHAT
+    assert 'sys' not in namespace and 'importlib' not in namespace
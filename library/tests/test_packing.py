@@ -0,0 +1,132 @@
+"""Bit-plane packing tests for Inky."""
+import pytest
+
+
+def reference_planes(region, rotation, h_flip, v_flip):
+    """Pack planes the way show() did before PlanePacker."""
+    import numpy
+
+    if v_flip:
+        region = numpy.fliplr(region)
+
+    if h_flip:
+        region = numpy.flipud(region)
+
+    if rotation:
+        region = numpy.rot90(region, rotation // 90)
+
+    buf_a = numpy.packbits(numpy.where(region == 1, 0, 1))
+    buf_b = numpy.packbits(numpy.where(region == 2, 1, 0))
+    return buf_a, buf_b
+
+
+def driver_configs():
+    """Yield (buffer shape, rotation) for every supported tri-colour resolution."""
+    from inky import inky, inky_ssd1608
+
+    for (width, height), (cols, rows, rotation) in inky._RESOLUTION.items():
+        yield (height, width), rotation
+    for (width, height), (cols, rows, rotation, offset_x, offset_y) in inky_ssd1608._RESOLUTION.items():
+        yield (cols, rows), rotation
+
+
+@pytest.mark.parametrize('v_flip', [False, True])
+@pytest.mark.parametrize('h_flip', [False, True])
+def test_packer_matches_reference(h_flip, v_flip):
+    """Test PlanePacker output matches numpy.where/packbits for every resolution."""
+    import numpy
+    from inky.packing import PlanePacker
+
+    rng = numpy.random.RandomState(0)
+
+    for shape, rotation in driver_configs():
+        packer = PlanePacker(shape, rotation, h_flip, v_flip)
+        buf = rng.randint(0, 4, size=shape).astype(numpy.uint8)
+
+        buf_a, buf_b = packer.pack(buf)
+        ref_a, ref_b = reference_planes(buf, rotation, h_flip, v_flip)
+
+        assert buf_a.tobytes() == ref_a.tobytes()
+        assert buf_b.tobytes() == ref_b.tobytes()
+
+
+def test_packer_reuses_buffers():
+    """Test packing writes into the same output buffers on every frame."""
+    import numpy
+    from inky.packing import PlanePacker
+
+    buf = numpy.zeros((300, 400), dtype=numpy.uint8)
+    packer = PlanePacker(buf.shape)
+
+    first_a, first_b = packer.pack(buf)
+    buf[:] = 2
+    second_a, second_b = packer.pack(buf)
+
+    assert first_a is second_a and first_b is second_b
+    assert second_a.flags['C_CONTIGUOUS'] and second_b.flags['C_CONTIGUOUS']
+    assert (second_b == 0xff).all()
+
+
+def test_packer_invalid_shape():
+    """Test packing a buffer of the wrong shape raises a ValueError."""
+    import numpy
+    from inky.packing import PlanePacker
+
+    packer = PlanePacker((300, 400))
+
+    with pytest.raises(ValueError):
+        packer.pack(numpy.zeros((104, 212), dtype=numpy.uint8))
+
+
+@pytest.mark.parametrize('rotation', [0, 90, -90, 180, 270])
+def test_orientation_matches_reference(rotation):
+    """Test a single strided view matches numpy's flips and rotation applied in turn."""
+    import numpy
+    from inky.packing import Orientation
+
+    region = numpy.arange(35).reshape((5, 7))
+
+    for h_flip in (False, True):
+        for v_flip in (False, True):
+            reference = region
+            if v_flip:
+                reference = numpy.fliplr(reference)
+            if h_flip:
+                reference = numpy.flipud(reference)
+            reference = numpy.rot90(reference, rotation // 90)
+
+            orientation = Orientation(rotation, h_flip, v_flip)
+            view = orientation.view(region)
+
+            assert orientation.shape(region.shape) == reference.shape
+            assert numpy.shares_memory(view, region)
+            assert (view == reference).all()
+            assert (orientation.rot90(1).flipud().view(region) == numpy.flipud(numpy.rot90(reference))).all()
+
+
+@pytest.mark.parametrize('v_flip', [False, True])
+@pytest.mark.parametrize('h_flip', [False, True])
+def test_nibble_packer_matches_reference(h_flip, v_flip):
+    """Test NibblePacker output matches flattening and packing pairs of pixels."""
+    import numpy
+    from inky.packing import NibblePacker
+
+    buf = numpy.random.RandomState(0).randint(0, 8, size=(448, 600)).astype(numpy.uint8)
+    region = buf
+    if v_flip:
+        region = numpy.fliplr(region)
+    if h_flip:
+        region = numpy.flipud(region)
+    region = region.flatten()
+
+    packer = NibblePacker(buf.shape, 0, h_flip, v_flip)
+    packed = packer.pack(buf)
+
+    assert packed.tobytes() == (((region[::2] << 4) & 0xF0) | (region[1::2] & 0x0F)).tobytes()
+    assert packer.pack(buf) is packed
+
+    # Packing in two halves gives the same result
+    expected = packed.copy()
+    packed[:] = 0
+    packer.transform(buf)
+    assert (packer.pack_bits() == expected).all()
@@ -0,0 +1,84 @@
+"""Partial RAM update tests for Inky."""
+import mock
+
+from tools import record_commands
+
+
+def ram_writes(commands, *ram_commands):
+    """Return the data sent with each of the given RAM write commands."""
+    return [data for command, data in commands if command in ram_commands]
+
+
+def test_partial_update_what(spidev, smbus2, GPIO):
+    """Test only the changed bounding box is written on the second frame."""
+    from inky import InkyWHAT
+
+    GPIO.input.return_value = GPIO.LOW
+
+    inky = InkyWHAT('red')
+    inky.partial_update = True
+    commands = record_commands(inky)
+
+    with mock.patch('time.sleep'):
+        inky.show()
+        assert [len(data) for data in ram_writes(commands, 0x24, 0x26)] == [15000, 15000]
+
+        del commands[:]
+        inky.buf[10:20, 16:40] = inky.RED
+        inky.show()
+
+    assert (0x44, bytes(bytearray([2, 4]))) in commands
+    assert (0x45, bytes(bytearray([10, 0, 19, 0]))) in commands
+    assert [len(data) for data in ram_writes(commands, 0x24, 0x26)] == [30, 30]
+    assert ram_writes(commands, 0x26)[0] == b'\xff' * 30
+
+    del commands[:]
+    with mock.patch('time.sleep'):
+        inky.show()
+
+    assert ram_writes(commands, 0x24, 0x26) == []
+
+
+def test_partial_update_disabled_what(spidev, smbus2, GPIO):
+    """Test full frames are written when partial updates are disabled."""
+    from inky import InkyWHAT
+
+    GPIO.input.return_value = GPIO.LOW
+
+    inky = InkyWHAT('black')
+    commands = record_commands(inky)
+
+    with mock.patch('time.sleep'):
+        inky.show()
+        inky.show()
+
+    # In cold mode another process may have written controller RAM, so the blank colour plane is rewritten too
+    assert [len(data) for data in ram_writes(commands, 0x24, 0x26)] == [15000] * 4
+
+
+def test_partial_update_ssd1608(spidev, smbus2, GPIO):
+    """Test the SSD1608 RAM window and counters follow the changed region."""
+    from inky import InkyPHAT_SSD1608
+    from inky import ssd1608
+
+    GPIO.input.return_value = GPIO.LOW
+
+    inky = InkyPHAT_SSD1608('black')
+    inky.partial_update = True
+    commands = record_commands(inky)
+
+    with mock.patch('time.sleep'):
+        inky.show()
+        del commands[:]
+        inky.buf[0, 0] = inky.BLACK
+        inky.show()
+
+    window = [data for command, data in commands if command in (ssd1608.SET_RAMXPOS, ssd1608.SET_RAMYPOS)]
+    counters = [data for command, data in commands if command in (ssd1608.SET_RAMXCOUNT, ssd1608.SET_RAMYCOUNT)]
+    writes = ram_writes(commands, ssd1608.WRITE_RAM, ssd1608.WRITE_ALTRAM)
+
+    # Pixel (0, 0) is rotated into the last bit of the first RAM row
+    assert window == [b'\x10\x10', b'\x00\x00\x00\x00']
+    assert counters == [b'\x10', b'\x00\x00']
+    # Colour RAM already holds the blank colour plane
+    assert writes == [b'\xfe']
@@ -0,0 +1,77 @@
+"""Compiled command program tests for Inky."""
+
+
+def record(writes):
+    """Return a stand-in for _spi_write that records (dc, bytes)."""
+    def spi_write(dc, values):
+        writes.append((dc, bytes(values)))
+    return spi_write
+
+
+def test_program_stream():
+    """Test commands and data are written with the right data/command level."""
+    from inky.program import CommandProgram
+
+    writes = []
+    compiled = CommandProgram([(0x12, None), (0x20, None), (0x01, [0x2b, 0x01, 0x00]), (0x11, 0x03)])
+
+    assert compiled.run(record(writes)) == 8
+    assert len(compiled) == 8
+    assert writes == [
+        (0, b'\x12\x20\x01'),
+        (1, b'\x2b\x01\x00'),
+        (0, b'\x11'),
+        (1, b'\x03'),
+    ]
+
+
+def test_program_register_dedupe():
+    """Test a register written twice is compiled to a single write of its last value."""
+    from inky.program import CommandProgram
+
+    writes = []
+    compiled = CommandProgram([(0x3c, 0x00), (0x04, 0x41), (0x3c, 0x31)], registers=(0x3c, 0x04))
+    compiled.run(record(writes))
+
+    assert writes == [(0, b'\x04'), (1, b'\x41'), (0, b'\x3c'), (1, b'\x31')]
+
+
+def test_program_skips_unchanged_registers():
+    """Test registers the controller already holds are skipped, and actions never are."""
+    from inky.program import CommandProgram
+
+    state = {}
+    lut = list(range(70))
+    compiled = CommandProgram([(0x32, lut), (0x22, 0xc7), (0x20, None)], registers=(0x32, 0x22))
+
+    writes = []
+    compiled.run(record(writes), state)
+    assert len(writes) == 5
+    assert state[0x32] == bytes(bytearray(lut))
+
+    writes = []
+    compiled.run(record(writes), state)
+    assert writes == [(0, b'\x20')]
+
+    state.clear()
+    writes = []
+    compiled.run(record(writes), state)
+    assert len(writes) == 5
+
+
+def test_update_reuses_program(spidev, smbus2, GPIO):
+    """Test the setup program is compiled once per configuration."""
+    import mock
+    from inky import InkyWHAT
+
+    GPIO.input.return_value = GPIO.LOW
+
+    inky = InkyWHAT('red')
+    with mock.patch('time.sleep'):
+        inky.show()
+        inky.show()
+        assert len(inky._programs) == 1
+
+        inky.set_border(inky.RED)
+        inky.show()
+        assert len(inky._programs) == 2
@@ -0,0 +1,95 @@
+"""Palette quantisation tests for Inky Impression."""
+import numpy
+import pytest
+
+
+def old_palette_blend(saturation):
+    """Return the palette as built by the original per-colour loop."""
+    from inky.inky_uc8159 import SATURATED_PALETTE, DESATURATED_PALETTE
+
+    palette = []
+    for i in range(7):
+        rs, gs, bs = [c * saturation for c in SATURATED_PALETTE[i]]
+        rd, gd, bd = [c * (1.0 - saturation) for c in DESATURATED_PALETTE[i]]
+        palette += [int(rs + rd), int(gs + gd), int(bs + bd)]
+    return palette + [255, 255, 255]
+
+
+@pytest.mark.parametrize('saturation', [0.0, 0.25, 0.5, 0.9, 1.0])
+def test_palette_blend(spidev, smbus2, GPIO, saturation):
+    """Test the blended palette matches the original loop exactly."""
+    from inky.inky_uc8159 import Inky
+
+    inky = Inky()
+
+    assert inky._palette_blend(saturation) == old_palette_blend(saturation)
+
+
+def test_palette_cached():
+    """Test palettes are reused per saturation and cannot be modified."""
+    from inky.inky_uc8159 import _QUANTIZER
+
+    palette = _QUANTIZER.palette(0.5)
+
+    assert _QUANTIZER.palette(0.5) is palette
+    assert palette.shape == (8, 3)
+    with pytest.raises(ValueError):
+        palette[0, 0] = 1
+
+
+@pytest.mark.parametrize('saturation', [0.0, 0.5, 1.0])
+def test_exact_colours(saturation):
+    """Test an image using only panel colours maps straight to palette indexes."""
+    from inky.inky_uc8159 import _QUANTIZER, DESATURATED_PALETTE
+
+    expected = numpy.random.RandomState(0).randint(0, 7, (48, 64)).astype(numpy.uint8)
+    for palette in (_QUANTIZER.palette(saturation), numpy.array(DESATURATED_PALETTE, dtype=numpy.uint8)):
+        rgb = palette[expected]
+        assert (_QUANTIZER.match(rgb, saturation) == expected).all()
+        for dither in ('none', 'bayer', 'floyd-steinberg'):
+            assert (_QUANTIZER.quantize(rgb, saturation, dither) == expected).all()
+
+
+@pytest.mark.parametrize('dither', ['none', 'bayer', 'floyd-steinberg'])
+def test_dither_modes(dither):
+    """Test each dither mode returns one displayable index per pixel."""
+    from PIL import Image
+    from inky.inky_uc8159 import _QUANTIZER
+
+    rgb = numpy.random.RandomState(1).randint(0, 256, (48, 64, 3)).astype(numpy.uint8)
+    indexes = _QUANTIZER.quantize(Image.fromarray(rgb, 'RGB'), 0.5, dither)
+
+    assert indexes.shape == (48, 64)
+    assert indexes.max() < 7
+    assert _QUANTIZER.match(rgb, 0.5) is None
+
+
+def test_nearest():
+    """Test the numpy nearest colour match agrees with PIL without dithering."""
+    from inky.inky_uc8159 import _QUANTIZER
+
+    rgb = numpy.random.RandomState(2).randint(0, 256, (48, 64, 3)).astype(numpy.uint8)
+    distances = ((rgb[:, :, numpy.newaxis, :].astype(numpy.int32) - _QUANTIZER.palette(0.5)[:7].astype(numpy.int32)) ** 2).sum(axis=3)
+
+    assert (_QUANTIZER.nearest(rgb, 0.5) == distances.argmin(axis=2)).all()
+
+
+def test_invalid_dither():
+    """Test an unsupported dither mode raises a ValueError."""
+    from inky.inky_uc8159 import _QUANTIZER
+
+    with pytest.raises(ValueError):
+        _QUANTIZER.quantize(numpy.zeros((4, 4, 3), dtype=numpy.uint8), dither='atkinson')
+
+
+def test_set_image_dither(spidev, smbus2, GPIO):
+    """Test the UC8159 driver quantises images with the chosen dither mode."""
+    from PIL import Image
+    from inky.inky_uc8159 import Inky
+
+    inky = Inky()
+    rgb = numpy.random.RandomState(3).randint(0, 256, (inky.height, inky.width, 3)).astype(numpy.uint8)
+    inky.set_image(Image.fromarray(rgb, 'RGB'), dither='bayer')
+
+    assert inky.buf.shape == (inky.rows, inky.cols)
+    assert inky.buf.max() < 7
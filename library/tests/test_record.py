@@ -0,0 +1,221 @@
+"""Frame recorder and replay tests for Inky."""
+import warnings
+
+import mock
+import numpy
+import pytest
+
+from tools import emulate
+
+
+def test_delta_roundtrip():
+    """Test deltas rebuild the plane they were encoded from, and unchanged planes cost nothing."""
+    from inky.record import encode_delta, apply_delta
+
+    previous = numpy.random.randint(0, 256, 1000).astype(numpy.uint8)
+    current = previous.copy()
+    current[10:20] ^= 0xFF
+    current[25] ^= 0x01
+    current[900] ^= 0x80
+
+    assert encode_delta(previous, previous) == b''
+
+    # Runs 5 bytes apart are merged, the run 875 bytes on isn't
+    delta = encode_delta(current, previous)
+    assert len(delta) == 2 * 8 + 16 + 1
+
+    assert (apply_delta(previous.copy(), delta) == current).all()
+    assert (apply_delta(numpy.zeros(1000, dtype=numpy.uint8), encode_delta(current)) == current).all()
+
+    with pytest.raises(ValueError):
+        apply_delta(numpy.zeros(100, dtype=numpy.uint8), delta)
+
+    # Too short for a run header
+    with pytest.raises(ValueError):
+        apply_delta(numpy.zeros(1000, dtype=numpy.uint8), delta[:5])
+
+
+def test_max_delta_size():
+    """Test no plane encodes larger than the bound receivers allocate for."""
+    from inky.record import encode_delta, max_delta_size
+
+    # Single changed bytes just far enough apart not to be merged
+    for size in (1, 9, 10, 100, 1000):
+        plane = numpy.zeros(size, dtype=numpy.uint8)
+        plane[::9] = 1
+        assert len(encode_delta(plane)) <= max_delta_size(size)
+        assert len(encode_delta(numpy.ones(size, dtype=numpy.uint8))) <= max_delta_size(size)
+
+
+def test_record_emulated(tmpdir):
+    """Test an emulated wHAT's frames are archived as the planes it sent, and read back out of order."""
+    from inky import emulator, inky, timing
+    from inky.record import Recorder, Archive
+
+    path = str(tmpdir.join('frames.inkrec'))
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, (400, 300), timings=timing.Timings())
+    display.recorder = Recorder(path, keyframe_interval=3)
+
+    images = []
+    with mock.patch('time.sleep'):
+        for i in range(5):
+            display.fill_rect(i * 10, 0, 10, 10, display.RED if i % 2 else display.BLACK)
+            display.set_border(display.BLACK if i == 4 else display.WHITE)
+            display.show()
+            images.append(panel.image(display.rotation).copy())
+    display.recorder.close()
+
+    with Archive(path) as archive:
+        assert len(archive) == 5
+        assert archive.info['controller'] == 'ssd1675'
+        assert archive.info['resolution'] == [400, 300]
+        assert [archive.header(i)['key'] for i in range(5)] == [True, False, False, True, False]
+
+        for index in (4, 1, 2, 0, 3):
+            frame = archive[index]
+            display.set_packed(*frame.planes)
+            display.show()
+            assert (panel.image(display.rotation) == images[index]).all()
+
+        frame = archive[-1]
+        assert frame.border == display.BLACK
+        assert frame.lut == 'red'
+        assert 'spi' in frame.phases
+
+        with pytest.raises(IndexError):
+            archive[5]
+
+    # Later frames are deltas, smaller than the whole frame
+    assert display.recorder.bytes_written < 5 * 2 * 15000
+
+
+def test_record_append(tmpdir):
+    """Test reopening an archive appends to it, from the same kind of display only."""
+    from inky.mock import InkyMockPHAT, InkyMockWHAT
+    from inky.record import Recorder, Archive
+
+    path = str(tmpdir.join('frames.inkrec'))
+    for _ in range(2):
+        display = InkyMockPHAT('red', headless=True)
+        with Recorder(path) as display.recorder:
+            display.show()
+            display.set_pixel(0, 0, display.RED)
+            display.show()
+
+    with Archive(path) as archive:
+        assert len(archive) == 4
+        assert [archive.header(i)['key'] for i in range(4)] == [True, False, True, False]
+        assert archive.info['driver'] == 'inky.mock.InkyMockPHAT'
+
+    display = InkyMockWHAT('red', headless=True)
+    display.recorder = Recorder(path)
+    with pytest.raises(ValueError):
+        display.show()
+
+
+def test_record_torn_frame(tmpdir):
+    """Test a frame cut short by a recorder stopped mid write is dropped, and not appended after."""
+    import os
+    from inky.mock import InkyMockPHAT
+    from inky.record import Recorder, Archive
+
+    path = str(tmpdir.join('frames.inkrec'))
+    display = InkyMockPHAT('red', headless=True)
+    with Recorder(path) as display.recorder:
+        for i in range(3):
+            display.set_pixel(i, 0, display.RED)
+            display.show()
+
+    with open(path, 'rb+') as f:
+        f.truncate(os.path.getsize(path) - 5)
+
+    with Archive(path) as archive:
+        assert len(archive) == 2
+        assert archive[-1].planes[1].any()
+
+    with Recorder(path) as display.recorder:
+        display.show()
+
+    with Archive(path) as archive:
+        assert len(archive) == 3
+        frames = list(archive)
+        assert [archive.header(i)['key'] for i in range(3)] == [True, False, True]
+        assert (frames[-1].planes[0] == display._pack(display.buf)[0]).all()
+
+
+def test_archive_not_archive(tmpdir):
+    """Test other files are rejected."""
+    from inky.record import Archive
+
+    path = tmpdir.join('frames.inkrec')
+    path.write('not frames')
+    with pytest.raises(ValueError):
+        Archive(str(path))
+
+
+@pytest.mark.parametrize('mock_class', ['InkyMockPHATSSD1608', 'InkyMockImpression'])
+def test_replay_emulated(tmpdir, mock_class):
+    """Test frames recorded from a simulator replay on the emulated controller it simulates."""
+    from inky import mock as inky_mock
+    from inky.record import Recorder, Archive, replay, _emulated_display
+
+    path = str(tmpdir.join('frames.inkrec'))
+    if mock_class == 'InkyMockImpression':
+        simulator = inky_mock.InkyMockImpression(headless=True)
+    else:
+        simulator = inky_mock.InkyMockPHATSSD1608('red', headless=True)
+    simulator.recorder = Recorder(path)
+    for i in range(3):
+        simulator.set_pixel(i, i, simulator.RED)
+        simulator.show()
+    simulator.recorder.close()
+
+    with Archive(path) as archive, mock.patch('time.sleep'), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        display, panel = _emulated_display(archive.info)
+        result = replay(archive, display, speed=None)
+
+    assert result['frames'] == 3
+    assert panel.errors == []
+    image = panel.image(display.rotation)
+    if mock_class == 'InkyMockPHATSSD1608':
+        image = image[display.offset_y:display.offset_y + display.height]
+    assert (image == simulator.buf).all()
+
+
+def test_replay_speed():
+    """Test replay keeps the recorded intervals, scaled by speed."""
+    from inky.clock import VirtualClock
+    from inky.record import Frame, replay
+
+    planes = (numpy.zeros(4, dtype=numpy.uint8), numpy.zeros(4, dtype=numpy.uint8))
+    frames = [Frame(i, 100.0 + t, 0, 'red', {}, planes) for i, t in enumerate((0.0, 10.0, 30.0))]
+    display = mock.Mock()
+
+    clock = VirtualClock()
+    result = replay(frames, display, speed=2.0, clock=clock)
+    assert result['frames'] == 3
+    assert result['seconds'] == 15.0
+    assert display.show.call_count == 3
+    display.show.assert_called_with(force=True)
+
+    clock = VirtualClock()
+    assert replay(frames, display, speed=0, clock=clock)['seconds'] == 0.0
+
+
+def test_record_cli(tmpdir, capsys):
+    """Test the command line summarises and replays an archive."""
+    from inky.mock import InkyMockWHAT
+    from inky.record import Recorder, main
+
+    path = str(tmpdir.join('frames.inkrec'))
+    display = InkyMockWHAT('black', headless=True)
+    with Recorder(path) as display.recorder:
+        display.show()
+
+    assert main(['info', path]) == 0
+    assert '1 frames' in capsys.readouterr().out
+
+    with mock.patch('time.sleep'):
+        assert main(['replay', path, '--speed', '0']) == 0
+    assert 'Replayed 1 frames' in capsys.readouterr().out
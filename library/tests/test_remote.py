@@ -0,0 +1,232 @@
+"""Remote display tests for Inky."""
+import socket
+import threading
+import warnings
+
+import mock
+import numpy
+import pytest
+
+from tools import emulate
+
+
+def receive(display):
+    """Return a receiver for `display` and a sender connected to it over a socketpair."""
+    from inky import remote
+
+    receiver = remote.Receiver(display)
+    server, client = socket.socketpair()
+    thread = threading.Thread(target=receiver.handle, args=(server,))
+    thread.daemon = True
+    thread.start()
+    sender = remote.Sender(client)
+    sender.hello()
+    return receiver, sender
+
+
+def test_remote_what():
+    """Test frames rendered on a simulator are shown on an emulated wHAT, with only changes sent."""
+    from inky import emulator, inky
+    from inky.mock import InkyMockWHAT
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, (400, 300))
+    canvas = InkyMockWHAT('red', headless=True)
+
+    with mock.patch('time.sleep'):
+        receiver, sender = receive(display)
+        assert sender.info['controller'] == 'ssd1675'
+        assert sender.info['planes'] == [15000, 15000]
+
+        canvas.fill_rect(0, 0, 100, 100, canvas.RED)
+        canvas.set_border(canvas.BLACK)
+        reply = sender.send(canvas)
+        assert reply['status'] == 'shown'
+        assert (panel.image(display.rotation) == canvas.buf).all()
+        assert display.border_colour == display.BLACK
+
+        canvas.set_pixel(200, 200, canvas.BLACK)
+        reply = sender.send(canvas)
+        sender.close()
+
+    assert reply['status'] == 'shown' and reply['seq'] == 2
+    assert (panel.image(display.rotation) == canvas.buf).all()
+    # One changed byte in one plane
+    assert reply['raw_bytes'] == 30000
+    assert reply['bytes'] < 300
+    assert reply['decode'] >= 0 and reply['update'] >= 0
+    assert sender.bytes_sent < 30000
+    assert receiver.frames == 2
+    assert panel.errors == []
+
+
+def test_remote_uc8159():
+    """Test the 7-colour display's single plane of packed pixels."""
+    from inky import emulator, inky_uc8159
+    from inky.mock import InkyMockImpression
+
+    display, panel = emulate(inky_uc8159.Inky, emulator.UC8159Emulator, (600, 448), colour='multi')
+    canvas = InkyMockImpression(headless=True)
+    canvas.fill_rect(10, 10, 50, 50, canvas.ORANGE)
+
+    with mock.patch('time.sleep'), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        receiver, sender = receive(display)
+        reply = sender.send(canvas)
+        sender.close()
+
+    assert reply['status'] == 'shown'
+    assert sender.info['planes'] == [600 * 448 // 2]
+    assert (panel.image(display.rotation) == canvas.buf).all()
+
+
+def test_remote_resync():
+    """Test a receiver that lost the last frame asks for the next one whole."""
+    from inky import emulator, inky
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, (212, 104))
+    canvas, _ = emulate(inky.Inky, emulator.InkyEmulator, (212, 104))
+
+    with mock.patch('time.sleep'):
+        receiver, sender = receive(display)
+        sender.send(canvas)
+
+        # A restarted receiver, reached over the sender's socket
+        receiver.seq = None
+        canvas.set_pixel(5, 5, canvas.RED)
+        reply = sender.send(canvas)
+        sender.close()
+
+    assert reply['status'] == 'shown'
+    assert receiver.frames == 2
+    assert (panel.image(display.rotation) == canvas.buf).all()
+
+
+def test_remote_lut():
+    """Test the sender chooses the receiver's waveform, and unsupported choices are refused."""
+    from inky import emulator, inky
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, (400, 300))
+    planes = (numpy.full(15000, 0xFF, dtype=numpy.uint8), numpy.zeros(15000, dtype=numpy.uint8))
+
+    with mock.patch('time.sleep'):
+        receiver, sender = receive(display)
+        assert sender.send_planes(planes, lut='black')['lut'] == 'black'
+        assert panel.lut == bytes(bytearray(display._luts['black']))
+
+        reply = sender.send_planes(planes, force=True)
+        sender.close()
+
+    assert reply['status'] == 'shown'
+    # Just the header, the planes are unchanged
+    assert reply['bytes'] < 200
+
+
+@pytest.mark.parametrize('failure', ['lut', 'refresh_mode', 'show'])
+def test_remote_refused_frame(failure):
+    """Test a frame that isn't shown isn't acknowledged, and the next delta is still correct."""
+    from inky import emulator, inky, remote
+    from inky.mock import InkyMockWHAT
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, (400, 300))
+    canvas = InkyMockWHAT('red', headless=True)
+
+    with mock.patch('time.sleep'):
+        receiver, sender = receive(display)
+        canvas.fill_rect(0, 0, 50, 50, canvas.RED)
+        assert sender.send(canvas)['status'] == 'shown'
+        shown = panel.image(display.rotation).copy()
+
+        canvas.fill_rect(100, 100, 50, 50, canvas.BLACK)
+        if failure == 'show':
+            with mock.patch.object(display, '_update', side_effect=RuntimeError('Timed out waiting for busy')):
+                reply = sender.send(canvas)
+        else:
+            planes = [plane.copy() for plane in remote.pack(canvas)]
+            reply = sender.send_planes(planes, **{failure: 'octarine'})
+        assert reply['status'] == 'error'
+        assert reply['seq'] != 2
+        assert (panel.image(display.rotation) == shown).all()
+        if failure != 'show':
+            assert display.lut == 'red' and display.refresh_mode == 'full'
+
+        canvas.set_pixel(300, 200, canvas.RED)
+        reply = sender.send(canvas)
+        sender.close()
+
+    assert reply['status'] == 'shown'
+    assert (panel.image(display.rotation) == canvas.buf).all()
+    assert panel.errors == []
+
+
+def test_remote_payload_limit():
+    """Test a frame larger than any delta of the display's planes is refused before it's read."""
+    from inky import emulator, inky, service
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, (212, 104))
+    receiver, sender = receive(display)
+    sender._sock.sendall(service._LENGTHS.pack(2, 0xFFFFFFFF) + b'{}')
+    reply, _ = service.recv_message(sender._sock)
+    sender.close()
+
+    assert reply['status'] == 'error' and 'too large' in reply['error']
+    assert sum(receiver.sizes) < receiver.max_payload < 2 * sum(receiver.sizes)
+
+
+@pytest.mark.parametrize('message', ['truncated_delta', 'list_header', 'string_planes'])
+def test_remote_malformed_frame(message):
+    """Test a malformed frame is refused, and the next frame from the sender is still shown."""
+    from inky import emulator, inky, service
+    from inky.mock import InkyMockWHAT
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, (400, 300))
+    canvas = InkyMockWHAT('red', headless=True)
+
+    with mock.patch('time.sleep'):
+        receiver, sender = receive(display)
+        canvas.fill_rect(0, 0, 50, 50, canvas.RED)
+        assert sender.send(canvas)['status'] == 'shown'
+
+        header = {'type': 'frame', 'seq': 10, 'base': None, 'sizes': receiver.sizes, 'planes': [3, 0]}
+        if message == 'list_header':
+            header = [header]
+        elif message == 'string_planes':
+            header['planes'] = ['a', 'bc']
+        reply, _ = sender.request(header, b'abc')
+        assert reply['status'] == 'error'
+
+        canvas.set_pixel(300, 200, canvas.RED)
+        reply = sender.send(canvas)
+        sender.close()
+
+    assert reply['status'] == 'shown'
+    assert (panel.image(display.rotation) == canvas.buf).all()
+
+
+def test_remote_serve_forever_survives_sender():
+    """Test a sender that breaks the receiver's connection doesn't stop it accepting others."""
+    import time
+    from inky import emulator, inky, remote
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, (212, 104))
+    receiver = remote.Receiver(display)
+    thread = threading.Thread(target=receiver.serve_forever, kwargs={'host': '127.0.0.1', 'port': 0})
+    thread.daemon = True
+    thread.start()
+
+    def connect():
+        for _ in range(100):
+            try:
+                return remote.connect('127.0.0.1', receiver._sock.getsockname()[1])
+            except (AttributeError, IOError, OSError):
+                time.sleep(0.01)
+
+    try:
+        with pytest.warns(UserWarning), mock.patch.object(receiver, '_handle_message', side_effect=AttributeError('oops')):
+            with pytest.raises(RuntimeError):
+                connect()
+        sender = connect()
+        assert sender.info['controller'] == 'ssd1675'
+        sender.close()
+    finally:
+        receiver.close()
+        thread.join(1.0)
@@ -0,0 +1,195 @@
+"""Display service tests for Inky."""
+import socket
+import threading
+import time
+
+import numpy
+import pytest
+
+
+class FakeDisplay:
+    """Stand-in display whose refresh takes `refresh` seconds."""
+
+    colour = 'red'
+    width = 8
+    height = 4
+
+    def __init__(self, refresh=0.0):
+        """Initialise an 8x4 display."""
+        self.buf = numpy.zeros((4, 8), dtype=numpy.uint8)
+        self.refresh = refresh
+        self.warm_wake = False
+        self.shown = []
+        self.started = threading.Event()
+
+    def set_image(self, image):
+        """Copy a frame into the buffer."""
+        self.buf[:] = image
+
+    def show(self, busy_wait=True, force=False):
+        """Record the buffer after a simulated refresh."""
+        self.started.set()
+        time.sleep(self.refresh)
+        self.shown.append(self.buf.copy())
+
+
+def serve(display, **kwargs):
+    """Return a started service and a client connected to it over a socketpair."""
+    from inky import service
+
+    display_service = service.DisplayService(display, **kwargs)
+    display_service.start()
+    server, client = socket.socketpair()
+    thread = threading.Thread(target=display_service.handle, args=(server,))
+    thread.daemon = True
+    thread.start()
+    return display_service, service.Client(client)
+
+
+def frame(value):
+    """Return a frame with every pixel set to `value`."""
+    return numpy.full((4, 8), value, dtype=numpy.uint8)
+
+
+def test_message_roundtrip():
+    """Test headers and payloads survive the wire format."""
+    from inky import service
+
+    a, b = socket.socketpair()
+    service.send_message(a, {'type': 'frame', 'shape': [2, 2]}, numpy.arange(4, dtype=numpy.uint8))
+    header, payload = service.recv_message(b)
+    a.close()
+
+    assert header == {'type': 'frame', 'shape': [2, 2]}
+    assert bytes(payload) == b'\x00\x01\x02\x03'
+    assert service.recv_message(b) == (None, None)
+
+
+def test_frame_shown():
+    """Test a frame is shown, the controller is kept awake, and latency is reported."""
+    display = FakeDisplay()
+    display_service, client = serve(display, min_interval=0)
+
+    reply = client.send_frame(frame(2), wait=True)
+    display_service.close()
+
+    assert reply['status'] == 'shown'
+    assert reply['latency'] >= 0 and reply['pending'] == 0
+    assert display.warm_wake
+    assert (display.shown[-1] == 2).all()
+
+
+def test_frames_coalesced():
+    """Test frames sent during a refresh replace each other, only the newest is shown."""
+    display = FakeDisplay(refresh=0.2)
+    display_service, client = serve(display, min_interval=0)
+
+    client.send_frame(frame(1))
+    display.started.wait(1.0)
+    for value in (2, 3, 4):
+        reply = client.send_frame(frame(value))
+    assert reply['pending'] == 1 and reply['refreshing']
+
+    status = client.send_frame(frame(5), wait=True)
+    display_service.close()
+
+    assert [shown[0, 0] for shown in display.shown] == [1, 5]
+    assert status['dropped'] == 3 and status['received'] == 5
+
+
+def test_min_interval():
+    """Test refreshes are held back to the minimum interval."""
+    display = FakeDisplay()
+    display_service, client = serve(display, min_interval=0.3)
+
+    t_start = time.time()
+    client.send_frame(frame(1), wait=True)
+    client.send_frame(frame(2), wait=True)
+    elapsed = time.time() - t_start
+    display_service.close()
+
+    assert elapsed >= 0.3
+    assert len(display.shown) == 2
+
+
+def test_bad_frame():
+    """Test a frame of the wrong size is rejected without stopping the service."""
+    from inky import service
+
+    display_service, client = serve(FakeDisplay(), min_interval=0)
+
+    reply = client.request({'type': 'frame', 'shape': [4, 8]}, b'\x00' * 5)
+    assert reply['status'] == 'error'
+    assert client.status()['status'] == 'ok'
+
+    # Malformed headers get an error reply, and the connection carries on
+    for header in ([{'type': 'frame'}], {'type': 'frame', 'shape': ['a', 'b']}, {'type': 'frame', 'shape': 32}):
+        reply = client.request(header, b'\x00' * 32)
+        assert reply['status'] == 'error'
+    assert client.status()['status'] == 'ok'
+    with pytest.raises(ValueError):
+        client.send_frame(numpy.zeros(4))
+    display_service.close()
+
+
+def test_payload_limit():
+    """Test a payload larger than the display is refused before it's read."""
+    from inky import service
+
+    a, b = socket.socketpair()
+    a.sendall(service._LENGTHS.pack(2, 0xFFFFFFFF) + b'{}')
+    with pytest.raises(ValueError):
+        service.recv_message(b, max_payload=32)
+
+    # A 4 GB frame, the service replies without waiting for it
+    display_service, client = serve(FakeDisplay(), min_interval=0)
+    client._sock.sendall(service._LENGTHS.pack(2, 0xFFFFFFFF) + b'{}')
+    reply, _ = service.recv_message(client._sock)
+    assert reply['status'] == 'error' and 'too large' in reply['error']
+    display_service.close()
+
+
+def test_ssd1608_frame():
+    """Test frames are images of the display's size, not its padded buffer."""
+    import mock
+    from inky import emulator, inky_ssd1608
+
+    probe = inky_ssd1608.Inky(colour='red', i2c_bus=emulator.EmulatedI2C())
+    panel = emulator.SSD1608Emulator(probe.cols, probe.rows, time_scale=0)
+    display = inky_ssd1608.Inky(colour='red', spi_bus=panel.spi, gpio=panel.gpio, i2c_bus=panel.i2c)
+    display_service, client = serve(display, min_interval=0)
+
+    image = numpy.zeros((122, 250), dtype=numpy.uint8)
+    image[10:20, 30:40] = display.RED
+    with mock.patch('time.sleep'):
+        reply = client.send_frame(image, wait=True)
+        assert reply['status'] == 'shown'
+        assert (panel.image(display.rotation) == display.buf).all()
+        assert (display.buf[display.offset_y:display.offset_y + 122] == image).all()
+
+        # The padded buffer isn't an image of the display
+        assert client.send_frame(display.buf.copy(), wait=True)['status'] == 'error'
+    display_service.close()
+
+
+def test_unix_socket(tmp_path):
+    """Test the service listens on a Unix socket, and a second service refuses to start."""
+    from inky import service
+
+    path = str(tmp_path / 'inky.sock')
+    display = FakeDisplay()
+    display_service = service.DisplayService(display, path=path, min_interval=0)
+    display_service.bind()
+    thread = threading.Thread(target=display_service.serve_forever)
+    thread.start()
+
+    client = service.connect(path)
+    assert client.send_frame(frame(1), wait=True)['status'] == 'shown'
+    client.close()
+
+    with pytest.raises(RuntimeError):
+        service.DisplayService(FakeDisplay(), path=path).bind()
+
+    display_service.close()
+    thread.join(1.0)
+    assert not thread.is_alive()
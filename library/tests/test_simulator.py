@@ -60,3 +60,162 @@ def test_mock_show_180(tkinter, PIL):
 
     inky = InkyMockPHAT('red', h_flip=True, v_flip=True)
     inky.show()
+
+
+@pytest.mark.parametrize('h_flip,v_flip', [(False, False), (True, False), (False, True), (True, True)])
+def test_mock_orientation_phat(tkinter, PIL, h_flip, v_flip):
+    """Test the pHAT simulator shows the buffer flipped, but not rotated, in a single pass."""
+    import numpy
+    from inky.mock import InkyMockPHAT
+
+    inky = InkyMockPHAT('red', h_flip=h_flip, v_flip=v_flip)
+    inky.buf[:] = numpy.random.RandomState(0).randint(0, 3, inky.buf.shape)
+    regions = []
+    inky._simulate = regions.append
+    inky.show()
+
+    # Rotated -90 for the controller, then rotated and flipped back upright for display
+    expected = inky.buf
+    if h_flip:
+        expected = numpy.flipud(expected)
+    if v_flip:
+        expected = numpy.fliplr(expected)
+
+    assert (regions[0] == expected).all()
+
+
+@pytest.mark.parametrize('name,args', [
+    ('InkyMockPHAT', ('red',)),
+    ('InkyMockPHATSSD1608', ('yellow',)),
+    ('InkyMockWHAT', ('black',)),
+    ('InkyMockImpression', ()),
+])
+def test_mock_headless(name, args, monkeypatch):
+    """Test every simulator renders frames to RGB arrays without tkinter."""
+    import sys
+    import numpy
+    from inky import mock
+
+    monkeypatch.setitem(sys.modules, 'tkinter', None)
+
+    inky = getattr(mock, name)(*args, headless=True)
+    assert inky.image() is None
+
+    inky.buf[:] = numpy.arange(inky.buf.size).reshape(inky.buf.shape) % 3
+    inky.show()
+
+    frame = inky.image()
+    assert frame.shape == (inky.HEIGHT, inky.WIDTH, 3)
+    assert (frame == inky._rgb[inky.buf]).all()
+    assert inky.frames == 1
+    inky.wait_for_window_close()
+
+
+def test_mock_headless_output(tmpdir):
+    """Test frames are passed to a function, or saved as numbered PNG files."""
+    pytest.importorskip('PIL')
+    from inky.mock import InkyMockWHAT
+
+    frames = []
+    inky = InkyMockWHAT('red', headless=True, output=frames.append)
+    inky.show()
+    inky.buf[0, 0] = inky.RED
+    inky.show()
+
+    assert len(frames) == 2
+    assert tuple(frames[0][0, 0]) == (255, 255, 255)
+    assert tuple(frames[1][0, 0]) == (255, 0, 0)
+
+    inky = InkyMockWHAT('red', headless=True, output=str(tmpdir.join('frame-{frame:02d}.png')))
+    inky.show()
+    inky.show()
+
+    assert sorted(path.basename for path in tmpdir.listdir()) == ['frame-01.png', 'frame-02.png']
+    assert tmpdir.join('frame-02.png').read_binary() == inky.png()
+    assert inky.png().startswith(b'\x89PNG')
+
+
+def test_mock_canvas_reused(tkinter, PIL):
+    """Test the window keeps a single canvas image item across frames."""
+    from inky.mock import InkyMockPHAT
+
+    inky = InkyMockPHAT('red')
+    for _ in range(3):
+        inky.show()
+
+    canvas = tkinter.Canvas.return_value
+    assert canvas.create_image.call_count == 1
+    assert canvas.itemconfig.call_count == 2
+
+
+def test_auto_simulate_headless(monkeypatch):
+    """Test auto picks the headless simulator without reading the EEPROM."""
+    import sys
+    from inky import auto
+    from inky.mock import InkyMockPHAT
+
+    monkeypatch.setitem(sys.modules, 'tkinter', None)
+    monkeypatch.setitem(sys.modules, 'smbus2', None)
+    monkeypatch.setattr(sys, 'argv', ['test', '--simulate', 'headless', '--type', 'phat', '--colour', 'red'])
+
+    inky = auto(ask_user=True)
+
+    assert isinstance(inky, InkyMockPHAT)
+    assert inky.headless
+    inky.show()
+    assert inky.image().shape == (104, 212, 3)
+
+
+def test_mock_virtual_time():
+    """Test simulated updates advance a virtual clock by the modelled update time."""
+    import pytest
+    from inky.mock import InkyMockWHAT
+
+    inky = InkyMockWHAT('red', headless=True, simulate_time='virtual')
+    model = inky.refresh_model
+    inky.show()
+
+    assert list(inky.last_update) == ['setup', 'spi', 'refresh']
+    assert inky.clock.time() == pytest.approx(model.seconds('red'))
+    # Two 15000 byte planes at the driver's SPI clock
+    assert inky.last_update['spi'] > 30000 * 8.0 / 488000
+
+    # Without busy_wait the next update waits for the refresh instead
+    inky.show(busy_wait=False)
+    assert inky.clock.time() == pytest.approx(model.seconds('red') * 2 - model.refresh_seconds('red'))
+    inky.show()
+    assert inky.clock.time() == pytest.approx(model.seconds('red') * 3)
+
+
+@pytest.mark.parametrize('name,args,faster', [
+    ('InkyMockPHAT', ('black',), 'red'),
+    ('InkyMockPHATSSD1608', ('black',), None),
+    ('InkyMockImpression', (), None),
+])
+def test_mock_block_time(name, args, faster):
+    """Test simulated updates sleep for the modelled update time."""
+    import mock as mock_module
+    from inky import mock
+
+    inky = getattr(mock, name)(*args, headless=True, simulate_time='block')
+
+    with mock_module.patch('time.sleep') as sleep:
+        inky.show()
+
+    slept = sum(call[0][0] for call in sleep.call_args_list)
+    assert slept == pytest.approx(sum(inky.last_update.values()))
+    if faster is not None:
+        # The black waveform is much shorter than the red
+        assert inky.last_update['refresh'] < inky.refresh_model.refresh_seconds(faster) / 2
+
+
+def test_mock_instant():
+    """Test updates are instant unless time simulation is enabled."""
+    from inky.mock import InkyMockWHAT
+
+    inky = InkyMockWHAT('red', headless=True)
+    inky.show()
+    assert inky.last_update is None
+
+    with pytest.raises(ValueError):
+        InkyMockWHAT('red', headless=True, simulate_time='sometimes')
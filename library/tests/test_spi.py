@@ -0,0 +1,83 @@
+"""SPI transfer tests for Inky."""
+import mock
+import pytest
+
+
+class OldSpiDev:
+    """Stand-in for a spidev release without writebytes2 or xfer3."""
+
+    def __init__(self):
+        """Initialise an empty transfer log."""
+        self.transfers = []
+
+    def xfer(self, values):
+        """Record a single transfer."""
+        assert isinstance(values, list)
+        self.transfers.append(values)
+
+
+def test_spi_write_chunks_to_bufsiz():
+    """Test buffers are split into bufsiz memoryview slices for writebytes2."""
+    from inky import spi
+
+    spi_bus = mock.Mock()
+    data = bytearray(range(256)) * 40
+
+    assert spi.write(spi_bus, data, chunk_size=4096) == len(data)
+
+    chunks = [call[0][0] for call in spi_bus.writebytes2.call_args_list]
+    assert [len(chunk) for chunk in chunks] == [4096, 4096, 2048]
+    assert all(isinstance(chunk, memoryview) for chunk in chunks)
+    assert b''.join(bytes(chunk) for chunk in chunks) == bytes(data)
+
+
+def test_spi_write_numpy():
+    """Test numpy buffers are written without conversion to a list."""
+    import numpy
+    from inky import spi
+
+    spi_bus = mock.Mock()
+    data = numpy.arange(64, dtype=numpy.uint8).reshape((8, 8))
+
+    spi.write(spi_bus, data)
+
+    sent = spi_bus.writebytes2.call_args[0][0]
+    assert bytes(sent) == data.tobytes()
+
+
+def test_spi_write_fallback_xfer():
+    """Test old spidev releases fall back to chunked xfer with lists."""
+    from inky import spi
+
+    spi_bus = OldSpiDev()
+    spi.write(spi_bus, bytes(bytearray(10000)), chunk_size=4096)
+
+    assert [len(chunk) for chunk in spi_bus.transfers] == [4096, 4096, 1808]
+
+
+def test_spi_stats():
+    """Test bytes per second is derived from recorded writes."""
+    from inky import spi
+
+    stats = spi.SPIStats()
+    assert stats.bytes_per_second == 0.0
+
+    stats.record(1000, 0.5)
+    stats.record(1000, 0.5)
+    assert stats.transfers == 2
+    assert stats.bytes_per_second == pytest.approx(2000.0)
+
+
+def test_show_writes_buffers(spidev, smbus2, GPIO):
+    """Test show() passes packed buffers, not lists, to the SPI bus."""
+    from inky import InkyWHAT
+
+    GPIO.input.return_value = GPIO.LOW
+
+    inky = InkyWHAT('red')
+    with mock.patch('time.sleep'):
+        inky.show()
+
+    sent = [call[0][0] for call in spidev.SpiDev().writebytes2.call_args_list]
+    assert all(isinstance(chunk, memoryview) for chunk in sent)
+    assert inky.spi_stats.bytes_written >= 2 * 400 * 300 // 8
@@ -0,0 +1,100 @@
+"""Update phase timing tests for Inky."""
+import json
+
+import mock
+
+
+def test_phase_stats():
+    """Test totals, percentiles and histogram of a single phase."""
+    from inky.timing import PhaseStats
+
+    stats = PhaseStats(window=4)
+    for seconds in (0.5, 0.002, 0.02, 0.2, 2.0):
+        stats.record(seconds, nbytes=10)
+
+    # Totals cover every sample, percentiles and histogram only the last four
+    assert stats.count == 5
+    assert stats.bytes == 50
+    assert abs(stats.seconds - 2.722) < 1e-9
+    assert stats.percentile(0) == 0.002
+    assert stats.percentile(100) == 2.0
+    assert stats.histogram(bins=(0.01, 0.1, 1.0)) == [1, 1, 1, 1]
+
+
+def test_timings_callback():
+    """Test every sample is passed to the callback."""
+    from inky.timing import Timings
+
+    samples = []
+    timings = Timings(callback=lambda *sample: samples.append(sample))
+
+    with mock.patch('time.time', side_effect=[1.0, 1.25]):
+        with timings.phase('setup'):
+            pass
+    timings.record('spi', 0.5, 4096)
+
+    assert samples == [('setup', 0.25, 0), ('spi', 0.5, 4096)]
+    assert list(timings.phases) == ['setup', 'spi']
+    assert timings['spi'].bytes == 4096
+    json.dumps(timings.as_dict())
+
+
+def test_get_timings():
+    """Test a driver's timings argument is resolved to a timings object."""
+    from inky.timing import get_timings, Timings, NULL_TIMINGS
+
+    timings = Timings()
+
+    assert get_timings(None) is NULL_TIMINGS
+    assert get_timings(timings) is timings
+    assert isinstance(get_timings(lambda *sample: None), Timings)
+    assert not NULL_TIMINGS.enabled
+
+    with NULL_TIMINGS.phase('setup'):
+        NULL_TIMINGS.record('spi', 1.0, 1)
+
+
+def test_what_timings(spidev, smbus2, GPIO):
+    """Test InkyWHAT records each phase of an update."""
+    from inky import InkyWHAT
+    from inky.timing import Timings
+
+    GPIO.input.return_value = GPIO.LOW
+
+    timings = Timings()
+    inky = InkyWHAT('red')
+    inky.timings = timings
+
+    with mock.patch('time.sleep'):
+        inky.show()
+        inky.show()
+
+    for phase in ('transform', 'pack', 'setup', 'refresh', 'power_off'):
+        assert timings[phase].count == 2
+    assert timings['spi'].count == inky.spi_stats.transfers
+    assert timings['spi'].bytes == inky.spi_stats.bytes_written
+
+
+def test_7colour_timings(spidev, smbus2, GPIO):
+    """Test the UC8159 records each phase of an update."""
+    from inky.inky_uc8159 import Inky
+
+    samples = []
+    inky = Inky(timings=lambda *sample: samples.append(sample))
+
+    with mock.patch('time.sleep'), mock.patch('inky.inky_uc8159.Inky._busy_wait'):
+        inky.show()
+
+    phases = [phase for phase, seconds, nbytes in samples if phase != 'spi']
+    assert phases == ['transform', 'pack', 'setup', 'refresh', 'power_off']
+    assert sum(nbytes for phase, seconds, nbytes in samples) == inky.spi_stats.bytes_written
+
+
+def test_timings_disabled(spidev, smbus2, GPIO):
+    """Test timing is disabled by default."""
+    from inky import InkyWHAT
+    from inky.timing import NULL_TIMINGS
+
+    inky = InkyWHAT('black')
+
+    assert inky.timings is NULL_TIMINGS
@@ -0,0 +1,132 @@
+"""Warm wake and power state tests for Inky."""
+import mock
+import pytest
+
+from tools import record_commands
+
+
+def sent(commands):
+    """Return just the command bytes from record_commands()."""
+    return [command for command, _ in commands]
+
+
+def test_what_cold_update(spidev, smbus2, GPIO_edges):
+    """Test the default mode resets before, and deep sleeps after, every update."""
+    from inky import InkyWHAT
+
+    inky = InkyWHAT('red')
+    commands = record_commands(inky)
+
+    with mock.patch('time.sleep') as sleep:
+        inky.show()
+        inky.show()
+
+    assert sent(commands).count(0x12) == 2
+    assert sent(commands).count(0x10) == 2
+    assert inky.power_state == 'sleep'
+    assert sum(call[0][0] for call in sleep.call_args_list) >= 0.4
+
+
+def test_what_warm_update(spidev, smbus2, GPIO_edges):
+    """Test warm_wake resets once and skips unchanged registers on later updates."""
+    from inky import InkyWHAT
+
+    inky = InkyWHAT('red')
+    inky.warm_wake = True
+    commands = record_commands(inky)
+
+    with mock.patch('time.sleep') as sleep:
+        inky.show()
+        assert inky.power_state == 'awake'
+        first_update = inky.spi_stats.bytes_written
+        del commands[:]
+        inky.show()
+        second_update = inky.spi_stats.bytes_written - first_update
+
+    assert 0x12 not in sent(commands)
+    assert 0x10 not in sent(commands)
+    # The waveform LUT and other registers are retained by the controller
+    assert second_update < first_update - len(inky._luts['red'])
+    assert sent(commands).count(0x20) == 1
+    assert max(call[0][0] for call in sleep.call_args_list) < 0.1
+
+
+def test_what_warm_update_after_error(spidev, smbus2, GPIO_edges):
+    """Test a busy timeout during an update forces a reset on the next one."""
+    from inky import InkyWHAT
+
+    inky = InkyWHAT('red')
+    inky.warm_wake = True
+    # Red pixels, so every update writes the colour plane
+    inky.buf[0, 0] = inky.RED
+
+    with mock.patch('time.sleep'):
+        inky.show()
+        first_update = inky.spi_stats.bytes_written
+
+        with mock.patch.object(inky._busy, 'wait', return_value=False):
+            with pytest.raises(RuntimeError):
+                inky.show()
+
+        assert inky.power_state == 'unknown'
+        commands = record_commands(inky)
+        inky.spi_stats.reset()
+        inky.show()
+
+    assert sent(commands).count(0x12) == 1
+    assert inky.spi_stats.bytes_written == first_update
+
+
+def test_what_sleep_then_wake(spidev, smbus2, GPIO_edges):
+    """Test the controller is reset after an explicit deep sleep."""
+    from inky import InkyWHAT
+
+    inky = InkyWHAT('black')
+    inky.warm_wake = True
+
+    with mock.patch('time.sleep'):
+        inky.show()
+        inky.sleep()
+        assert inky.power_state == 'sleep'
+
+        commands = record_commands(inky)
+        inky.show()
+
+    assert sent(commands).count(0x12) == 1
+
+
+def test_ssd1608_warm_update(spidev, smbus2, GPIO_edges):
+    """Test the SSD1608 skips its reset delays in warm_wake mode."""
+    from inky.inky_ssd1608 import Inky
+
+    inky = Inky(colour='black', warm_wake=True)
+    commands = record_commands(inky)
+
+    with mock.patch('time.sleep') as sleep:
+        inky.show()
+        inky.show()
+
+    assert sent(commands).count(0x12) == 1
+    assert inky.power_state == 'awake'
+    assert sum(call[0][0] for call in sleep.call_args_list) < 0.1
+
+
+def test_7colour_warm_update(spidev, smbus2, GPIO_edges):
+    """Test the UC8159 is only reset once, and only sends changed registers, in warm_wake mode."""
+    from inky.inky_uc8159 import Inky, UC8159_CDI
+
+    inky = Inky(warm_wake=True)
+
+    with mock.patch('time.sleep') as sleep, mock.patch('inky.inky_uc8159.Inky._busy_wait'):
+        inky.show()
+        first_update = inky.spi_stats.bytes_written
+        inky.show()
+        second_update = inky.spi_stats.bytes_written - first_update
+        cdi = inky._registers[UC8159_CDI]
+
+        inky.set_border(inky.BLACK)
+        inky.show()
+
+    assert sleep.call_args_list.count(mock.call(0.1)) == 1
+    assert second_update < first_update
+    assert inky._registers[UC8159_CDI] != cdi
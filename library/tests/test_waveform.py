@@ -0,0 +1,266 @@
+"""Waveform selection tests for Inky."""
+import mock
+import pytest
+
+from tools import emulate
+
+
+def test_temperature_band():
+    """Test temperatures map to bands, and an unknown temperature to none."""
+    from inky.waveform import temperature_band
+
+    assert temperature_band(None) is None
+    assert temperature_band(-5.0) == 'freezing'
+    assert temperature_band(5.0) == 'cold'
+    assert temperature_band(20.0) == 'normal'
+    assert temperature_band(35.0) == 'hot'
+
+
+def test_decode_temperature():
+    """Test 12-bit temperature register values, and reads from a bus that can't read back."""
+    from inky.waveform import decode_temperature
+
+    assert decode_temperature([0x19, 0x00]) == 25.0
+    assert decode_temperature([0x01, 0x80]) == 1.5
+    assert decode_temperature([0xFF, 0x00]) == -1.0
+    assert decode_temperature([0x00, 0x00]) is None
+    assert decode_temperature([0xFF, 0xFF]) is None
+    assert decode_temperature(None) is None
+
+
+def test_table_select():
+    """Test the fast waveform is only chosen when it's safe."""
+    from inky.waveform import WaveformTable, FAST_LIMIT
+
+    table = WaveformTable('red', {('normal', 'fast'): 'black_fast', ('cold', 'full'): 'red_cold'})
+
+    assert table.select(20.0, 'auto', colour_pixels=False) == ('black_fast', 'fast', 'normal')
+    assert table.select(20.0, 'full', colour_pixels=False) == ('red', 'full', 'normal')
+    assert table.select(20.0, 'auto', colour_pixels=True) == ('red', 'full', 'normal')
+    assert table.select(5.0, 'auto', colour_pixels=False) == ('red_cold', 'full', 'cold')
+    assert table.select(None, 'auto', colour_pixels=False) == ('red', 'full', None)
+    assert table.select(20.0, 'auto', colour_pixels=False, fast_count=FAST_LIMIT)[1] == 'full'
+
+    with pytest.raises(ValueError):
+        table.select(20.0, 'turbo')
+
+
+def test_table_select_mono():
+    """Test the black/white waveform replaces the full one for frames without colour, at any temperature."""
+    from inky.waveform import WaveformTable, FAST_LIMIT
+
+    table = WaveformTable('red', {('normal', 'fast'): 'black_fast'}, mono='black')
+
+    assert table.select(20.0, 'auto', colour_pixels=False) == ('black_fast', 'fast', 'normal')
+    assert table.select(20.0, 'auto', colour_pixels=False, fast_count=FAST_LIMIT) == ('black', 'mono', 'normal')
+    assert table.select(None, 'auto', colour_pixels=False) == ('black', 'mono', None)
+    assert table.select(None, 'auto', colour_pixels=True) == ('red', 'full', None)
+    assert table.select(None, 'full', colour_pixels=False) == ('red', 'full', None)
+
+
+def test_what_auto_waveform():
+    """Test a wHAT reads its sensor and uses the fast waveform for black/white frames only."""
+    from inky import emulator, inky
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, (400, 300), refresh_mode='auto')
+    panel.temperature = 22.5
+
+    with mock.patch('time.sleep'):
+        # Whatever the panel showed before may include red
+        display.show()
+        assert display.last_refresh['lut'] == 'red'
+
+        display.fill_rect(0, 0, 100, 100, display.BLACK)
+        display.show()
+        assert display.last_refresh['lut'] == 'black_fast'
+        assert display.last_refresh['temperature'] == 22.5
+        assert display.last_refresh['seconds'] >= 0
+        assert panel.lut == bytes(bytearray(display._luts['black_fast']))
+
+        display.fill_rect(0, 0, 10, 10, display.RED)
+        display.show()
+        assert display.last_refresh['lut'] == 'red'
+        assert panel.lut == bytes(bytearray(display._luts['red']))
+
+        # Red pixels left by the previous frame need the red waveform to clear them
+        display.fill_rect(0, 0, 10, 10, display.WHITE)
+        display.show()
+        assert display.last_refresh['lut'] == 'red'
+        display.show(force=True)
+        assert display.last_refresh['lut'] == 'black_fast'
+
+    assert panel.errors == []
+    assert (panel.image(display.rotation) == display.buf).all()
+    # Sensor readings are reused
+    assert sum(1 for command, _ in panel.commands if command == 0x1b) == 1
+
+
+def test_what_cold_panel():
+    """Test the full waveform is used outside the fast waveform's temperature range."""
+    from inky import emulator, inky
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, (400, 300), refresh_mode='auto')
+    panel.temperature = 4.0
+
+    with mock.patch('time.sleep'):
+        display.show()
+        assert display.last_refresh['lut'] == 'red'
+        assert display.last_refresh['band'] == 'cold'
+
+        # Without red pixels the shorter black/white waveform is used
+        display.show(force=True)
+        assert display.last_refresh['lut'] == 'black'
+        assert display.last_refresh['mode'] == 'mono'
+
+
+def test_what_full_mode():
+    """Test the default mode doesn't read the sensor or change waveform."""
+    from inky import emulator, inky
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, (400, 300))
+
+    with mock.patch('time.sleep'):
+        display.show()
+
+    assert display.last_refresh['lut'] == 'red'
+    assert display.last_refresh['temperature'] is None
+    assert 0x1b not in [command for command, _ in panel.commands]
+
+
+@pytest.mark.parametrize('controller', ['ssd1675', 'ssd1608'])
+def test_refresh_seconds(controller):
+    """Test refresh times are measured without warm wake, and for refreshes left running by busy_wait=False."""
+    from inky import emulator, inky, inky_ssd1608
+
+    if controller == 'ssd1608':
+        display, panel = emulate(inky_ssd1608.Inky, emulator.SSD1608Emulator, (250, 122))
+    else:
+        display, panel = emulate(inky.Inky, emulator.InkyEmulator, (212, 104))
+
+    with mock.patch('time.sleep'):
+        display.show()
+    assert display.last_refresh['seconds'] >= 0
+    assert display.power_state != 'busy'
+
+    panel.time_scale = 1.0
+    panel.busy_times = {'refresh': 0.2}
+    display.show(busy_wait=False)
+    assert display.last_refresh['seconds'] is None
+    assert display.power_state == 'busy'
+
+    # Measured by the wait before the next update
+    last_refresh = display.last_refresh
+    display.setup()
+    assert last_refresh['seconds'] >= 0.1
+    assert display.power_state != 'busy'
+    assert panel.errors == []
+
+
+def test_external_temperature():
+    """Test a temperature function replaces the controller's sensor."""
+    from inky import emulator, inky
+
+    readings = iter([25.0, 25.0, 5.0])
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, (212, 104), refresh_mode='auto', temperature=lambda: next(readings))
+
+    with mock.patch('time.sleep'):
+        display.show()
+        display.show(force=True)
+        assert display.last_refresh['lut'] == 'black_fast'
+        display.show(force=True)
+        assert display.last_refresh['lut'] == 'black'
+
+    assert 0x1b not in [command for command, _ in panel.commands]
+
+
+def test_ssd1608_auto_waveform():
+    """Test the SSD1608 uses the temperature loaded by its previous refresh."""
+    from inky import emulator, inky_ssd1608
+
+    display, panel = emulate(inky_ssd1608.Inky, emulator.SSD1608Emulator, (250, 122), refresh_mode='auto', warm_wake=True)
+    panel.temperature = 21.0
+
+    with mock.patch('time.sleep'):
+        display.show()
+        # No reading until the controller has refreshed once, nor is the panel known to be clear of red
+        assert display.last_refresh['lut'] == 'red'
+        assert display.last_refresh['temperature'] is None
+
+        display.show()
+        assert display.last_refresh['lut'] == 'black_fast'
+        assert display.last_refresh['temperature'] == 21.0
+
+    assert panel.errors == []
+
+
+def test_no_readback(spidev, smbus2, GPIO):
+    """Test a bus that can't read back gives no temperature, and a full update."""
+    from inky import inky
+
+    GPIO.input.return_value = GPIO.LOW
+    display = inky.Inky(resolution=(400, 300), colour='red', refresh_mode='auto')
+    display._spi_bus = mock.Mock(spec=['open', 'close', 'max_speed_hz', 'xfer3', 'writebytes2'])
+
+    with mock.patch('time.sleep'):
+        display.show()
+
+    assert display.last_refresh['temperature'] is None
+    assert display.last_refresh['lut'] == 'red'
+
+
+def test_invalid_refresh_mode(spidev, smbus2):
+    """Test an unknown refresh mode is rejected."""
+    from inky import inky
+
+    with pytest.raises(ValueError):
+        inky.Inky(resolution=(400, 300), colour='red', refresh_mode='turbo')
+
+
+@pytest.mark.parametrize('mode', [None, 'warm_wake', 'partial_update'])
+def test_colour_plane_skipped(mode):
+    """Test the colour plane is only written while it has, or is replacing, red pixels, if the driver owns controller RAM."""
+    from inky import emulator, inky
+
+    display, panel = emulate(inky.Inky, emulator.InkyEmulator, (400, 300), **({mode: True} if mode else {}))
+
+    def colour_writes():
+        writes = [command for command, _ in panel.commands if command == 0x26]
+        panel.commands.clear()
+        return len(writes)
+
+    with mock.patch('time.sleep'):
+        display.show()
+        assert colour_writes() == 1
+        display.fill_rect(0, 0, 100, 100, display.BLACK)
+        display.show()
+        # In cold mode another process may have shown a red frame since
+        assert colour_writes() == (1 if mode is None else 0)
+
+        display.fill_rect(0, 0, 10, 10, display.RED)
+        display.show()
+        assert colour_writes() == 1
+        assert (panel.image(display.rotation) == display.buf).all()
+
+        display.fill_rect(0, 0, 10, 10, display.WHITE)
+        display.show()
+        assert colour_writes() == 1
+        assert (panel.image(display.rotation) == display.buf).all()
+
+    assert panel.errors == []
+
+
+def test_lut_seconds():
+    """Test refresh times follow the phase lengths of each LUT."""
+    from inky import inky, inky_ssd1608
+    from inky.waveform import lut_phases, lut_seconds, FRAME_RATES
+
+    luts = inky._LUTS
+    # Phase 2 of the black LUT: 4 + 8 + 8 + 16 frames, repeated 16 more times
+    assert lut_phases(luts['black'])[2] == 36 * 17
+    assert lut_seconds(luts['black_fast']) < lut_seconds(luts['black']) < lut_seconds(luts['red'])
+
+    assert lut_phases(inky_ssd1608._LUTS['black'], 'ssd1608')[:2] == [8, 15]
+    assert lut_seconds(inky_ssd1608._LUTS['black'], 'ssd1608') == sum(lut_phases(inky_ssd1608._LUTS['black'], 'ssd1608')) / FRAME_RATES['ssd1608']
+
+    with pytest.raises(ValueError):
+        lut_phases(luts['black'], 'uc8159')
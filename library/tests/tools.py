@@ -24,3 +24,113 @@ class MockSMBus:
     def read_i2c_block_data(self, i2c_address, register, length):
         """Read a block of i2c data bytes."""
         return self.regs[register:register + length]
+
+
+class MockGPIO:
+    """Mock the RPi.GPIO module with pin levels and edge events.
+
+    Inputs are driven with set_input(), which fires any callbacks
+    registered with add_event_detect() on a matching edge.
+
+    """
+
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self):
+        """Initialize mock GPIO with all pins low."""
+        self.levels = {}
+        self.callbacks = {}
+        self.input_calls = 0
+
+    def setmode(self, mode):
+        """Set pin numbering mode."""
+
+    def setwarnings(self, warnings):
+        """Enable or disable warnings."""
+
+    def setup(self, pin, mode, initial=LOW, pull_up_down=PUD_OFF):
+        """Set up a pin."""
+        self.levels.setdefault(pin, initial)
+
+    def output(self, pin, level):
+        """Drive an output pin."""
+        self.levels[pin] = level
+
+    def input(self, pin):
+        """Read a pin level."""
+        self.input_calls += 1
+        return self.levels.get(pin, self.LOW)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        """Register a callback for an edge on an input pin."""
+        if pin in self.callbacks:
+            raise RuntimeError('Conflicting edge detection already enabled for this GPIO channel')
+        self.callbacks[pin] = (edge, callback)
+
+    def remove_event_detect(self, pin):
+        """Remove edge detection from a pin."""
+        self.callbacks.pop(pin, None)
+
+    def set_input(self, pin, level):
+        """Drive an input pin from outside, firing edge callbacks."""
+        previous = self.levels.get(pin, self.LOW)
+        self.levels[pin] = level
+        if pin not in self.callbacks or previous == level:
+            return
+        edge, callback = self.callbacks[pin]
+        rising = level == self.HIGH
+        if callback is not None and edge in (self.BOTH, self.RISING if rising else self.FALLING):
+            callback(pin)
+
+    def set_input_after(self, pin, level, delay):
+        """Drive an input pin from another thread after `delay` seconds."""
+        import threading
+        timer = threading.Timer(delay, self.set_input, (pin, level))
+        timer.start()
+        return timer
+
+
+def emulate(driver, emulator_class, resolution, colour='red', **kwargs):
+    """Return a display driven by an emulated controller, and the emulator.
+
+    :param driver: Driver class, eg: inky.inky.Inky
+    :param emulator_class: Matching inky.emulator class, eg: InkyEmulator
+    :param resolution: (width, height) in pixels
+    :param colour: Display colour, default: red
+    :param kwargs: Passed on to the driver
+
+    """
+    from inky.emulator import EmulatedI2C
+
+    # Build once to find the controller RAM size for this resolution
+    probe = driver(resolution=resolution, colour=colour, i2c_bus=EmulatedI2C())
+    panel = emulator_class(probe.cols, probe.rows, time_scale=0)
+    display = driver(resolution=resolution, colour=colour, spi_bus=panel.spi, gpio=panel.gpio, i2c_bus=panel.i2c, **kwargs)
+    return display, panel
+
+
+def record_commands(inky):
+    """Wrap inky._send_command to record the (command, data bytes) sent.
+
+    Data is None for commands sent without any.
+
+    """
+    from inky import spi
+
+    commands = []
+    send_command = inky._send_command
+
+    def _send_command(command, data=None):
+        commands.append((command, None if data is None else spi.as_buffer(data).tobytes()))
+        send_command(command, data)
+
+    inky._send_command = _send_command
+    return commands